@@ -0,0 +1,289 @@
+# Rapport d'équilibrage du bestiaire (Monte Carlo)
+#
+# Simule un grand nombre de combats complets (1 joueur contre 1 mob) pour
+# chaque mob de REGISTRY, à chaque niveau de ses `level_stats`, contre une
+# grille de builds de joueur, avec les règles du bot :
+#   - tour du joueur : /atk_mob (attaque, contrecoup éventuel, riposte
+#     physique du mob s'il est encore en vie) ; une attaque magique coûte
+#     des PM, jamais régénérés en combat : sans mana, le joueur n'attaque plus ;
+#   - tour du mob : CombatSession.resolve_mob_turn (type d'attaque choisi
+#     d'après ses stats) ;
+#   - ordre des tours par AGI décroissante, le joueur d'abord à égalité.
+#
+# Les combats d'un même (mob, niveau) sont simulés ensemble avec
+# `rules.resolve_attacks_batch`, et les (mob, niveau) sont répartis sur
+# tous les cœurs (ProcessPoolExecutor). Les résultats sont mis en cache par
+# empreinte des stats : après une retouche de compendium.json (puis
+# `python app/mobs/generate_mobs_from_compendium.py`), seuls les mobs
+# modifiés sont resimulés.
+#
+# Usage:
+#   python -m app.balance                        # écrit balance_report.csv
+#   python -m app.balance --fights 5000 --output rapport.csv
+#   python -m app.balance --mob forest.lapin_vegetal --no-cache
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.rules import ATTACK_TYPE_CODES, best_attack_type, resolve_attacks_batch
+
+# Version du modèle de simulation : à incrémenter si les règles changent (invalide le cache)
+SIMULATION_VERSION = 2
+
+DEFAULT_FIGHTS = 2000
+DEFAULT_MAX_ROUNDS = 100
+DEFAULT_SEED = 1234
+DEFAULT_OUTPUT = "balance_report.csv"
+DEFAULT_CACHE = ".balance_cache.json"
+
+# Joueur de niveau 1 (create_character) et progression par niveau (add_xp)
+PLAYER_BASE_HP = 100.0
+PLAYER_HP_PER_LEVEL = 10.0
+PLAYER_BASE_MP = 50.0
+PLAYER_BASE_STAT = 10.0
+PLAYER_POINTS_PER_LEVEL = 5
+
+# Coût en PM d'une attaque magique (/atk_mob)
+MAGIC_MP_COST = 10.0
+
+# Niveaux de joueur testés, relatifs au niveau du mob
+PLAYER_LEVEL_OFFSETS = (-5, 0, 5)
+
+STATS = ("STR", "AGI", "INT", "DEX", "VIT")
+
+
+@dataclass(frozen=True)
+class Build:
+    """Répartition des points de stats d'un joueur et type d'attaque utilisé."""
+
+    name: str
+    attack_type: str
+    weights: Tuple[float, float, float, float, float]  # STR, AGI, INT, DEX, VIT
+
+
+BUILDS: Tuple[Build, ...] = (
+    Build("guerrier", "phys", (0.5, 0.2, 0.0, 0.0, 0.3)),
+    Build("tank", "phys", (0.3, 0.2, 0.0, 0.0, 0.5)),
+    Build("assassin", "phys", (0.5, 0.5, 0.0, 0.0, 0.0)),
+    Build("mage", "magic", (0.0, 0.2, 0.6, 0.0, 0.2)),
+    Build("archer", "ranged", (0.0, 0.3, 0.0, 0.5, 0.2)),
+    Build("equilibre", "phys", (0.2, 0.2, 0.2, 0.2, 0.2)),
+)
+
+CSV_COLUMNS = (
+    "mob_key", "mob_name", "mob_level", "build", "attack_type", "player_level", "fights",
+    "win_rate", "loss_rate", "timeout_rate",
+    "rounds_to_kill_mean", "rounds_to_kill_p50", "damage_taken_mean", "damage_taken_ratio",
+)
+
+
+def player_stats(build: Build, level: int) -> Dict[str, float]:
+    """Stats d'un joueur de niveau `level` ayant réparti tous ses points selon `build`."""
+    points = PLAYER_POINTS_PER_LEVEL * (level - 1)
+    stats = {s: PLAYER_BASE_STAT + points * w for s, w in zip(STATS, build.weights)}
+    stats["hp_max"] = PLAYER_BASE_HP + PLAYER_HP_PER_LEVEL * (level - 1)
+    stats["mp_max"] = PLAYER_BASE_MP
+    return stats
+
+
+@dataclass(frozen=True)
+class Unit:
+    """Un (mob, niveau) à simuler contre toute la grille de builds."""
+
+    mob_key: str
+    mob_name: str
+    level: int
+    stats: Tuple[float, ...]  # hp, STR, AGI, INT, DEX, VIT
+    fights: int
+    max_rounds: int
+    seed: int
+
+    def fingerprint(self) -> str:
+        payload = json.dumps(
+            [SIMULATION_VERSION, self.stats, self.fights, self.max_rounds, self.seed,
+             [astuple(b) for b in BUILDS], PLAYER_LEVEL_OFFSETS],
+            separators=(",", ":"),
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _unit_seed(seed: int, mob_key: str, level: int) -> int:
+    # Graine stable par (mob, niveau) : un mob inchangé redonne les mêmes chiffres
+    digest = hashlib.sha1(f"{seed}:{mob_key}:{level}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def simulate_unit(unit: Unit) -> List[Dict[str, Any]]:
+    """Simule `unit.fights` combats par (build, niveau de joueur) ; une ligne de rapport par couple."""
+    rng = np.random.default_rng(unit.seed)
+
+    hp, m_str, m_agi, m_int, m_dex, m_vit = unit.stats
+    mob = {"STR": m_str, "AGI": m_agi, "INT": m_int, "DEX": m_dex, "VIT": m_vit}
+    mob_type = ATTACK_TYPE_CODES[best_attack_type(m_str, m_int, m_dex)]
+
+    # Une colonne par combat : tous les (build, niveau) à la suite
+    grid = [(b, max(1, unit.level + off)) for b in BUILDS for off in PLAYER_LEVEL_OFFSETS]
+    grid = list(dict.fromkeys(grid))
+    n = unit.fights
+    size = len(grid) * n
+    p = {k: np.repeat([player_stats(b, lvl)[k] for b, lvl in grid], n) for k in (*STATS, "hp_max", "mp_max")}
+    p_type = np.repeat([ATTACK_TYPE_CODES[b.attack_type] for b, _ in grid], n).astype(np.int8)
+
+    p_mp_cost = np.where(p_type == ATTACK_TYPE_CODES["magic"], MAGIC_MP_COST, 0.0)
+
+    p_hp = p["hp_max"].copy()
+    p_mp = p["mp_max"].copy()
+    m_hp = np.full(size, float(hp))
+    rounds_to_kill = np.zeros(size)
+    mob_first = m_agi > p["AGI"]  # tri stable par AGI : le joueur d'abord à égalité
+
+    def player_turn(active):
+        nonlocal p_hp, p_mp, m_hp
+        # /atk_mob refuse l'attaque sans mana : le joueur passe son tour
+        active = active & (p_mp >= p_mp_cost)
+        p_mp = np.where(active, p_mp - p_mp_cost, p_mp)
+        # /atk_mob : attaque du joueur...
+        out = resolve_attacks_batch(p, mob, rng.integers(1, 21, size), rng.integers(1, 21, size), p_type)
+        m_hp = np.where(active, np.maximum(0.0, m_hp - out["damage"]), m_hp)
+        p_hp = np.where(active, np.maximum(0.0, p_hp - out["contrecoup"]), p_hp)
+        # ... puis riposte physique si le mob est encore en vie
+        riposte = active & (m_hp > 0)
+        out = resolve_attacks_batch(mob, p, rng.integers(1, 21, size), rng.integers(1, 21, size), "phys")
+        p_hp = np.where(riposte, np.maximum(0.0, p_hp - out["damage"]), p_hp)
+        m_hp = np.where(riposte, np.maximum(0.0, m_hp - out["contrecoup"]), m_hp)
+
+    def mob_turn(active):
+        nonlocal p_hp, m_hp
+        out = resolve_attacks_batch(mob, p, rng.integers(1, 21, size), rng.integers(1, 21, size), mob_type)
+        p_hp = np.where(active, np.maximum(0.0, p_hp - out["damage"]), p_hp)
+        m_hp = np.where(active, np.maximum(0.0, m_hp - out["contrecoup"]), m_hp)
+
+    for rnd in range(1, unit.max_rounds + 1):
+        running = (p_hp > 0) & (m_hp > 0)
+        if not running.any():
+            break
+        mob_turn(running & mob_first)
+        player_turn((p_hp > 0) & (m_hp > 0) & running)
+        mob_turn((p_hp > 0) & (m_hp > 0) & running & ~mob_first)
+        rounds_to_kill = np.where(running & (m_hp <= 0), rnd, rounds_to_kill)
+
+    win = (m_hp <= 0) & (p_hp > 0)
+    loss = p_hp <= 0
+    taken = p["hp_max"] - p_hp
+
+    rows = []
+    for i, (build, level) in enumerate(grid):
+        s = slice(i * n, (i + 1) * n)
+        wins = win[s]
+        kills = rounds_to_kill[s][wins]
+        rows.append({
+            "mob_key": unit.mob_key,
+            "mob_name": unit.mob_name,
+            "mob_level": unit.level,
+            "build": build.name,
+            "attack_type": build.attack_type,
+            "player_level": level,
+            "fights": n,
+            "win_rate": round(float(wins.mean()), 4),
+            "loss_rate": round(float(loss[s].mean()), 4),
+            "timeout_rate": round(float((~wins & ~loss[s]).mean()), 4),
+            "rounds_to_kill_mean": round(float(kills.mean()), 2) if kills.size else "",
+            "rounds_to_kill_p50": float(np.median(kills)) if kills.size else "",
+            "damage_taken_mean": round(float(taken[s].mean()), 2),
+            "damage_taken_ratio": round(float((taken[s] / p["hp_max"][s]).mean()), 4),
+        })
+    return rows
+
+
+def iter_units(mob_filter: Optional[str], fights: int, max_rounds: int, seed: int) -> Iterator[Unit]:
+    from app.mobs.registry import REGISTRY, discover_and_register
+
+    discover_and_register("app.mobs")
+    for defn in REGISTRY.all():
+        if mob_filter and defn.key != mob_filter:
+            continue
+        for level in sorted(defn.level_stats):
+            st = defn.level_stats[level]
+            stats = tuple(float(x) for x in (st.hp, st.STR, st.AGI, st.INT, st.DEX, st.VIT))
+            yield Unit(defn.key, defn.display_name, level, stats, fights, max_rounds,
+                       _unit_seed(seed, defn.key, level))
+
+
+def _load_cache(path: Optional[Path]) -> Dict[str, List[Dict[str, Any]]]:
+    if path is None or not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def run(units: List[Unit], workers: Optional[int], cache_path: Optional[Path]) -> Tuple[List[Dict[str, Any]], int]:
+    """Simule les unités absentes du cache sur un pool de processus ; retourne (lignes, nb simulé)."""
+    cache = _load_cache(cache_path)
+    keys = [u.fingerprint() for u in units]
+    todo = [(u, k) for u, k in zip(units, keys) if k not in cache]
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(todo) // (4 * (workers or os.cpu_count() or 1)))
+            for (_, key), rows in zip(todo, pool.map(simulate_unit, [u for u, _ in todo], chunksize=chunksize)):
+                cache[key] = rows
+
+    if cache_path is not None:
+        # Ne garder que les entrées encore utiles
+        kept = {k: cache[k] for k in keys}
+        cache_path.write_text(json.dumps(kept, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+    return [row for key in keys for row in cache[key]], len(todo)
+
+
+def write_csv(rows: List[Dict[str, Any]], path: Path) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rapport d'équilibrage du bestiaire (Monte Carlo).")
+    parser.add_argument("--fights", type=int, default=DEFAULT_FIGHTS, help="combats par (mob, niveau, build, niveau joueur)")
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS, help="manches avant abandon (timeout)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : tous les cœurs)")
+    parser.add_argument("--mob", default=None, help="ne simuler qu'un mob (clé REGISTRY)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    units = list(iter_units(args.mob, args.fights, args.max_rounds, args.seed))
+    if not units:
+        print("Aucun mob à simuler.", file=sys.stderr)
+        sys.exit(1)
+    cache_path = None if args.no_cache else Path(args.cache)
+    rows, simulated = run(units, args.workers, cache_path)
+    write_csv(rows, Path(args.output))
+    print(
+        f"{len(rows)} lignes écrites dans {args.output} "
+        f"({len(units)} mob/niveaux, {simulated} simulés, {len(units) - simulated} en cache) "
+        f"en {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
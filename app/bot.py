@@ -4,8 +4,12 @@ from discord.ext import commands
 from discord import app_commands
 
 from app.cogs.combat_turn import CombatTurnCog
+from app.combat_actor import combat_actors
+from app.combat_log_writer import combat_log_writer
+from app.combat_session import active_combats
 from app.config import load_config
 from app.db import Database
+from app.maintenance import MaintenanceScheduler
 from app.cogs.core import CoreCog
 from app.cogs.combat import CombatCog
 from app.cogs.mobs import MobsCog
@@ -34,7 +38,19 @@ class BofuriBot(commands.Bot):
         intents.message_content = True  # Enable message content intent for command prefix
         super().__init__(command_prefix="!", intents=intents)
         self.config = load_config()
-        self.db = Database(self.config.DB_PATH)
+        self.db = Database(
+            self.config.DB_PATH,
+            read_pool_size=self.config.DB_READ_POOL_SIZE,
+            instrument=self.config.DB_INSTRUMENT,
+            slow_query_ms=self.config.DB_SLOW_QUERY_MS,
+            profile=self.config.DB_PROFILE,
+        )
+        self.maintenance = MaintenanceScheduler(
+            self.db,
+            interval_s=self.config.DB_MAINTENANCE_INTERVAL_MIN * 60,
+            log_retention_days=self.config.DB_LOG_RETENTION_DAYS,
+            archive_retention_days=self.config.DB_ARCHIVE_RETENTION_DAYS,
+        )
 
         # Ajouter un gestionnaire d'erreurs pour les commandes slash
         self.tree.on_error = self.on_app_command_error
@@ -54,10 +70,14 @@ class BofuriBot(commands.Bot):
     async def setup_hook(self) -> None:
         logger.info("Configuration du bot en cours...")
         await self.db.connect()
+        self.maintenance.start()
 
         logger.info("Initialisation des objets de base...")
         await initialize_basic_items(self.db)
 
+        logger.info("Chargement des combats actifs...")
+        await active_combats(self.db)
+
         logger.info("Découverte et enregistrement des mobs...")
         discover_and_register("app.mobs")
 
@@ -93,6 +113,9 @@ class BofuriBot(commands.Bot):
 
     async def close(self) -> None:
         logger.info("Fermeture du bot...")
+        await self.maintenance.stop()
+        await combat_actors(self.db).stop_all()
+        await combat_log_writer(self.db).close()
         await self.db.close()
         await super().close()
 
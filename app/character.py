@@ -2,18 +2,25 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple
 import json
 import logging
+import weakref
+
+from .storage.records import InventoryRecord
 
 logger = logging.getLogger('bofuri.character')
 
+# Nombre de personnages gardés en mémoire par base (LRU)
+CHARACTER_CACHE_SIZE = 512
+
 
 @dataclass
 class Character:
     def __init__(self, user_id, name, level, xp, xp_next, hp, hp_max, mp, mp_max,
-                 str_, agi, int_, dex, vit, gold=0, stat_points=0, skills=None):
+                 str_, agi, int_, dex, vit, gold=0, stat_points=0, skills=None, equipped=None):
         self.user_id = user_id
         self.name = name
         self.level = level
@@ -30,76 +37,155 @@ class Character:
         self.VIT = vit
         self.gold = gold
         self.stat_points = stat_points
-        self.skills = skills or []
+        # frozenset : `"perce_defense" in skills` en O(1)
+        self.skills: FrozenSet[str] = frozenset(skills or ())
+        self.equipped: List[InventoryItem] = list(equipped or ())
+        # Valeurs des colonnes telles qu'en base (None : jamais enregistré)
+        self._saved: Optional[Dict[str, Any]] = None
 
     @classmethod
     async def from_db(cls, db, user_id: int) -> Optional["Character"]:
-        """Load a character from the database."""
-        row = await db.execute_fetchone(
-            "SELECT * FROM characters WHERE user_id = ?",
-            (int(user_id),)
-        )
-        if not row:
+        """Load a character, ses compétences et ses objets équipés (une seule requête)."""
+        sheet = await db.storage.load_character(int(user_id))
+        if not sheet:
             return None
-        
-        # Load skills
-        skills_rows = await db.execute_fetchall(
-            "SELECT skill_id FROM character_skills WHERE user_id = ?",
-            (int(user_id),)
-        )
-        skills = [r["skill_id"] for r in skills_rows]
-
-        # Utiliser l'accès par clé avec une vérification pour stat_points
-        stat_points = row["stat_points"] if "stat_points" in row.keys() else 0
+        return cls.from_sheet(sheet)
 
-        return cls(
-            user_id=row["user_id"],
-            name=row["name"],
-            level=row["level"],
-            xp=row["xp"],
-            xp_next=row["xp_next"],
-            hp=float(row["hp"]),
-            hp_max=float(row["hp_max"]),
-            mp=float(row["mp"]),
-            mp_max=float(row["mp_max"]),
-            str_=float(row["STR"]),
-            agi=float(row["AGI"]),
-            int_=float(row["INT"]),
-            dex=float(row["DEX"]),
-            vit=float(row["VIT"]),
-            gold=row["gold"],
-            stat_points=stat_points,
-            skills=skills,
+    @classmethod
+    def from_sheet(cls, sheet) -> "Character":
+        """Construit un personnage depuis un `CharacterSheet` déjà chargé."""
+        row = sheet.character
+        character = cls(
+            user_id=row.user_id,
+            name=row.name,
+            level=row.level,
+            xp=row.xp,
+            xp_next=row.xp_next,
+            hp=row.hp,
+            hp_max=row.hp_max,
+            mp=row.mp,
+            mp_max=row.mp_max,
+            str_=row.STR,
+            agi=row.AGI,
+            int_=row.INT,
+            dex=row.DEX,
+            vit=row.VIT,
+            gold=row.gold,
+            stat_points=row.stat_points or 0,
+            skills=sheet.skills,
+            equipped=[InventoryItem.from_record(item) for item in sheet.equipped],
         )
+        character._saved = row.as_dict()
+        return character
+
+    def _column_values(self) -> Dict[str, Any]:
+        """Valeurs à écrire dans `characters`, typées comme les colonnes."""
+        return {
+            "user_id": int(self.user_id),
+            "name": str(self.name),
+            "level": int(self.level),
+            "xp": int(self.xp),
+            "xp_next": int(self.xp_next),
+            "hp": float(self.hp),
+            "hp_max": float(self.hp_max),
+            "mp": float(self.mp),
+            "mp_max": float(self.mp_max),
+            "STR": float(self.STR),
+            "AGI": float(self.AGI),
+            "INT": float(self.INT),
+            "DEX": float(self.DEX),
+            "VIT": float(self.VIT),
+            "gold": int(self.gold),
+            "stat_points": int(self.stat_points),
+        }
+
+    def _mark_saved(self, column: str, value: Any) -> None:
+        """Une colonne vient d'être écrite en base par un autre chemin (set_character_hp...)."""
+        if self._saved is not None:
+            self._saved[column] = value
 
     async def save_to_db(self, db) -> None:
-        """Save the character to the database."""
-        await db.execute(
-            """
-            INSERT OR REPLACE INTO characters
-            (user_id, name, level, xp, xp_next, hp, hp_max, mp, mp_max, STR, AGI, INT, DEX, VIT, gold, stat_points)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                int(self.user_id),
-                str(self.name),
-                int(self.level),
-                int(self.xp),
-                int(self.xp_next),
-                float(self.hp),
-                float(self.hp_max),
-                float(self.mp),
-                float(self.mp_max),
-                float(self.STR),
-                float(self.AGI),
-                float(self.INT),
-                float(self.DEX),
-                float(self.VIT),
-                int(self.gold),
-                int(self.stat_points),
-            )
-        )
-        await db.commit()
+        """
+        Save the character to the database : UPDATE des seules colonnes
+        modifiées, upsert complet pour un personnage jamais enregistré (ou
+        disparu de la base). Write-through : le cache pointe ensuite sur cet objet.
+        """
+        cache = character_cache(db)
+        values = self._column_values()
+        try:
+            if self._saved is None:
+                await db.storage.save_character(values)
+            else:
+                changes = {c: v for c, v in values.items() if self._saved.get(c) != v}
+                if changes and not await db.storage.update_character(values["user_id"], changes):
+                    await db.storage.save_character(values)
+        except BaseException:
+            # L'objet a pu être modifié avant l'échec : ne pas le servir
+            cache.invalidate(self.user_id)
+            raise
+        self._saved = values
+        cache.put(self)
+
+
+class CharacterCache:
+    """
+    Identity map des personnages d'une base, indexée par user_id, avec
+    éviction LRU.
+
+    Tant qu'un personnage est en cache, `get_character` renvoie toujours le
+    même objet : les cogs le modifient puis l'enregistrent avec `save_to_db`,
+    `set_character_hp` ou `set_character_mp`, qui écrivent en base puis dans
+    le cache. Un rollback de transaction vide le cache (objets potentiellement
+    en avance sur la base).
+    """
+
+    def __init__(self, max_size: int = CHARACTER_CACHE_SIZE):
+        self.max_size = int(max_size)
+        self._items: "OrderedDict[int, Character]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, user_id: int) -> Optional["Character"]:
+        character = self._items.get(int(user_id))
+        if character is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(int(user_id))
+        self.hits += 1
+        return character
+
+    def peek(self, user_id: int) -> Optional["Character"]:
+        """Comme `get`, sans toucher à l'ordre LRU ni aux compteurs."""
+        return self._items.get(int(user_id))
+
+    def put(self, character: "Character") -> None:
+        user_id = int(character.user_id)
+        self._items[user_id] = character
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._items.pop(int(user_id), None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+# Un cache par base (Database ou MemoryDatabase), partagé par tous les cogs
+_caches: "weakref.WeakKeyDictionary[Any, CharacterCache]" = weakref.WeakKeyDictionary()
+
+
+def character_cache(db) -> CharacterCache:
+    """Cache des personnages de `db` (créé au premier appel)."""
+    cache = _caches.get(db)
+    if cache is None:
+        cache = _caches[db] = CharacterCache()
+        db.add_rollback_hook(cache.clear)
+    return cache
 
 
 async def create_character(db, user_id: int, name: str) -> Character:
@@ -127,8 +213,73 @@ async def create_character(db, user_id: int, name: str) -> Character:
 
 
 async def get_character(db, user_id: int) -> Optional[Character]:
-    """Retrieve a character from the database."""
-    return await Character.from_db(db, user_id)
+    """Retrieve a character (depuis le cache, ou la base au premier accès)."""
+    cache = character_cache(db)
+    character = cache.get(user_id)
+    if character is not None:
+        return character
+
+    character = await Character.from_db(db, user_id)
+    if character is None:
+        return None
+    # Un chargement concurrent a pu remplir le cache pendant l'attente
+    existing = cache.peek(user_id)
+    if existing is not None:
+        return existing
+    cache.put(character)
+    return character
+
+
+async def get_combat_characters(db, combat_id: int, user_ids) -> Dict[int, Character]:
+    """
+    Personnages des participants d'un combat, indexés par user_id.
+
+    Les personnages en cache sont réutilisés ; s'il en manque, une seule
+    requête hydrate tous les participants (`load_combat_characters`). Les
+    user_id sans personnage sont absents du résultat.
+    """
+    cache = character_cache(db)
+    characters: Dict[int, Character] = {}
+    missing = False
+    for user_id in user_ids:
+        character = cache.get(user_id)
+        if character is None:
+            missing = True
+        else:
+            characters[int(user_id)] = character
+    if not missing:
+        return characters
+
+    wanted = {int(user_id) for user_id in user_ids}
+    for sheet in await db.storage.load_combat_characters(int(combat_id)):
+        user_id = int(sheet.character.user_id)
+        if user_id not in wanted or user_id in characters:
+            continue
+        # Un chargement concurrent a pu remplir le cache pendant l'attente
+        character = cache.peek(user_id)
+        if character is None:
+            character = Character.from_sheet(sheet)
+            cache.put(character)
+        characters[user_id] = character
+    return characters
+
+
+async def set_character_hp(db, user_id: int, hp: float) -> None:
+    """Enregistre les PV puis met à jour le personnage en cache."""
+    await db.storage.update_character_hp(int(user_id), float(hp))
+    character = character_cache(db).peek(user_id)
+    if character is not None:
+        character.hp = float(hp)
+        character._mark_saved("hp", float(hp))
+
+
+async def set_character_mp(db, user_id: int, mp: float) -> None:
+    """Enregistre les PM puis met à jour le personnage en cache."""
+    await db.storage.update_character_mp(int(user_id), float(mp))
+    character = character_cache(db).peek(user_id)
+    if character is not None:
+        character.mp = float(mp)
+        character._mark_saved("mp", float(mp))
 
 
 async def get_or_create_character(db, user_id: int, name: str) -> Character:
@@ -185,100 +336,59 @@ class InventoryItem:
     properties: Dict[str, Any]
 
     @classmethod
-    def from_db_row(cls, row) -> "InventoryItem":
+    def from_record(cls, row: InventoryRecord) -> "InventoryItem":
         return cls(
-            id=row["id"],
-            character_id=row["character_id"],
-            item_id=row["item_id"],
-            quantity=row["quantity"],
-            equipped=bool(row["equipped"]),
-            properties=json.loads(row["properties"]) if row["properties"] else {},
+            id=row.id,
+            character_id=row.character_id,
+            item_id=row.item_id,
+            quantity=row.quantity,
+            equipped=bool(row.equipped),
+            properties=json.loads(row.properties) if row.properties else {},
         )
 
 
 async def get_inventory(db, user_id: int) -> List[InventoryItem]:
-    rows = await db.execute_fetchall(
-        "SELECT * FROM inventories WHERE character_id = ? ORDER BY id",
-        (int(user_id),)
-    )
-    return [InventoryItem.from_db_row(r) for r in rows]
+    rows = await db.storage.list_inventory(int(user_id))
+    return [InventoryItem.from_record(r) for r in rows]
+
+
+async def _refresh_equipped(db, user_id: int, item_id: Optional[str] = None) -> None:
+    """
+    Recharge `equipped` du personnage en cache après une écriture d'inventaire
+    (si `item_id` est donné : seulement s'il s'agit d'un objet équipé).
+    """
+    character = character_cache(db).peek(user_id)
+    if character is None:
+        return
+    if item_id is not None and all(item.item_id != item_id for item in character.equipped):
+        return
+    character.equipped = [item for item in await get_inventory(db, user_id) if item.equipped]
 
 
 async def add_item_to_inventory(db, user_id: int, item_id: str, quantity: int = 1, properties: Dict[str, Any] | None = None) -> None:
     if properties is None:
         properties = {}
 
-    existing_item = await db.execute_fetchone(
-        "SELECT id, quantity FROM inventories WHERE character_id = ? AND item_id = ?",
-        (int(user_id), str(item_id))
-    )
-
-    if existing_item:
-        await db.execute(
-                "UPDATE inventories SET quantity = quantity + ? WHERE id = ?",
-                (int(quantity), int(existing_item["id"]))
-        )
-    else:
-        await db.execute(
-            """
-            INSERT INTO inventories (character_id, item_id, quantity, equipped, properties)
-            VALUES (?, ?, ?, 0, ?)
-            """,
-            (int(user_id), str(item_id), int(quantity), json.dumps(properties))
-    )
-    await db.commit()
+    await db.storage.add_inventory_item(int(user_id), str(item_id), int(quantity), json.dumps(properties))
+    await _refresh_equipped(db, int(user_id), str(item_id))
 
 
 async def remove_item_from_inventory(db, user_id: int, item_id: str, quantity: int = 1) -> bool:
-    row = await db.execute_fetchone(
-        "SELECT id, quantity FROM inventories WHERE character_id = ? AND item_id = ?",
-        (int(user_id), str(item_id))
-    )
-    if not row:
-        return False
-
-    current_qty = int(row["quantity"])
-    inv_id = int(row["id"])
-
-    if current_qty <= int(quantity):
-        await db.execute("DELETE FROM inventories WHERE id = ?", (inv_id,))
-    else:
-        await db.execute(
-            "UPDATE inventories SET quantity = quantity - ? WHERE id = ?",
-            (int(quantity), inv_id)
-        )
-
-    await db.commit()
-    return True
+    removed = await db.storage.remove_inventory_item(int(user_id), str(item_id), int(quantity))
+    if removed:
+        await _refresh_equipped(db, int(user_id), str(item_id))
+    return removed
 
 
 async def equip_item(db, user_id: int, item_id: str) -> bool:
-    row = await db.execute_fetchone(
-        "SELECT id FROM inventories WHERE character_id = ? AND item_id = ? AND quantity > 0",
-        (int(user_id), str(item_id))
-    )
-    if not row:
-        return False
-
-    await db.execute(
-        "UPDATE inventories SET equipped = 1 WHERE id = ?",
-        (int(row["id"]),)
-    )
-    await db.commit()
-    return True
+    changed = await db.storage.set_item_equipped(int(user_id), str(item_id), True)
+    if changed:
+        await _refresh_equipped(db, int(user_id))
+    return changed
 
 
 async def unequip_item(db, user_id: int, item_id: str) -> bool:
-    row = await db.execute_fetchone(
-        "SELECT id FROM inventories WHERE character_id = ? AND item_id = ? AND equipped = 1",
-        (int(user_id), str(item_id))
-    )
-    if not row:
-        return False
-
-    await db.execute(
-        "UPDATE inventories SET equipped = 0 WHERE id = ?",
-        (int(row["id"]),)
-    )
-    await db.commit()
-    return True
\ No newline at end of file
+    changed = await db.storage.set_item_equipped(int(user_id), str(item_id), False)
+    if changed:
+        await _refresh_equipped(db, int(user_id))
+    return changed
@@ -70,7 +70,7 @@ class CharacterCog(commands.Cog):
             return
 
         embed = discord.Embed(title=f"Compétences de {character.name}", color=discord.Color.purple())
-        skills_list = "\n".join([f"• {s.replace('_', ' ').capitalize()}" for s in character.skills])
+        skills_list = "\n".join([f"• {s.replace('_', ' ').capitalize()}" for s in sorted(character.skills)])
         embed.description = skills_list
         await interaction.followup.send(embed=embed)
 
@@ -4,6 +4,7 @@ from discord.ext import commands
 import traceback
 import sys
 
+from ..character import create_character, get_character, set_character_hp
 from ..models import RuntimeEntity
 from ..dice import d20
 from ..rules import resolve_attack, AttackType
@@ -14,52 +15,18 @@ async def fetch_player_entity(db, user_id: int) -> RuntimeEntity:
     Récupère ou crée une entité de joueur pour le combat
     """
 
-    # --- Nouvelle table characters ---
-    async with (await db.execute(
-        "SELECT * FROM characters WHERE user_id = ?",
-        (user_id,)
-    )) as cursor:
-        row = await cursor.fetchone()
-
-    if row:
-        return RuntimeEntity(
-            name=row["name"],
-            hp=float(row["hp"]),
-            hp_max=float(row["hp_max"]),
-            mp=float(row["mp"]),
-            mp_max=float(row["mp_max"]),
-            STR=float(row["STR"]),
-            AGI=float(row["AGI"]),
-            INT=float(row["INT"]),
-            DEX=float(row["DEX"]),
-            VIT=float(row["VIT"]),
-        )
-
-    # --- Ancienne table players (fallback) ---
-    async with (await db.execute(
-        "SELECT * FROM players WHERE user_id = ?",
-        (user_id,)
-    )) as cursor:
-        row = await cursor.fetchone()
-
-    if row:
-        return RuntimeEntity(
-            name=row["name"],
-            hp=float(row["hp"]),
-            hp_max=float(row["hp_max"]),
-            mp=float(row["mp"]),
-            mp_max=float(row["mp_max"]),
-            STR=float(row["str"]),
-            AGI=float(row["agi"]),
-            INT=float(row["int_"]),
-            DEX=float(row["dex"]),
-            VIT=float(row["vit"]),
-        )
+    # Table characters, via le cache des personnages
+    character = await get_character(db, int(user_id))
 
     # Si aucune donnée n'est trouvée, créer un personnage par défaut
-    from ..character import create_character
-    character = await create_character(db, user_id, f"Joueur_{user_id}")
+    if character is None:
+        character = await create_character(db, user_id, f"Joueur_{user_id}")
 
+    return player_entity(character)
+
+
+def player_entity(character) -> RuntimeEntity:
+    """Entité de combat construite depuis un personnage déjà chargé."""
     return RuntimeEntity(
         name=character.name,
         hp=character.hp,
@@ -78,19 +45,8 @@ async def save_player_hp(db, user_id: int, hp: float) -> None:
     """
     Sauvegarde les HP d'un joueur après un combat
     """
-    # Mettre à jour la table characters
-    await db.execute(
-        "UPDATE characters SET hp = ? WHERE user_id = ?",
-        (hp, user_id)
-    )
-    await db.conn.commit()
-
-    # Pour la compatibilité, mettre également à jour l'ancienne table players
-    await db.execute(
-        "UPDATE players SET hp = ? WHERE user_id = ?",
-        (hp, user_id)
-    )
-    await db.conn.commit()
+    # Met à jour characters et le cache
+    await set_character_hp(db, int(user_id), float(hp))
 
 
 class CombatCog(commands.Cog):
@@ -121,37 +77,25 @@ class CombatCog(commands.Cog):
         vit_val: float,
     ):
         try:
-            await self.bot.db.conn.execute(
-                """
-                INSERT INTO players(user_id, name, hp, hp_max, mp, mp_max, str, agi, int_, dex, vit)
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET
-                  name=excluded.name,
-                  hp=excluded.hp,
-                  hp_max=excluded.hp_max,
-                  mp=excluded.mp,
-                  mp_max=excluded.mp_max,
-                  str=excluded.str,
-                  agi=excluded.agi,
-                  int_=excluded.int_,
-                  dex=excluded.dex,
-                  vit=excluded.vit
-                """,
-                (
-                    interaction.user.id,
-                    name,
-                    float(hp_max),
-                    float(hp_max),
-                    float(mp_max),
-                    float(mp_max),
-                    float(str_val),
-                    float(agi_val),
-                    float(int_val),
-                    float(dex_val),
-                    float(vit_val),
-                ),
-            )
-            await self.bot.db.conn.commit()
+            # Fiche de secours : seulement pour un joueur sans personnage, un
+            # personnage existant (et sa progression) n'est jamais réécrit
+            existing = await get_character(self.bot.db, interaction.user.id)
+            if existing is not None:
+                await interaction.response.send_message(
+                    f"Tu as déjà un personnage (**{existing.name}**) : sa fiche n'est pas modifiée.", ephemeral=True
+                )
+                return
+
+            async with self.bot.db.transaction():
+                character = await create_character(self.bot.db, interaction.user.id, name)
+                character.hp = character.hp_max = float(hp_max)
+                character.mp = character.mp_max = float(mp_max)
+                character.STR = float(str_val)
+                character.AGI = float(agi_val)
+                character.INT = float(int_val)
+                character.DEX = float(dex_val)
+                character.VIT = float(vit_val)
+                await character.save_to_db(self.bot.db)
 
             await interaction.response.send_message(f"Fiche enregistrée pour **{name}**.", ephemeral=True)
         except Exception as e:
@@ -191,29 +135,30 @@ class CombatCog(commands.Cog):
             rb = d20()
             result = resolve_attack(attacker, defender, ra, rb, attack_type=attack_type, perce_armure=perce_armure)
 
-            # Persist HP
-            await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
-            await save_player_hp(self.bot.db, target.id, defender.hp)
+            # Persist HP (un seul commit pour les deux joueurs)
+            async with self.bot.db.transaction():
+                await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
+                await save_player_hp(self.bot.db, target.id, defender.hp)
 
-            color = discord.Color.red() if result["hit"] else discord.Color.dark_gray()
+            color = discord.Color.red() if result.hit else discord.Color.dark_gray()
             embed = discord.Embed(title="⚔️ Résolution d'attaque", color=color)
             embed.add_field(name="Type", value=str(attack_type), inline=True)
             embed.add_field(name="Perce-armure", value="Oui" if perce_armure else "Non", inline=True)
-            embed.add_field(name="Réduction VIT", value=f'{result["vit_term"]:.2f}', inline=True)
+            embed.add_field(name="Réduction VIT", value=f'{result.vit_term:.2f}', inline=True)
 
             embed.add_field(name="Jet attaquant (d20)", value=str(ra), inline=True)
             embed.add_field(name="Jet défenseur (d20)", value=str(rb), inline=True)
-            embed.add_field(name="Toucher A vs D", value=f'{result["hit_a"]:.2f} vs {result["hit_b"]:.2f}', inline=True)
+            embed.add_field(name="Toucher A vs D", value=f'{result.hit_a:.2f} vs {result.hit_b:.2f}', inline=True)
 
-            embed.add_field(name="Puissance (stat dégâts)", value=f'{result["atk_stat"]:.2f}', inline=True)
-            if result["hit"]:
-                embed.add_field(name="Dégâts", value=f'{result["raw"]["damage"]:.2f}', inline=True)
+            embed.add_field(name="Puissance (stat dégâts)", value=f'{result.atk_stat:.2f}', inline=True)
+            if result.hit:
+                embed.add_field(name="Dégâts", value=f'{result.damage:.2f}', inline=True)
             else:
-                embed.add_field(name="Défense (valeur)", value=f'{result["raw"].get("defense_value", 0.0):.2f}', inline=True)
+                embed.add_field(name="Défense (valeur)", value=f'{result.defense_value:.2f}', inline=True)
 
             embed.add_field(
                 name="Log",
-                value="\n".join(result["effects"]) if result["effects"] else "—",
+                value=result.text(),
                 inline=False,
             )
 
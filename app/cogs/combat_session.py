@@ -7,10 +7,13 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from app.character import get_character
 from app.cogs.combat import fetch_player_entity
 from app import db
+from app.combat_actor import combat_actor
 from app.combat_session import (
     CombatError,
+    combat_cancel,
     combat_create,
     combat_close,
     combat_get_thread_id,
@@ -45,12 +48,9 @@ async def compute_party_average_level(db, thread_id: int) -> int:
 
     levels: list[int] = []
     for uid in user_ids:
-        row = await db.execute_fetchone(
-            "SELECT level FROM characters WHERE user_id = ?",
-            (int(uid),),
-        )
-        if row and row["level"] is not None:
-            levels.append(int(row["level"]))
+        character = await get_character(db, int(uid))
+        if character and character.level is not None:
+            levels.append(int(character.level))
 
     if not levels:
         return 1
@@ -356,11 +356,7 @@ class CombatSessionCog(commands.Cog):
             )
             # Annuler le combat créé dans la base de données
             if combat_id is not None:
-                await self.bot.db.conn.execute(
-                    "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
-                    (combat_id,),
-                )
-                await self.bot.db.conn.commit()
+                await combat_cancel(self.bot.db, combat_id)
             return
 
         except Exception as e:
@@ -370,11 +366,7 @@ class CombatSessionCog(commands.Cog):
             )
             # Annuler le combat créé dans la base de données
             if combat_id is not None:
-                await self.bot.db.conn.execute(
-                    "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
-                    (combat_id,),
-                )
-                await self.bot.db.conn.commit()
+                await combat_cancel(self.bot.db, combat_id)
             # Optionnel: supprimer le thread si créé
             if thread is not None:
                 try:
@@ -422,17 +414,22 @@ class CombatSessionCog(commands.Cog):
             thread = threads[0]
             thread_id = thread.id
 
-        await participants_add(self.bot.db, thread_id, member.id, added_by=interaction.user.id)
-        await log_add(
-            self.bot.db, thread_id, "system", f"{member} ajouté au combat par {interaction.user}."
-        )
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
 
-        try:
-            await thread.add_user(member)
-        except Exception:
-            pass
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            await participants_add(self.bot.db, thread_id, member.id, added_by=interaction.user.id)
+            await log_add(
+                self.bot.db, thread_id, "system", f"{member} ajouté au combat par {interaction.user}."
+            )
 
-        await interaction.response.send_message(f"{member.mention} ajouté. Fil: {thread.mention}")
+            try:
+                await thread.add_user(member)
+            except Exception:
+                pass
+
+            await interaction.followup.send(f"{member.mention} ajouté. Fil: {thread.mention}")
 
     @app_commands.command(name="combat_end", description="Termine le combat actif dans ce fil")
     async def combat_end(self, interaction: discord.Interaction):
@@ -474,20 +471,22 @@ class CombatSessionCog(commands.Cog):
                 thread = threads[0]
                 thread_id = thread.id
 
-            logger.info(f"Fermeture du combat dans le fil {thread_id} par {interaction.user.id}")
+            # Une commande à la fois par combat (voir app.combat_actor)
+            async with combat_actor(self.bot.db, thread_id):
+                logger.info(f"Fermeture du combat dans le fil {thread_id} par {interaction.user.id}")
 
-            # 1. Log système et fermeture en base de données
-            await log_add(self.bot.db, thread_id, "system", f"Combat terminé par {interaction.user}.")
-            await combat_close(self.bot.db, thread_id)
+                # 1. Log système et fermeture en base de données
+                await log_add(self.bot.db, thread_id, "system", f"Combat terminé par {interaction.user}.")
+                await combat_close(self.bot.db, thread_id)
 
-            # 2. Archivage du fil
-            try:
-                await thread.edit(archived=True, locked=True)
-            except Exception as e:
-                logger.error(f"Erreur lors de l'archivage du thread: {str(e)}", exc_info=True)
+                # 2. Archivage du fil
+                try:
+                    await thread.edit(archived=True, locked=True)
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'archivage du thread: {str(e)}", exc_info=True)
 
-            # 3. Répondre à l'interaction
-            await interaction.followup.send("Combat terminé. Le fil a été archivé.", ephemeral=False)
+                # 3. Répondre à l'interaction
+                await interaction.followup.send("Combat terminé. Le fil a été archivé.", ephemeral=False)
 
         except Exception as e:
             logger.error(f"Erreur dans /combat_end: {str(e)}", exc_info=True)
@@ -496,6 +495,73 @@ class CombatSessionCog(commands.Cog):
                 ephemeral=True,
             )
 
+    @app_commands.command(
+        name="combat_history",
+        description="Relit le journal d'un combat terminé (archive)",
+    )
+    @app_commands.describe(combat_id="Numéro du combat archivé (par défaut : le dernier de ce fil)")
+    async def combat_history(self, interaction: discord.Interaction, combat_id: int | None = None):
+        if not interaction.guild or not interaction.channel:
+            await interaction.response.send_message("Commande serveur uniquement.", ephemeral=True)
+            return
+
+        storage = self.bot.db.storage
+        channel = interaction.channel
+        in_thread = isinstance(channel, discord.Thread)
+
+        if combat_id is not None:
+            archive = await storage.get_archived_combat(combat_id)
+            # Uniquement les combats de ce salon (ou du fil lui-même)
+            visible = {channel.id, getattr(channel, "parent_id", None)}
+            if archive and archive["channel_id"] not in visible and archive["thread_id"] != channel.id:
+                archive = None
+        elif in_thread:
+            archive = await storage.get_last_archived_combat(channel.id)
+        else:
+            # Depuis le salon : liste des derniers combats archivés
+            rows = await storage.list_archived_combats(channel.id, 10)
+            if not rows:
+                await interaction.response.send_message("Aucun combat archivé dans ce salon.", ephemeral=True)
+                return
+            lines = [
+                f"**#{r['combat_id']}** — fil <#{r['thread_id']}> — fermé le {r['closed_at']} — "
+                f"{r['log_count']} ligne(s) de journal"
+                for r in rows
+            ]
+            await interaction.response.send_message(
+                "## Combats archivés\n" + "\n".join(lines) + "\n\nUtilise `/combat_history combat_id:<numéro>` pour relire un journal.",
+                ephemeral=True,
+            )
+            return
+
+        if not archive:
+            await interaction.response.send_message("Aucun combat archivé trouvé.", ephemeral=True)
+            return
+
+        participants = ", ".join(f"<@{uid}>" for uid in archive["participants"]) or "—"
+        header = (
+            f"## Combat #{archive['combat_id']}\n"
+            f"Du {archive['created_at']} au {archive['closed_at']} — participants : {participants}\n"
+        )
+        if archive["mobs"]:
+            header += "Mobs restants : " + ", ".join(
+                f"{m['mob_name']} ({m['hp']:.0f}/{m['hp_max']:.0f} PV)" for m in archive["mobs"]
+            ) + "\n"
+
+        # On garde la fin du journal si tout ne tient pas dans un message
+        lines: list[str] = []
+        size = len(header)
+        for log in reversed(archive["logs"]):
+            line = f"[{log['created_at']}] {log['kind']}: {log['message']}"
+            if size + len(line) + 1 > 1900:
+                lines.append("...")
+                break
+            lines.append(line)
+            size += len(line) + 1
+
+        body = "\n".join(reversed(lines)) or "(journal vide)"
+        await interaction.response.send_message(f"{header}```\n{body}\n```", ephemeral=True)
+
     @app_commands.command(
         name="initiative",
         description="Affiche l'ordre de passage basé sur l'agilité",
@@ -560,7 +626,7 @@ class CombatSessionCog(commands.Cog):
         mob_rows = await list_mobs(self.bot.db, thread_id)
         for m in mob_rows:
             try:
-                ent = await fetch_mob_entity(self.bot.db, thread_id, m["mob_name"])
+                ent = await fetch_mob_entity(self.bot.db, thread_id, m.mob_name)
                 if ent:
                     entities.append(ent)
             except Exception:
@@ -5,26 +5,31 @@ import logging
 import asyncio
 from discord import app_commands
 from discord.ext import commands
-from typing import Dict, Optional
+from typing import Optional
 
-from ..combat_session_manager import CombatSession, get_or_create_session
+from ..combat_session_manager import (
+    PACING_DETAILED,
+    PACING_GROUPED,
+    CombatSession,
+    get_or_create_session,
+    mob_attack_embed,
+    mob_phase_embeds,
+)
+from ..combat_actor import combat_actor
 from ..combat_session import combat_is_active, log_add
 from ..combat_mobs import save_mob_hp, cleanup_dead_mobs
 from ..cogs.combat import save_player_hp
+from ..models import RuntimeEntity
 
 logger = logging.getLogger('bofuri.combat_turn')
 
 class CombatTurnCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.active_sessions: Dict[int, CombatSession] = {}  # thread_id -> CombatSession
     
     async def _get_or_create_session(self, thread_id: int) -> CombatSession:
-        """Récupère ou crée une session de combat pour un thread donné"""
-        if thread_id not in self.active_sessions:
-            session = await get_or_create_session(self.bot.db, thread_id)
-            self.active_sessions[thread_id] = session
-        return self.active_sessions[thread_id]
+        """Récupère (magasin borné, resynchronisée avec la base) ou crée la session d'un fil"""
+        return await get_or_create_session(self.bot.db, thread_id)
     
     def _require_thread(self, interaction: discord.Interaction) -> Optional[discord.Thread]:
         """Vérifie que l'interaction a lieu dans un thread et le retourne"""
@@ -50,77 +55,144 @@ class CombatTurnCog(commands.Cog):
         # Réponse différée pour éviter le timeout
         await interaction.response.defer()
         
-        # Récupérer la session de combat
-        session = await self._get_or_create_session(thread_id)
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            # Récupérer la session de combat
+            session = await self._get_or_create_session(thread_id)
+            if session.mob_phase_running:
+                await interaction.followup.send("⏳ Le tour des mobs est déjà en cours.")
+                return
         
-        # Nettoyer les mobs morts avant de commencer
-        await cleanup_dead_mobs(self.bot.db, thread_id)
+            # Nettoyer les mobs morts avant de commencer
+            await cleanup_dead_mobs(self.bot.db, thread_id)
         
-        # Passer au tour suivant
-        found_next_actor = session.advance_turn()
-        if not found_next_actor:
-            await interaction.followup.send("⚠️ Impossible de trouver un participant en vie pour le prochain tour.")
-            return
+            # Passer au tour suivant
+            found_next_actor = session.advance_turn()
+            await session.save_state()
+            if not found_next_actor:
+                await interaction.followup.send("⚠️ Impossible de trouver un participant en vie pour le prochain tour.")
+                return
             
-        current_actor = session.current_actor
+            current_actor = session.current_actor
         
-        if not current_actor:
-            await interaction.followup.send("Aucun participant dans ce combat.")
+            if not current_actor:
+                await interaction.followup.send("Aucun participant dans ce combat.")
+                return
+        
+            # Rythme groupé : toute la phase des mobs en un seul message
+            embeds = []
+            pacing = session.pacing or self.bot.config.COMBAT_PACING
+            if pacing == PACING_GROUPED and current_actor.is_mob and current_actor.hp > 0:
+                phase = await session.run_mob_phase()
+                embeds = mob_phase_embeds(phase)
+                if phase.players_ko:
+                    await interaction.followup.send("💀 Tous les joueurs sont KO ! Le combat est terminé.", embeds=embeds)
+                    await log_add(self.bot.db, thread_id, "system", "Combat terminé : tous les joueurs sont KO.")
+                    try:
+                        await thread.edit(archived=True, locked=True)
+                    except Exception as e:
+                        logger.error(f"Erreur lors de l'archivage du thread: {e}")
+                    return
+                if phase.stalled:
+                    await interaction.followup.send("⚠️ Plus aucun participant en vie pour continuer le combat.", embeds=embeds)
+                    return
+                current_actor = session.current_actor
+
+            detailed = current_actor.is_mob and current_actor.hp > 0
+            if detailed:
+                session.mob_phase_running = True
+
+        if detailed:
+            try:
+                current_actor = await self._run_detailed_mob_phase(session, thread, current_actor)
+            finally:
+                session.mob_phase_running = False
+            if current_actor is None:
+                return
+        
+        # Une fois que c'est à un joueur de jouer, on notifie
+        # Vérifier que le joueur est en vie (par sécurité)
+        if not current_actor or current_actor.hp <= 0:
+            await interaction.followup.send("⚠️ Le joueur suivant n'est plus en vie. Utilisez `/next_turn` à nouveau.", embeds=embeds)
             return
         
-        # Boucle pour gérer les tours des mobs automatiquement
+        user_id = session.get_user_id_for_entity(current_actor)
+        if user_id:
+            user_mention = f"<@{user_id}>"
+            await interaction.followup.send(f"👉 C'est au tour de {user_mention} ({current_actor.name}) !", embeds=embeds)
+        else:
+            await interaction.followup.send(f"👉 C'est au tour de **{current_actor.name}** !", embeds=embeds)
+
+    async def _run_detailed_mob_phase(self, session: CombatSession, thread: discord.Thread,
+                                      current_actor: RuntimeEntity) -> Optional[RuntimeEntity]:
+        """
+        Rythme détaillé : les mobs jouent un par un, avec un message et une
+        pause entre chacun. L'acteur du combat n'est tenu que pendant le
+        calcul et les écritures de chaque tour : les autres commandes du
+        combat passent pendant les envois et les pauses.
+
+        Retourne le joueur dont c'est le tour, ou None si le combat s'arrête.
+        """
+        thread_id = thread.id
         while current_actor.is_mob and current_actor.hp > 0:
             # Ajouter un message pour indiquer que c'est au tour du mob
             await thread.send(f"🎲 C'est au tour de **{current_actor.name}**...")
-            
+        
             # Petite pause pour créer un effet de tour par tour
             await asyncio.sleep(1)
+        
+            async with combat_actor(self.bot.db, thread_id):
+                if not await combat_is_active(self.bot.db, thread_id):
+                    return None
+                # D'autres commandes (/atk_mob, /atk_player...) ont pu jouer
+                # pendant la pause : PV relus depuis la base avant d'attaquer
+                await session.refresh()
+                mob = session.current_actor
+                if mob is None:
+                    return None
+
+                # Exécuter le tour du mob (s'il est toujours en vie après la pause)
+                attack = await session.play_mob_turn(mob) if mob.is_mob and mob.hp > 0 else None
             
-            # Exécuter le tour du mob
-            await session.execute_mob_turn(current_actor, thread)
-            
-            # Sauvegarder les changements si le mob a été modifié
-            mob_name = session.get_mob_name_for_entity(current_actor)
-            if mob_name:
-                await save_mob_hp(self.bot.db, thread_id, mob_name, current_actor.hp)
-            
-            # Nettoyer les mobs morts
-            await cleanup_dead_mobs(self.bot.db, thread_id)
+                # Sauvegarder les changements si le mob a été modifié et nettoyer les mobs morts
+                mob_name = session.get_mob_name_for_entity(mob)
+                async with self.bot.db.transaction():
+                    if mob_name:
+                        await save_mob_hp(self.bot.db, thread_id, mob_name, mob.hp)
+                    await cleanup_dead_mobs(self.bot.db, thread_id)
             
-            # Vérifier si le combat est terminé (tous les joueurs sont KO)
-            alive_players = [p for p in session.participants if not p.is_mob and p.hp > 0]
-            if not alive_players:
+                # Vérifier si le combat est terminé (tous les joueurs sont KO)
+                alive_players = [p for p in session.participants if not p.is_mob and p.hp > 0]
+                players_ko = not alive_players
+                if players_ko:
+                    await log_add(self.bot.db, thread_id, "system", "Combat terminé : tous les joueurs sont KO.")
+                    found_next_actor = False
+                else:
+                    # Passer au tour suivant
+                    found_next_actor = session.advance_turn()
+                    await session.save_state()
+                current_actor = session.current_actor
+
+            if attack:
+                await thread.send(embed=mob_attack_embed(attack))
+            elif mob.hp > 0:
+                await thread.send(f"🤔 **{mob.name}** ne trouve personne à attaquer...")
+
+            if players_ko:
                 await thread.send("💀 Tous les joueurs sont KO ! Le combat est terminé.")
-                await log_add(self.bot.db, thread_id, "system", "Combat terminé : tous les joueurs sont KO.")
                 try:
                     await thread.edit(archived=True, locked=True)
                 except Exception as e:
                     logger.error(f"Erreur lors de l'archivage du thread: {e}")
-                return
-            
-            # Passer au tour suivant
-            found_next_actor = session.advance_turn()
+                return None
             if not found_next_actor:
                 await thread.send("⚠️ Plus aucun participant en vie pour continuer le combat.")
-                return
-                
-            current_actor = session.current_actor
-            
-            # Pause entre les tours de mobs pour éviter le spam
-            await asyncio.sleep(1)
+                return None
         
-        # Une fois que c'est à un joueur de jouer, on notifie
-        # Vérifier que le joueur est en vie (par sécurité)
-        if not current_actor or current_actor.hp <= 0:
-            await interaction.followup.send("⚠️ Le joueur suivant n'est plus en vie. Utilisez `/next_turn` à nouveau.")
-            return
-            
-        user_id = session.get_user_id_for_entity(current_actor)
-        if user_id:
-            user_mention = f"<@{user_id}>"
-            await interaction.followup.send(f"👉 C'est au tour de {user_mention} ({current_actor.name}) !")
-        else:
-            await interaction.followup.send(f"👉 C'est au tour de **{current_actor.name}** !")
+            # Pause entre les tours de mobs pour éviter le spam
+            if current_actor.is_mob:
+                await asyncio.sleep(1)
+        return current_actor
     
     @app_commands.command(name="provoke", description="Provoque un mob pour qu'il vous attaque en priorité")
     @app_commands.describe(mob_name="Nom exact du mob à provoquer")
@@ -138,35 +210,70 @@ class CombatTurnCog(commands.Cog):
             await interaction.response.send_message("Aucun combat actif dans ce fil.", ephemeral=True)
             return
         
-        # Récupérer la session de combat
-        session = await self._get_or_create_session(thread_id)
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
+
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            # Récupérer la session de combat
+            session = await self._get_or_create_session(thread_id)
         
-        # Vérifier que le mob existe
-        mob_entity = session.mob_name_to_entity.get(mob_name)
-        if not mob_entity:
-            await interaction.response.send_message(f"Mob introuvable: **{mob_name}**. Utilisez `/mob_list`.", ephemeral=True)
-            return
+            # Vérifier que le mob existe
+            mob_entity = session.mob_name_to_entity.get(mob_name)
+            if not mob_entity:
+                await interaction.followup.send(f"Mob introuvable: **{mob_name}**. Utilisez `/mob_list`.", ephemeral=True)
+                return
             
-        # Vérifier que le mob est en vie
-        if mob_entity.hp <= 0:
-            await interaction.response.send_message(f"**{mob_name}** est déjà mort et ne peut pas être provoqué.", ephemeral=True)
-            return
+            # Vérifier que le mob est en vie
+            if mob_entity.hp <= 0:
+                await interaction.followup.send(f"**{mob_name}** est déjà mort et ne peut pas être provoqué.", ephemeral=True)
+                return
         
-        # Récupérer l'entité du joueur
-        player_entity = session.user_id_to_entity.get(interaction.user.id)
-        if not player_entity:
-            await interaction.response.send_message("Vous n'êtes pas un participant de ce combat.", ephemeral=True)
-            return
+            # Récupérer l'entité du joueur
+            player_entity = session.user_id_to_entity.get(interaction.user.id)
+            if not player_entity:
+                await interaction.followup.send("Vous n'êtes pas un participant de ce combat.", ephemeral=True)
+                return
             
-        # Vérifier que le joueur est en vie
-        if player_entity.hp <= 0:
-            await interaction.response.send_message("Vous ne pouvez pas provoquer un mob lorsque vous êtes KO.", ephemeral=True)
+            # Vérifier que le joueur est en vie
+            if player_entity.hp <= 0:
+                await interaction.followup.send("Vous ne pouvez pas provoquer un mob lorsque vous êtes KO.", ephemeral=True)
+                return
+        
+            # Provoquer le mob
+            session.provoke(mob_entity, player_entity)
+            await session.save_state()
+        
+            await interaction.followup.send(f"🔥 **{player_entity.name}** provoque **{mob_name}** qui va maintenant le cibler en priorité !")
+
+    @app_commands.command(name="combat_pacing", description="Choisit le rythme du tour des mobs pour ce combat")
+    @app_commands.describe(mode="Groupé : un seul message récapitulatif ; détaillé : un message par mob")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Groupé", value=PACING_GROUPED),
+        app_commands.Choice(name="Détaillé", value=PACING_DETAILED),
+    ])
+    async def combat_pacing(self, interaction: discord.Interaction, mode: app_commands.Choice[str]):
+        """Enregistre le rythme du tour des mobs dans l'état du combat"""
+        thread = self._require_thread(interaction)
+        if not thread:
+            await interaction.response.send_message("Utilisez cette commande dans un fil de combat.", ephemeral=True)
+            return
+        
+        thread_id = thread.id
+        if not await combat_is_active(self.bot.db, thread_id):
+            await interaction.response.send_message("Aucun combat actif dans ce fil.", ephemeral=True)
             return
         
-        # Provoquer le mob
-        mob_entity.provoked_by = player_entity
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
+
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            session = await self._get_or_create_session(thread_id)
+            session.pacing = mode.value
+            await session.save_pacing()
         
-        await interaction.response.send_message(f"🔥 **{player_entity.name}** provoque **{mob_name}** qui va maintenant le cibler en priorité !")
+            await interaction.followup.send(f"⏱️ Rythme du tour des mobs : **{mode.name}**.")
 
     @app_commands.command(name="show_turn", description="Affiche de qui c'est le tour actuellement")
     async def show_turn(self, interaction: discord.Interaction):
@@ -183,30 +290,37 @@ class CombatTurnCog(commands.Cog):
             await interaction.response.send_message("Aucun combat actif dans ce fil.", ephemeral=True)
             return
         
-        # Récupérer la session de combat
-        session = await self._get_or_create_session(thread_id)
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
+
+        # Une commande à la fois par combat (voir app.combat_actor) : la
+        # session partagée est resynchronisée avec la base
+        async with combat_actor(self.bot.db, thread_id):
+            # Récupérer la session de combat
+            session = await self._get_or_create_session(thread_id)
         
-        # Récupérer l'acteur actuel
-        current_actor = session.current_actor
-        if not current_actor:
-            await interaction.response.send_message("Aucun participant dans ce combat.")
-            return
+            # Récupérer l'acteur actuel
+            current_actor = session.current_actor
+            if not current_actor:
+                await interaction.followup.send("Aucun participant dans ce combat.")
+                return
             
-        # Vérifier que l'acteur actuel est en vie
-        if current_actor.hp <= 0:
-            await interaction.response.send_message("⚠️ Le tour actuel est attribué à un participant KO. Utilisez `/next_turn` pour passer au suivant.")
-            return
+            # Vérifier que l'acteur actuel est en vie
+            if current_actor.hp <= 0:
+                await interaction.followup.send("⚠️ Le tour actuel est attribué à un participant KO. Utilisez `/next_turn` pour passer au suivant.")
+                return
         
-        # Afficher de qui c'est le tour
-        if current_actor.is_mob:
-            await interaction.response.send_message(f"🎲 C'est au tour de **{current_actor.name}** (mob).")
-        else:
-            user_id = session.get_user_id_for_entity(current_actor)
-            if user_id:
-                user_mention = f"<@{user_id}>"
-                await interaction.response.send_message(f"👉 C'est au tour de {user_mention} ({current_actor.name}).")
+            # Afficher de qui c'est le tour
+            manche = f"Manche {session.round} — "
+            if current_actor.is_mob:
+                await interaction.followup.send(f"{manche}🎲 C'est au tour de **{current_actor.name}** (mob).")
             else:
-                await interaction.response.send_message(f"👉 C'est au tour de **{current_actor.name}**.")
+                user_id = session.get_user_id_for_entity(current_actor)
+                if user_id:
+                    user_mention = f"<@{user_id}>"
+                    await interaction.followup.send(f"{manche}👉 C'est au tour de {user_mention} ({current_actor.name}).")
+                else:
+                    await interaction.followup.send(f"{manche}👉 C'est au tour de **{current_actor.name}**.")
 
 async def setup(bot):
     await bot.add_cog(CombatTurnCog(bot))
@@ -3,6 +3,8 @@ from discord.ext import commands
 import discord
 import logging
 
+from app.combat_session import combat_close_channel
+
 
 class DebugCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -16,10 +18,7 @@ class DebugCog(commands.Cog):
             await interaction.response.defer(ephemeral=True)
 
             # Récupérer tous les combats pour ce canal
-            combats = await self.bot.db.execute_fetchall(
-                "SELECT * FROM combats WHERE channel_id = ?",
-                (interaction.channel_id,)
-            )
+            combats = await self.bot.db.storage.list_combats(interaction.channel_id)
 
             if not combats:
                 await interaction.followup.send("Aucun combat trouvé pour ce salon.")
@@ -28,19 +27,16 @@ class DebugCog(commands.Cog):
             # Formater les résultats
             lines = []
             for c in combats:
-                lines.append(f"ID: {c['id']}, Status: {c['status']}, Thread: {c['thread_id'] or 'None'}, "
-                             f"Created by: {c['created_by']}, Created at: {c['created_at']}, "
-                             f"Closed at: {c['closed_at'] or 'None'}")
+                lines.append(f"ID: {c.id}, Status: {c.status}, Thread: {c.thread_id or 'None'}, "
+                             f"Created by: {c.created_by}, Created at: {c.created_at}, "
+                             f"Closed at: {c.closed_at or 'None'}")
 
             await interaction.followup.send("## Combats dans ce salon\n" + "\n".join(lines))
 
             # Vérifier s'il y a des combats actifs
-            active = await self.bot.db.execute_fetchone(
-                "SELECT COUNT(*) as count FROM combats WHERE channel_id = ? AND status = 'active'",
-                (interaction.channel_id,)
-            )
+            active = sum(1 for c in combats if c.status == 'active')
 
-            await interaction.followup.send(f"Nombre de combats actifs: {active['count']}")
+            await interaction.followup.send(f"Nombre de combats actifs: {active}")
 
         except Exception as e:
             logger.error(f"Erreur dans /debug_combats: {str(e)}", exc_info=True)
@@ -54,15 +50,41 @@ class DebugCog(commands.Cog):
             await interaction.response.defer(ephemeral=True)
 
             # Fermer tous les combats actifs dans ce salon
-            await self.bot.db.conn.execute(
-                "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP "
-                "WHERE channel_id = ? AND status = 'active'",
-                (interaction.channel_id,)
-            )
-            await self.bot.db.conn.commit()
+            await combat_close_channel(self.bot.db, interaction.channel_id)
 
             await interaction.followup.send("Tous les combats actifs ont été fermés dans ce salon.")
 
         except Exception as e:
             logger.error(f"Erreur dans /fix_combats: {str(e)}", exc_info=True)
-            await interaction.followup.send(f"Une erreur est survenue: {str(e)}")
\ No newline at end of file
+            await interaction.followup.send(f"Une erreur est survenue: {str(e)}")
+
+    @app_commands.command(name="db_stats", description="ADMIN: Requêtes SQL les plus coûteuses (latence cumulée)")
+    @app_commands.describe(limit="Nombre de requêtes à afficher", reset="Remettre les compteurs à zéro après affichage")
+    @app_commands.default_permissions(administrator=True)
+    async def db_stats(self, interaction: discord.Interaction, limit: int = 10, reset: bool = False):
+        stats = self.bot.db.stats
+        if stats is None:
+            await interaction.response.send_message(
+                "Instrumentation désactivée. Active-la avec `DB_INSTRUMENT=1` dans le `.env`.", ephemeral=True
+            )
+            return
+
+        top = stats.top(max(1, min(limit, 25)))
+        if not top:
+            await interaction.response.send_message("Aucune requête enregistrée pour l'instant.", ephemeral=True)
+            return
+
+        lines = ["appels  total ms   p50    p95    p99    max  requête"]
+        for st in top:
+            sql = st.fingerprint if len(st.fingerprint) <= 80 else st.fingerprint[:77] + "..."
+            lines.append(
+                f"{st.calls:>6} {st.total_ms:>9.1f} {st.percentile(50):>6.2f} {st.percentile(95):>6.2f} "
+                f"{st.percentile(99):>6.2f} {st.max_ms:>6.1f}  {sql}"
+            )
+
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1900] + "\n..."
+        if reset:
+            stats.reset()
+        await interaction.response.send_message(f"## Requêtes SQL (seuil lent: {stats.slow_query_ms:.0f} ms)\n```\n{text}\n```", ephemeral=True)
@@ -21,8 +21,12 @@ from app.dice import d20
 from app.models import RuntimeEntity
 from app.rules import resolve_attack, AttackType, calculate_xp_amount
 from app.cogs.combat import fetch_player_entity, save_player_hp
+from app.combat_actor import combat_actor
+from app.combat_events import attack_events, mob_actor, player_actor, record_events
+from app.combat_session_manager import mob_attack_type
+from app.odds import ExchangeOdds, expected_exchange
 from app.combat_session import combat_is_active, combat_close, participants_add, participants_list
-from app.character import get_character, add_xp, add_item_to_inventory
+from app.character import get_character, add_xp, add_item_to_inventory, set_character_mp
 from app.items import ITEM_REGISTRY, ItemDefinition
 import random
 import logging
@@ -82,16 +86,18 @@ class MobsCog(commands.Cog):
         thread_id = thread.id
         if not await combat_is_active(self.bot.db, thread_id):
             return await interaction.followup.send("Aucun combat actif dans ce fil. Utilise /combat_start.", ephemeral=True)
-        defn = REGISTRY.get(key)
-        if not defn:
-            return await interaction.followup.send("Key inconnue. Utilise /mobs.", ephemeral=True)
-        mob_name = await next_unique_mob_name(self.bot.db, thread_id, defn.display_name)
-        ent = spawn_entity(defn, level=level, instance_name=mob_name)
-        await insert_mob(self.bot.db, thread_id, mob_name, defn.key, level, ent, created_by=interaction.user.id)
-
-        await interaction.followup.send(
-            f"Mob spawné: **{mob_name}** (`{defn.key}` lvl {level}) — PV {ent.hp:.0f}/{ent.hp_max:.0f}"
-        )
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            defn = REGISTRY.get(key)
+            if not defn:
+                return await interaction.followup.send("Key inconnue. Utilise /mobs.", ephemeral=True)
+            mob_name = await next_unique_mob_name(self.bot.db, thread_id, defn.display_name)
+            ent = spawn_entity(defn, level=level, instance_name=mob_name)
+            await insert_mob(self.bot.db, thread_id, mob_name, defn.key, level, ent, created_by=interaction.user.id)
+
+            await interaction.followup.send(
+                f"Mob spawné: **{mob_name}** (`{defn.key}` lvl {level}) — PV {ent.hp:.0f}/{ent.hp_max:.0f}"
+            )
 
     @app_commands.command(name="mob_list", description="Liste les mobs présents dans ce fil de combat")
     async def mob_list(self, interaction: discord.Interaction):
@@ -109,7 +115,7 @@ class MobsCog(commands.Cog):
         if not rows:
             return await interaction.followup.send("Aucun mob dans ce fil.", ephemeral=True)
         lines = [
-            f"- **{r['mob_name']}** — `{r['mob_key']}` lvl {r['level']} — PV {float(r['hp']):.2f}/{float(r['hp_max']):.2f}"
+            f"- **{r.mob_name}** — `{r.mob_key}` lvl {r.level} — PV {r.hp:.2f}/{r.hp_max:.2f}"
             for r in rows
         ]
         await interaction.followup.send("## Mobs du fil\n" + "\n".join(lines))
@@ -128,79 +134,144 @@ class MobsCog(commands.Cog):
         if not await combat_is_active(self.bot.db, thread_id):
             return await interaction.followup.send("Aucun combat actif ici. Utilise /combat_start.", ephemeral=True)
 
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            char_data = await get_character(self.bot.db, interaction.user.id)
+            if not char_data:
+                return await interaction.followup.send("Personnage introuvable. Utilise /profile.", ephemeral=True)
+
+            attacker = await fetch_player_entity(self.bot.db,
+                                                 interaction.user.id)  # <- version unique depuis app.cogs.combat
+            defender = await fetch_mob_entity(self.bot.db, thread_id, mob_name)
+            if not defender:
+                return await interaction.followup.send(f"Mob introuvable: **{mob_name}**. Utilise `/mob_list`.",
+                                                       ephemeral=True)
+
+            perce_armure = "perce_defense" in char_data.skills
+            mana_cost = 10 if attack_type == "magic" else 0
+
+            if attacker.mp < mana_cost:
+                return await interaction.followup.send(
+                    f"Mana insuffisant (requis {mana_cost}, actuel {attacker.mp:.0f}).",
+                    ephemeral=True
+                )
+
+            # Tout l'échange (MP, PV, mobs morts, XP) est commité une seule fois
+            xp_gain = 0
+            async with self.bot.db.transaction():
+                # Dépenser MP si besoin
+                if mana_cost:
+                    attacker.mp -= mana_cost
+                    await set_character_mp(self.bot.db, interaction.user.id, attacker.mp)
+
+                ra, rb = d20(), d20()
+                result = resolve_attack(attacker, defender, ra, rb, attack_type=attack_type, perce_armure=perce_armure)
+
+                # Riposte si le mob est encore vivant
+                riposte_result = None
+                events = attack_events(player_actor(interaction.user.id), mob_actor(mob_name), attack_type, ra, rb,
+                                       result, defender.hp)
+                if defender.hp > 0:
+                    rra, rrb = d20(), d20()
+                    riposte_result = resolve_attack(defender, attacker, rra, rrb, attack_type="phys")
+                    events += attack_events(mob_actor(mob_name), player_actor(interaction.user.id), "phys", rra, rrb,
+                                            riposte_result, attacker.hp)
+
+                # Persist HP
+                await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
+                await save_mob_hp(self.bot.db, thread_id, mob_name, defender.hp)
+                await cleanup_dead_mobs(self.bot.db, thread_id)
+                await record_events(self.bot.db, thread_id, events)
+
+                # Récompenses XP si mob mort
+                if defender.hp <= 0:
+                    xp_gain = 25
+                    await add_xp(self.bot.db, interaction.user.id, xp_gain)
+
+            # Embed (toujours envoyé)
+            embed = discord.Embed(
+                title="⚔️ Échange de Combat",
+                color=discord.Color.red() if result.hit else discord.Color.dark_gray()
+            )
+            embed.add_field(name=f"▶️ Ton action ({attack_type})", value=result.text(), inline=False)
+
+            if riposte_result:
+                embed.add_field(name=f"🔄 Riposte de {defender.name}", value=riposte_result.text(),
+                                inline=False)
+
+            embed.add_field(name="État du mob", value=f"PV: {defender.hp:.0f}/{defender.hp_max:.0f}", inline=False)
+            embed.set_footer(
+                text=f"Toi — PV: {attacker.hp:.0f}/{attacker.hp_max:.0f} | MP: {attacker.mp:.0f}/{attacker.mp_max:.0f}")
+
+            if xp_gain:
+                embed.add_field(name="Victoire", value=f"✨ Tu gagnes {xp_gain} XP !", inline=False)
+
+            await interaction.followup.send(embed=embed)
+
+            # Mort du joueur -> fin combat
+            if attacker.hp <= 0:
+                await combat_close(self.bot.db, thread_id)
+                try:
+                    await thread.send("💀 Défait... Le combat s'arrête.")
+                    await thread.edit(archived=True, locked=True)
+                except Exception:
+                    pass
+
+    @app_commands.command(name="atk_preview", description="Chances et dégâts moyens d'une attaque sur un mob, sans lancer de dés")
+    @app_commands.describe(mob_name='Nom exact, ex: "Lapin végétal#1"', attack_type="phys, magic, ranged")
+    async def atk_preview(self, interaction: discord.Interaction, mob_name: str, attack_type: AttackType = "phys"):
+        thread = self._require_thread(interaction)
+        if not thread:
+            return await interaction.response.send_message("Utilise cette commande **dans le fil de combat**.", ephemeral=True)
+
+        # Lecture seule : ni dés, ni PV modifiés, pas besoin de l'acteur du combat
         char_data = await get_character(self.bot.db, interaction.user.id)
         if not char_data:
-            return await interaction.followup.send("Personnage introuvable. Utilise /profile.", ephemeral=True)
-
-        attacker = await fetch_player_entity(self.bot.db,
-                                             interaction.user.id)  # <- version unique depuis app.cogs.combat
-        defender = await fetch_mob_entity(self.bot.db, thread_id, mob_name)
-        if not defender:
-            return await interaction.followup.send(f"Mob introuvable: **{mob_name}**. Utilise `/mob_list`.",
-                                                   ephemeral=True)
-
-        perce_armure = "perce_defense" in getattr(char_data, "skills", [])
-        mana_cost = 10 if attack_type == "magic" else 0
-
-        if attacker.mp < mana_cost:
-            return await interaction.followup.send(
-                f"Mana insuffisant (requis {mana_cost}, actuel {attacker.mp:.0f}).",
-                ephemeral=True
-            )
+            return await interaction.response.send_message("Personnage introuvable. Utilise /profile.", ephemeral=True)
+        try:
+            attacker = await fetch_player_entity(self.bot.db, interaction.user.id)
+            defender = await fetch_mob_entity(self.bot.db, thread.id, mob_name)
+        except ValueError:
+            return await interaction.response.send_message(f"Mob introuvable: **{mob_name}**. Utilise `/mob_list`.",
+                                                           ephemeral=True)
 
-        # Dépenser MP si besoin
-        if mana_cost:
-            attacker.mp -= mana_cost
-            await self.bot.db.conn.execute(
-                "UPDATE characters SET mp = ? WHERE user_id = ?",
-                (float(attacker.mp), int(interaction.user.id))
-            )
-            await self.bot.db.conn.commit()
-
-        ra, rb = d20(), d20()
-        result = resolve_attack(attacker, defender, ra, rb, attack_type=attack_type, perce_armure=perce_armure)
-
-        # Riposte si le mob est encore vivant
-        riposte_result = None
-        if defender.hp > 0:
-            riposte_result = resolve_attack(defender, attacker, d20(), d20(), attack_type="phys")
-
-        # Persist HP
-        await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
-        await save_mob_hp(self.bot.db, thread_id, mob_name, defender.hp)
-        await cleanup_dead_mobs(self.bot.db, thread_id)
-
-        # Embed (toujours envoyé)
-        embed = discord.Embed(
-            title="⚔️ Échange de Combat",
-            color=discord.Color.red() if result["hit"] else discord.Color.dark_gray()
-        )
-        embed.add_field(name=f"▶️ Ton action ({attack_type})", value="\n".join(result["effects"]) or "—", inline=False)
-
-        if riposte_result:
-            embed.add_field(name=f"🔄 Riposte de {defender.name}", value="\n".join(riposte_result["effects"]) or "—",
-                            inline=False)
-
-        embed.add_field(name="État du mob", value=f"PV: {defender.hp:.0f}/{defender.hp_max:.0f}", inline=False)
-        embed.set_footer(
-            text=f"Toi — PV: {attacker.hp:.0f}/{attacker.hp_max:.0f} | MP: {attacker.mp:.0f}/{attacker.mp_max:.0f}")
-
-        # Récompenses XP si mob mort
-        if defender.hp <= 0:
-            xp_gain = 25
-            await add_xp(self.bot.db, interaction.user.id, xp_gain)
-            embed.add_field(name="Victoire", value=f"✨ Tu gagnes {xp_gain} XP !", inline=False)
-
-        await interaction.followup.send(embed=embed)
-
-        # Mort du joueur -> fin combat
-        if attacker.hp <= 0:
-            await combat_close(self.bot.db, thread_id)
-            try:
-                await thread.send("💀 Défait... Le combat s'arrête.")
-                await thread.edit(archived=True, locked=True)
-            except Exception:
-                pass
+        perce_armure = "perce_defense" in char_data.skills
+        mob_type = mob_attack_type(defender)
+        own = expected_exchange(attacker, defender, attack_type, perce_armure)
+        riposte = expected_exchange(defender, attacker, "phys")
+        mob_turn = expected_exchange(defender, attacker, mob_type)
+
+        def odds_text(odds: ExchangeOdds, target: str) -> str:
+            lines = [
+                f"Toucher : **{odds.hit_chance:.0%}**",
+                f"Dégâts sur {target} : {odds.damage_mean:.2f} en moyenne "
+                f"({odds.damage_on_hit:.2f} si touché, max {odds.damage_max:.2f})",
+            ]
+            if odds.contrecoup_chance:
+                lines.append(f"Contrecoup : {odds.contrecoup_chance:.0%} · {odds.contrecoup_mean:.2f} en moyenne")
+            return "\n".join(lines)
+
+        embed = discord.Embed(title=f"🔮 Aperçu : {attacker.name} → {defender.name}", color=discord.Color.blurple())
+        embed.add_field(name=f"Ton attaque ({attack_type})", value=odds_text(own, defender.name), inline=False)
+        embed.add_field(name=f"Riposte de {defender.name} (phys)", value=odds_text(riposte, attacker.name), inline=False)
+        embed.add_field(name=f"Tour de {defender.name} ({mob_type})", value=odds_text(mob_turn, attacker.name), inline=False)
+
+        # Un échange = ton attaque (+ riposte) puis le tour du mob
+        dealt = own.damage_mean + riposte.contrecoup_mean + mob_turn.contrecoup_mean
+        taken = own.contrecoup_mean + riposte.damage_mean + mob_turn.damage_mean
+        to_kill = math.ceil(defender.hp / dealt) if dealt > 0 else None
+        to_die = math.ceil(attacker.hp / taken) if taken > 0 else None
+        estimate = [
+            f"Vaincre {defender.name} : ≈ {to_kill} échange(s)" if to_kill else f"{defender.name} ne perd pas de PV en moyenne",
+            f"Tenir : ≈ {to_die} échange(s)" if to_die else "Tu ne perds pas de PV en moyenne",
+        ]
+        if attack_type == "magic" and attacker.mp < 10:
+            estimate.append(f"⚠️ Mana insuffisant pour une attaque magique ({attacker.mp:.0f}/10)")
+        embed.add_field(name="Estimation", value="\n".join(estimate), inline=False)
+        embed.set_footer(text=f"PV {attacker.hp:.0f}/{attacker.hp_max:.0f} contre {defender.hp:.0f}/{defender.hp_max:.0f}"
+                              + (" · perce-armure" if perce_armure else ""))
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(name="skill_mob", description="Utilise une compétence active sur un mob (dans ce fil)")
     @app_commands.describe(mob_name="Nom exact du monstre", skill_id="ID de la compétence (ex: boule_de_feu, slash...)")
@@ -213,69 +284,81 @@ class MobsCog(commands.Cog):
         if not await combat_is_active(self.bot.db, thread_id):
             return await interaction.response.send_message("Aucun combat actif ici.", ephemeral=True)
 
-        char_data = await get_character(self.bot.db, interaction.user.id)
-        if not char_data:
-            return await interaction.response.send_message("Personnage introuvable.", ephemeral=True)
-
-        if skill_id not in char_data.skills:
-            return await interaction.response.send_message(f"Tu ne maîtrises pas `{skill_id}`.", ephemeral=True)
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
 
-        PASSIVE_SKILLS = {"perce_defense", "defense_absolue", "tueur_de_giant"}
-        if skill_id in PASSIVE_SKILLS:
-            return await interaction.response.send_message(f"`{skill_id}` est passif, il s'applique automatiquement.", ephemeral=True)
-            
-        # CORRECTION 1: Passer self.bot.db au lieu de self.bot
-        attacker = await fetch_player_entity(self.bot.db, interaction.user.id)
-        defender = await fetch_mob_entity(self.bot.db, thread_id, mob_name)
-
-        SKILL_DATA = {
-            "boule_de_feu": {"cost": 10, "type": "magic", "mult": 1.5, "desc": "lance une boule de feu sur"},
-            "boule_empoisonnée": {"cost": 10, "type": "magic", "mult": 1.2, "desc": "lance une boule de poison sur"},
-            "slash": {"cost": 5, "type": "phys", "mult": 1.3, "desc": "exécute un Slash sur"},
-            "double_slash": {"cost": 12, "type": "phys", "mult": 2.0, "desc": "assène un Double Slash sur"},
-        }
-        skill = SKILL_DATA.get(skill_id, {"cost": 10, "type": "phys", "mult": 1.1, "desc": "utilise une technique sur"})
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, thread_id):
+            char_data = await get_character(self.bot.db, interaction.user.id)
+            if not char_data:
+                return await interaction.followup.send("Personnage introuvable.", ephemeral=True)
 
-        if attacker.mp < skill["cost"]:
-            return await interaction.response.send_message("Mana insuffisant.", ephemeral=True)
+            if skill_id not in char_data.skills:
+                return await interaction.followup.send(f"Tu ne maîtrises pas `{skill_id}`.", ephemeral=True)
 
-        perce_armure = "perce_defense" in char_data.skills
-        attacker.mp -= skill["cost"]
-
-        await self.bot.db.conn.execute("UPDATE characters SET mp = ? WHERE user_id = ?", (float(attacker.mp), int(interaction.user.id)))
-        await self.bot.db.conn.commit()
-        ra, rb = d20(), d20()
-        result = resolve_attack(attacker, defender, ra, rb, attack_type=skill["type"], perce_armure=perce_armure)
-
-        if result["hit"]:
-            extra_dmg = result["raw"]["damage"] * (skill["mult"] - 1)
-            defender.hp = max(0.0, defender.hp - extra_dmg)
-            result["raw"]["damage"] += extra_dmg
-            result["effects"][0] = f"✨ **{attacker.name}** {skill['desc']} **{defender.name}** et inflige **{result['raw']['damage']:.2f}** dégâts !"
-
-        riposte_result = None
-        if defender.hp > 0:
-            riposte_result = resolve_attack(defender, attacker, d20(), d20(), attack_type="phys")
+            PASSIVE_SKILLS = {"perce_defense", "defense_absolue", "tueur_de_giant"}
+            if skill_id in PASSIVE_SKILLS:
+                return await interaction.followup.send(f"`{skill_id}` est passif, il s'applique automatiquement.", ephemeral=True)
             
-            # CORRECTION 2: Passer self.bot.db au lieu de self.bot
-            await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
-            
-        await save_mob_hp(self.bot.db, thread_id, mob_name, defender.hp)
-        await cleanup_dead_mobs(self.bot.db, thread_id)
-
-        embed = discord.Embed(title=f"💫 Compétence : {skill_id}", color=discord.Color.purple())
-        embed.add_field(name="Action", value="\n".join(result["effects"]) or "—", inline=False)
-        if riposte_result:
-            embed.add_field(name=f"🔄 Contre de {defender.name}", value="\n".join(riposte_result["effects"]) or "—", inline=False)
-
-        embed.set_footer(text=f"MP restant: {attacker.mp:.0f} | PV: {attacker.hp:.0f}")
-
-        if defender.hp <= 0:
-            await add_xp(self.bot.db, interaction.user.id, 30)
-            embed.add_field(name="Victoire", value="✨ Monstre vaincu ! +30 XP")
+            # CORRECTION 1: Passer self.bot.db au lieu de self.bot
+            attacker = await fetch_player_entity(self.bot.db, interaction.user.id)
+            defender = await fetch_mob_entity(self.bot.db, thread_id, mob_name)
+
+            SKILL_DATA = {
+                "boule_de_feu": {"cost": 10, "type": "magic", "mult": 1.5, "desc": "lance une boule de feu sur"},
+                "boule_empoisonnée": {"cost": 10, "type": "magic", "mult": 1.2, "desc": "lance une boule de poison sur"},
+                "slash": {"cost": 5, "type": "phys", "mult": 1.3, "desc": "exécute un Slash sur"},
+                "double_slash": {"cost": 12, "type": "phys", "mult": 2.0, "desc": "assène un Double Slash sur"},
+            }
+            skill = SKILL_DATA.get(skill_id, {"cost": 10, "type": "phys", "mult": 1.1, "desc": "utilise une technique sur"})
+
+            if attacker.mp < skill["cost"]:
+                return await interaction.followup.send("Mana insuffisant.", ephemeral=True)
+
+            perce_armure = "perce_defense" in char_data.skills
+            attacker.mp -= skill["cost"]
+
+            async with self.bot.db.transaction():
+                await set_character_mp(self.bot.db, interaction.user.id, attacker.mp)
+                ra, rb = d20(), d20()
+                result = resolve_attack(attacker, defender, ra, rb, attack_type=skill["type"], perce_armure=perce_armure)
+
+                if result.hit:
+                    extra_dmg = result.damage * (skill["mult"] - 1)
+                    defender.hp = max(0.0, defender.hp - extra_dmg)
+                    result.apply_skill(skill["desc"], extra_dmg, defender.hp)
+
+                riposte_result = None
+                events = attack_events(player_actor(interaction.user.id), mob_actor(mob_name), skill["type"], ra, rb,
+                                       result, defender.hp)
+                if defender.hp > 0:
+                    rra, rrb = d20(), d20()
+                    riposte_result = resolve_attack(defender, attacker, rra, rrb, attack_type="phys")
+                    events += attack_events(mob_actor(mob_name), player_actor(interaction.user.id), "phys", rra, rrb,
+                                            riposte_result, attacker.hp)
+
+                    # CORRECTION 2: Passer self.bot.db au lieu de self.bot
+                    await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
+
+                await save_mob_hp(self.bot.db, thread_id, mob_name, defender.hp)
+                await cleanup_dead_mobs(self.bot.db, thread_id)
+                await record_events(self.bot.db, thread_id, events)
+
+                if defender.hp <= 0:
+                    await add_xp(self.bot.db, interaction.user.id, 30)
+
+            embed = discord.Embed(title=f"💫 Compétence : {skill_id}", color=discord.Color.purple())
+            embed.add_field(name="Action", value=result.text(), inline=False)
+            if riposte_result:
+                embed.add_field(name=f"🔄 Contre de {defender.name}", value=riposte_result.text(), inline=False)
+
+            embed.set_footer(text=f"MP restant: {attacker.mp:.0f} | PV: {attacker.hp:.0f}")
+
+            if defender.hp <= 0:
+                embed.add_field(name="Victoire", value="✨ Monstre vaincu ! +30 XP")
             
-        # CORRECTION: Ajout du await manquant et changement de response.send_message à response.send_message
-        await interaction.response.send_message(embed=embed)
+            # CORRECTION: Ajout du await manquant et changement de response.send_message à response.send_message
+            await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="atk_player", description="Attaque un joueur (commande conservée)")
     async def atk_player(
@@ -289,28 +372,37 @@ class MobsCog(commands.Cog):
             await interaction.response.send_message("Aucun combat actif dans ce salon. Utilise /combat_start.", ephemeral=True)
             return
 
-        try:
-            # CORRECTION: Passer self.bot.db au lieu de self.bot
-            attacker = await fetch_player_entity(self.bot.db, interaction.user.id)
-            defender = await fetch_player_entity(self.bot.db, target.id)
-        except ValueError as e:
-            await interaction.response.send_message(str(e), ephemeral=True)
-            return
-
-        ra = d20()
-        rb = d20()
-        result = resolve_attack(attacker, defender, ra, rb, attack_type=attack_type, perce_armure=perce_armure)
+        # Réponse différée : la commande peut attendre son tour derrière /next_turn
+        await interaction.response.defer()
 
-        # CORRECTION: Passer self.bot.db au lieu de self.bot
-        await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
-        await save_player_hp(self.bot.db, target.id, defender.hp)
+        # Une commande à la fois par combat (voir app.combat_actor)
+        async with combat_actor(self.bot.db, interaction.channel_id):
+            try:
+                # CORRECTION: Passer self.bot.db au lieu de self.bot
+                attacker = await fetch_player_entity(self.bot.db, interaction.user.id)
+                defender = await fetch_player_entity(self.bot.db, target.id)
+            except ValueError as e:
+                await interaction.followup.send(str(e), ephemeral=True)
+                return
 
-        color = discord.Color.red() if result["hit"] else discord.Color.dark_gray()
-        embed = discord.Embed(title="⚔️ Attaque sur joueur", color=color)
-        embed.add_field(name="Cible", value=target.mention, inline=True)
-        embed.add_field(name="Type", value=str(attack_type), inline=True)
-        embed.add_field(name="Perce-armure", value="Oui" if perce_armure else "Non", inline=True)
-        embed.add_field(name="Toucher A vs D", value=f'{result["hit_a"]:.2f} vs {result["hit_b"]:.2f}', inline=False)
-        embed.add_field(name="Log", value="\n".join(result["effects"]) if result["effects"] else "—", inline=False)
+            ra = d20()
+            rb = d20()
+            result = resolve_attack(attacker, defender, ra, rb, attack_type=attack_type, perce_armure=perce_armure)
 
-        await interaction.response.send_message(embed=embed)
\ No newline at end of file
+            # CORRECTION: Passer self.bot.db au lieu de self.bot
+            async with self.bot.db.transaction():
+                await save_player_hp(self.bot.db, interaction.user.id, attacker.hp)
+                await save_player_hp(self.bot.db, target.id, defender.hp)
+                await record_events(self.bot.db, interaction.channel_id, attack_events(
+                    player_actor(interaction.user.id), player_actor(target.id), attack_type, ra, rb, result, defender.hp
+                ))
+
+            color = discord.Color.red() if result.hit else discord.Color.dark_gray()
+            embed = discord.Embed(title="⚔️ Attaque sur joueur", color=color)
+            embed.add_field(name="Cible", value=target.mention, inline=True)
+            embed.add_field(name="Type", value=str(attack_type), inline=True)
+            embed.add_field(name="Perce-armure", value="Oui" if perce_armure else "Non", inline=True)
+            embed.add_field(name="Toucher A vs D", value=f'{result.hit_a:.2f} vs {result.hit_b:.2f}', inline=False)
+            embed.add_field(name="Log", value=result.text(), inline=False)
+
+            await interaction.followup.send(embed=embed)
\ No newline at end of file
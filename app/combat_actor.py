@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger('bofuri.combat_actor')
+
+T = TypeVar("T")
+
+# Durée sans commande après laquelle l'acteur d'un combat s'arrête (recréé à la demande)
+COMBAT_ACTOR_IDLE_S = 5 * 60.0
+
+# Acteurs dont la tâche courante exécute une commande (réentrance)
+_running: contextvars.ContextVar[Tuple["CombatActor", ...]] = contextvars.ContextVar(
+    "bofuri_combat_actor", default=()
+)
+
+
+class CombatActor:
+    """
+    Acteur d'un combat : une boîte aux lettres (asyncio.Queue) et une tâche
+    qui exécute les commandes une par une, dans l'ordre d'arrivée.
+
+    Deux /atk_mob simultanés sur le même mob ne lisent donc plus les mêmes
+    PV pour écrire chacun les leurs, et /next_turn ne s'intercale plus au
+    milieu d'une attaque. Chaque combat a son propre acteur : deux combats
+    différents s'exécutent toujours en parallèle, sans verrou global.
+
+    La tâche s'arrête après `idle_s` sans commande ; le registre recrée
+    l'acteur au message suivant.
+    """
+
+    def __init__(self, key: int, idle_s: float = COMBAT_ACTOR_IDLE_S,
+                 on_stop: Optional[Callable[["CombatActor"], None]] = None):
+        self.key = key
+        self.idle_s = idle_s
+        self._on_stop = on_stop
+        self._mailbox: "asyncio.Queue[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.processed = 0
+
+    @property
+    def pending(self) -> int:
+        return self._mailbox.qsize()
+
+    def _held(self) -> bool:
+        return self in _running.get()
+
+    def _submit(self, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        # Synchrone : le message est en file avant toute suspension de l'appelant
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._mailbox.put_nowait((fn, future))
+        if self._task is None or self._task.done():
+            # Contexte vierge : la tâche ne doit hériter ni de la transaction
+            # (db._tx_depth) ni des acteurs tenus (_running) du premier appelant
+            self._task = asyncio.create_task(self._loop(), name=f"combat-actor-{self.key}",
+                                             context=contextvars.Context())
+        return future
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Exécute `fn()` dans la tâche de l'acteur, après les commandes déjà en file."""
+        if self._held():
+            # Déjà dans une commande de ce combat : pas de nouvelle file (interblocage)
+            return await fn()
+        return await self._submit(fn)
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        """
+        Réserve l'acteur pour un bloc de commande :
+        `async with combat_actor(db, thread_id): ...`
+
+        Le bloc s'exécute dans la tâche appelante, pendant qu'un message de
+        la file attend sa fin : aucune autre commande du combat ne passe
+        entre-temps.
+        """
+        if self._held():
+            yield
+            return
+        started: asyncio.Future = asyncio.get_running_loop().create_future()
+        released = asyncio.Event()
+
+        async def hold() -> None:
+            started.set_result(None)
+            await released.wait()
+
+        waiter = self._submit(hold)
+        try:
+            await asyncio.shield(started)
+        except BaseException:
+            # Appelant annulé avant son tour : libérer la place dès qu'elle arrive
+            released.set()
+            raise
+        token = _running.set(_running.get() + (self,))
+        try:
+            yield
+        finally:
+            _running.reset(token)
+            released.set()
+            await waiter
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                fn, future = await asyncio.wait_for(self._mailbox.get(), timeout=self.idle_s)
+            except asyncio.TimeoutError:
+                if self._mailbox.empty():
+                    break
+                continue
+            if future.cancelled():
+                continue
+            token = _running.set(_running.get() + (self,))
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                _running.reset(token)
+                self.processed += 1
+        self._task = None
+        if self._on_stop is not None:
+            self._on_stop(self)
+
+    async def stop(self) -> None:
+        """Arrête la tâche (commandes en attente annulées)."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        while not self._mailbox.empty():
+            _, future = self._mailbox.get_nowait()
+            future.cancel()
+
+
+class CombatActors:
+    """Acteurs des combats d'une base, indexés par fil ; un acteur inactif s'en retire."""
+
+    def __init__(self, idle_s: float = COMBAT_ACTOR_IDLE_S):
+        self.idle_s = idle_s
+        self._actors: Dict[int, CombatActor] = {}
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    def get(self, thread_id: int) -> CombatActor:
+        thread_id = int(thread_id)
+        actor = self._actors.get(thread_id)
+        if actor is None:
+            actor = self._actors[thread_id] = CombatActor(thread_id, self.idle_s, on_stop=self._forget)
+        return actor
+
+    def _forget(self, actor: CombatActor) -> None:
+        if self._actors.get(actor.key) is actor and actor.pending == 0:
+            del self._actors[actor.key]
+
+    async def stop_all(self) -> None:
+        actors = list(self._actors.values())
+        self._actors.clear()
+        for actor in actors:
+            await actor.stop()
+
+
+# Un ensemble d'acteurs par base (Database ou MemoryDatabase), comme le cache des personnages
+_actors: "weakref.WeakKeyDictionary[Any, CombatActors]" = weakref.WeakKeyDictionary()
+
+
+def combat_actors(db) -> CombatActors:
+    actors = _actors.get(db)
+    if actors is None:
+        actors = _actors[db] = CombatActors()
+    return actors
+
+
+def combat_actor(db, thread_id: int):
+    """
+    Sérialise une commande avec les autres commandes du même combat :
+
+        async with combat_actor(self.bot.db, thread_id):
+            ...  # lecture des PV, calculs, écritures
+    """
+    return combat_actors(db).get(thread_id).exclusive()
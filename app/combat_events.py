@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import json
+import logging
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .rules import AttackOutcome
+
+logger = logging.getLogger('bofuri.combat_events')
+
+# Types d'événements du flux d'un combat (combat_events.kind) et leur payload :
+#   spawn   : {"actor", "hp"?, "hp_max"?}          arrivée d'un joueur ou d'un mob
+#   attack  : {"attacker", "target", "type", "roll_a", "roll_b", "hit", "damage"}
+#   damage  : {"target", "amount", "hp"}            PV de la cible après le coup
+#   death   : {"target"}
+#   turn    : {"actor", "round", "index"}           tour passé à `actor`
+#   provoke : {"mob", "by"}                         `by` None : provocation levée
+# Les acteurs sont désignés par une clé stable : "u:<user_id>" ou "m:<mob_name>".
+EVENT_SPAWN = "spawn"
+EVENT_ATTACK = "attack"
+EVENT_DAMAGE = "damage"
+EVENT_DEATH = "death"
+EVENT_TURN = "turn"
+EVENT_PROVOKE = "provoke"
+EVENT_KINDS = (EVENT_SPAWN, EVENT_ATTACK, EVENT_DAMAGE, EVENT_DEATH, EVENT_TURN, EVENT_PROVOKE)
+
+# Un snapshot de l'état dérivé tous les N événements : la reconstruction
+# après un redémarrage rejoue au plus N événements
+SNAPSHOT_INTERVAL = 50
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def player_actor(user_id: int) -> str:
+    return f"u:{int(user_id)}"
+
+
+def mob_actor(mob_name: str) -> str:
+    return f"m:{mob_name}"
+
+
+def attack_events(attacker: str, target: str, attack_type: str, roll_a: int, roll_b: int,
+                  result: AttackOutcome, target_hp: float) -> List[Event]:
+    """Événements d'une attaque résolue par `resolve_attack` : attack, puis damage et death."""
+    damage = float(result.damage)
+    events: List[Event] = [(EVENT_ATTACK, {
+        "attacker": attacker,
+        "target": target,
+        "type": str(attack_type),
+        "roll_a": int(roll_a),
+        "roll_b": int(roll_b),
+        "hit": bool(result.hit),
+        "damage": round(damage, 2),
+    })]
+    if result.hit:
+        events.append((EVENT_DAMAGE, {"target": target, "amount": round(damage, 2), "hp": round(float(target_hp), 2)}))
+        if target_hp <= 0:
+            events.append((EVENT_DEATH, {"target": target}))
+    return events
+
+
+class CombatState:
+    """
+    État d'un combat dérivé de son flux : PV connus, morts, tour courant et
+    aggro. Ne se construit qu'en rejouant des événements (`apply`) à partir
+    d'un état vide ou d'un snapshot (`from_json`).
+    """
+
+    __slots__ = ("last_event_id", "hp", "dead", "actor", "round", "turn_index", "aggro", "attacks")
+
+    def __init__(self):
+        self.last_event_id = 0
+        self.hp: Dict[str, float] = {}
+        self.dead: set = set()
+        self.actor: Optional[str] = None
+        self.round = 1
+        self.turn_index = 0
+        self.aggro: Dict[str, str] = {}  # mob -> joueur qui l'a provoqué
+        self.attacks = 0
+
+    def apply(self, event_id: int, kind: str, payload: Dict[str, Any]) -> None:
+        if kind == EVENT_SPAWN:
+            if payload.get("hp") is not None:
+                self.hp[payload["actor"]] = float(payload["hp"])
+            self.dead.discard(payload["actor"])
+        elif kind == EVENT_ATTACK:
+            self.attacks += 1
+        elif kind == EVENT_DAMAGE:
+            self.hp[payload["target"]] = float(payload["hp"])
+        elif kind == EVENT_DEATH:
+            target = payload["target"]
+            self.dead.add(target)
+            self.hp[target] = 0.0
+            self.aggro.pop(target, None)
+        elif kind == EVENT_TURN:
+            self.actor = payload.get("actor")
+            self.round = int(payload.get("round", self.round))
+            self.turn_index = int(payload.get("index", self.turn_index))
+        elif kind == EVENT_PROVOKE:
+            if payload.get("by"):
+                self.aggro[payload["mob"]] = payload["by"]
+            else:
+                self.aggro.pop(payload["mob"], None)
+        self.last_event_id = max(self.last_event_id, int(event_id))
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "last_event_id": self.last_event_id,
+            "hp": self.hp,
+            "dead": sorted(self.dead),
+            "actor": self.actor,
+            "round": self.round,
+            "turn_index": self.turn_index,
+            "aggro": self.aggro,
+            "attacks": self.attacks,
+        }, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "CombatState":
+        raw = json.loads(data)
+        state = cls()
+        state.last_event_id = int(raw["last_event_id"])
+        state.hp = {k: float(v) for k, v in raw["hp"].items()}
+        state.dead = set(raw["dead"])
+        state.actor = raw["actor"]
+        state.round = int(raw["round"])
+        state.turn_index = int(raw["turn_index"])
+        state.aggro = dict(raw["aggro"])
+        state.attacks = int(raw.get("attacks", 0))
+        return state
+
+
+async def replay(db, combat_id: int) -> Tuple[CombatState, int]:
+    """État courant du combat : dernier snapshot + événements suivants. Retourne (état, nb rejoué)."""
+    snapshot = await db.storage.get_combat_snapshot(int(combat_id))
+    state = CombatState.from_json(snapshot["state"]) if snapshot else CombatState()
+    events = await db.storage.list_combat_events(int(combat_id), state.last_event_id)
+    for row in events:
+        state.apply(row["id"], row["kind"], json.loads(row["payload"]))
+    return state, len(events)
+
+
+class CombatEventLog:
+    """
+    Flux d'un combat actif : l'état dérivé reste en mémoire et chaque
+    écriture est un simple ajout en fin de `combat_events` (dans la
+    transaction de la commande appelante). Un snapshot est pris tous les
+    SNAPSHOT_INTERVAL événements.
+    """
+
+    def __init__(self, combat_id: int, state: CombatState, since_snapshot: int = 0):
+        self.combat_id = combat_id
+        self.state = state
+        self.since_snapshot = since_snapshot
+
+    async def extend(self, db, events: Iterable[Event]) -> None:
+        events = list(events)
+        if not events:
+            return
+        ids = await db.storage.append_combat_events(
+            self.combat_id,
+            [(kind, json.dumps(payload, ensure_ascii=False, separators=(",", ":"))) for kind, payload in events],
+        )
+        for event_id, (kind, payload) in zip(ids, events):
+            self.state.apply(event_id, kind, payload)
+        self.since_snapshot += len(events)
+        if self.since_snapshot >= SNAPSHOT_INTERVAL:
+            await self.snapshot(db)
+
+    async def snapshot(self, db) -> None:
+        await db.storage.save_combat_snapshot(self.combat_id, self.state.last_event_id, self.state.to_json())
+        self.since_snapshot = 0
+
+
+class CombatEventLogs:
+    """Flux chargés des combats actifs d'une base (combat_id -> CombatEventLog)."""
+
+    def __init__(self):
+        self._logs: Dict[int, CombatEventLog] = {}
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    async def get(self, db, combat_id: int) -> CombatEventLog:
+        combat_id = int(combat_id)
+        log = self._logs.get(combat_id)
+        if log is None:
+            state, replayed = await replay(db, combat_id)
+            log = self._logs.get(combat_id)
+            if log is None:
+                log = self._logs[combat_id] = CombatEventLog(combat_id, state, replayed)
+                if replayed >= SNAPSHOT_INTERVAL:
+                    await log.snapshot(db)
+        return log
+
+    def forget(self, combat_id: int) -> None:
+        self._logs.pop(int(combat_id), None)
+
+    def clear(self) -> None:
+        self._logs.clear()
+
+
+# Un ensemble de flux par base (Database ou MemoryDatabase), comme le cache des personnages
+_logs: "weakref.WeakKeyDictionary[Any, CombatEventLogs]" = weakref.WeakKeyDictionary()
+
+
+def combat_event_logs(db) -> CombatEventLogs:
+    logs = _logs.get(db)
+    if logs is None:
+        logs = _logs[db] = CombatEventLogs()
+        # Événements annulés par un rollback : l'état sera rejoué depuis la base
+        db.add_rollback_hook(logs.clear)
+    return logs
+
+
+async def combat_event_log(db, combat_id: int) -> CombatEventLog:
+    return await combat_event_logs(db).get(db, combat_id)
+
+
+async def record_events(db, thread_id: int, events: Iterable[Event]) -> None:
+    """Ajoute des événements au flux du combat actif du fil (sans effet hors combat)."""
+    from .combat_session import active_combats
+
+    combat = (await active_combats(db)).get(thread_id)
+    if combat is None:
+        return
+    await (await combat_event_log(db, combat.combat_id)).extend(db, events)
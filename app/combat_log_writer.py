@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import weakref
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger('bofuri.combat_log')
+
+# Vidage du tampon dès N lignes en attente...
+COMBAT_LOG_FLUSH_SIZE = 50
+# ... ou au plus tard N secondes après la première ligne en attente
+COMBAT_LOG_FLUSH_INTERVAL_S = 2.0
+
+LogRow = Tuple[int, int, str, str]  # (combat_id, channel_id, kind, message)
+
+
+class CombatLogWriter:
+    """
+    Journal des combats (`combat_logs`) écrit en arrière-plan.
+
+    `add()` ne fait qu'ajouter la ligne à un tampon en mémoire : la commande
+    n'attend jamais la base. Le tampon est écrit en une transaction
+    (`executemany`) dès `flush_size` lignes, au plus tard `interval_s`
+    secondes après la première ligne en attente, à la fermeture d'un combat
+    (avant l'archivage) et à l'arrêt du bot.
+
+    Les lignes gardent leur ordre d'arrivée ; si l'écriture échoue, elles
+    restent en tête du tampon pour le vidage suivant.
+    """
+
+    def __init__(self, db, flush_size: int = COMBAT_LOG_FLUSH_SIZE,
+                 interval_s: float = COMBAT_LOG_FLUSH_INTERVAL_S):
+        self.db = db
+        self.flush_size = flush_size
+        self.interval_s = interval_s
+        self._pending: List[LogRow] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+        self.written = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, combat_id: int, channel_id: int, kind: str, message: str) -> None:
+        self._pending.append((int(combat_id), int(channel_id), str(kind), str(message)))
+        # Tâches en contexte vierge : hors de la transaction de l'appelant
+        # (db._tx_depth), le vidage ouvre et commite sa propre unité de travail
+        if len(self._pending) >= self.flush_size:
+            if self._flushing is None or self._flushing.done():
+                self._flushing = asyncio.create_task(self._flush_logged(), name="combat-log-flush",
+                                                     context=contextvars.Context())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later(), name="combat-log-timer",
+                                              context=contextvars.Context())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval_s)
+        self._timer = None
+        await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture du journal de combat: {e}", exc_info=True)
+
+    async def flush(self) -> int:
+        """Écrit tout le tampon en une transaction ; retourne le nombre de lignes écrites."""
+        async with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                async with self.db.transaction():
+                    await self.db.storage.add_combat_logs(rows)
+            except BaseException:
+                self._pending[:0] = rows
+                raise
+            self.written += len(rows)
+            return len(rows)
+
+    async def close(self) -> None:
+        """Arrêt du bot : annule le minuteur et écrit ce qui reste."""
+        for task in (self._timer, self._flushing):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._timer = self._flushing = None
+        written = await self.flush()
+        if written:
+            logger.info(f"{written} lignes de journal de combat écrites à l'arrêt")
+
+
+# Un journal par base (Database ou MemoryDatabase), comme le cache des personnages
+_writers: "weakref.WeakKeyDictionary[Any, CombatLogWriter]" = weakref.WeakKeyDictionary()
+
+
+def combat_log_writer(db) -> CombatLogWriter:
+    writer = _writers.get(db)
+    if writer is None:
+        writer = _writers[db] = CombatLogWriter(db)
+    return writer
@@ -3,6 +3,7 @@ from __future__ import annotations
 import re
 from typing import Optional, Tuple
 
+from .combat_events import EVENT_SPAWN, mob_actor, record_events
 from .models import RuntimeEntity
 
 
@@ -14,15 +15,10 @@ async def next_unique_mob_name(db, channel_id: int, base_display_name: str) -> s
     Retourne base_display_name#N avec N = 1 + max(N existant) dans ce salon.
     """
     # On récupère tous les noms commençant par "Base#"
-    like = f"{base_display_name}#%"
-    rows = await db.execute_fetchall(
-        "SELECT mob_name FROM combat_mobs WHERE channel_id = ? AND mob_name LIKE ?",
-        (int(channel_id), like),
-    )
+    names = await db.storage.list_mob_names_like(int(channel_id), f"{base_display_name}#")
 
     max_n = 0
-    for r in rows:
-        name = r["mob_name"]
+    for name in names:
         m = _SUFFIX_RE.match(name)
         if m and m.group("base") == base_display_name:
             max_n = max(max_n, int(m.group("num")))
@@ -31,66 +27,58 @@ async def next_unique_mob_name(db, channel_id: int, base_display_name: str) -> s
 
 
 async def insert_mob(db, channel_id: int, mob_name: str, mob_key: str, level: int, ent: RuntimeEntity, created_by: int):
-    await db.conn.execute(
-        """
-        INSERT INTO combat_mobs(
-          channel_id, mob_name, mob_key, level,
-          hp, hp_max, mp, mp_max, str, agi, int_, dex, vit,
-          created_by
-        )
-        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            int(channel_id), mob_name, mob_key, int(level),
-            float(ent.hp), float(ent.hp_max), float(ent.mp), float(ent.mp_max),
-            float(ent.STR), float(ent.AGI), float(ent.INT), float(ent.DEX), float(ent.VIT),
-            int(created_by),
-        ),
-    )
-    await db.conn.commit()
+    await db.storage.insert_mob({
+        "channel_id": int(channel_id),
+        "mob_name": mob_name,
+        "mob_key": mob_key,
+        "level": int(level),
+        "hp": float(ent.hp),
+        "hp_max": float(ent.hp_max),
+        "mp": float(ent.mp),
+        "mp_max": float(ent.mp_max),
+        "str": float(ent.STR),
+        "agi": float(ent.AGI),
+        "int_": float(ent.INT),
+        "dex": float(ent.DEX),
+        "vit": float(ent.VIT),
+        "created_by": int(created_by),
+    })
+    await record_events(db, channel_id, [
+        (EVENT_SPAWN, {"actor": mob_actor(mob_name), "hp": float(ent.hp), "hp_max": float(ent.hp_max)}),
+    ])
 
 
 async def fetch_mob_entity(db, channel_id: int, mob_name: str) -> RuntimeEntity:
-    row = await db.execute_fetchone(
-        "SELECT * FROM combat_mobs WHERE channel_id = ? AND mob_name = ?",
-        (int(channel_id), str(mob_name)),
-    )
+    row = await db.storage.get_mob(int(channel_id), str(mob_name))
     if not row:
         raise ValueError("Mob introuvable dans ce salon. Utilise /mob_list pour voir les noms.")
 
+    return mob_entity(row)
+
+
+def mob_entity(row) -> RuntimeEntity:
+    """Entité de combat construite depuis une ligne `MobRecord` déjà lue."""
     return RuntimeEntity(
-        name=row["mob_name"],
-        hp=float(row["hp"]),
-        hp_max=float(row["hp_max"]),
-        mp=float(row["mp"]),
-        mp_max=float(row["mp_max"]),
-        STR=float(row["str"]),
-        AGI=float(row["agi"]),
-        INT=float(row["int_"]),
-        DEX=float(row["dex"]),
-        VIT=float(row["vit"]),
+        name=row.mob_name,
+        hp=row.hp,
+        hp_max=row.hp_max,
+        mp=row.mp,
+        mp_max=row.mp_max,
+        STR=row.str,
+        AGI=row.agi,
+        INT=row.int_,
+        DEX=row.dex,
+        VIT=row.vit,
     )
 
 
 async def save_mob_hp(db, channel_id: int, mob_name: str, hp: float) -> None:
-    await db.conn.execute(
-        "UPDATE combat_mobs SET hp = ? WHERE channel_id = ? AND mob_name = ?",
-        (float(hp), int(channel_id), str(mob_name)),
-    )
-    await db.conn.commit()
+    await db.storage.update_mob_hp(int(channel_id), str(mob_name), float(hp))
 
 
 async def list_mobs(db, channel_id: int):
-    return await db.execute_fetchall(
-        "SELECT mob_name, mob_key, level, hp, hp_max FROM combat_mobs WHERE channel_id = ? ORDER BY mob_name",
-        (int(channel_id),),
-    )
+    return await db.storage.list_mobs(int(channel_id))
 
 
 async def cleanup_dead_mobs(db, channel_id: int) -> int:
-    cur = await db.conn.execute(
-        "DELETE FROM combat_mobs WHERE channel_id = ? AND hp <= 0",
-        (int(channel_id),),
-    )
-    await db.conn.commit()
-    return cur.rowcount or 0
+    return await db.storage.delete_dead_mobs(int(channel_id))
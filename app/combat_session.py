@@ -1,27 +1,122 @@
 from __future__ import annotations
 
-from typing import Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+import asyncio
 import logging
+import weakref
+
+from .combat_events import EVENT_SPAWN, combat_event_log, combat_event_logs, player_actor
+from .combat_log_writer import combat_log_writer
+
+logger = logging.getLogger('bofuri.combat')
+
 
 class CombatError(RuntimeError):
     pass
 
 
-async def combat_is_active(db, thread_id: int) -> bool:
-    logger = logging.getLogger('bofuri.combat')
-    logger.info(f"Vérification du combat actif dans le fil {thread_id}")
+class ActiveCombat:
+    """Combat actif tel que vu par le registre : id, salon et participants."""
 
-    try:
-        row = await db.execute_fetchone(
-            "SELECT status FROM combats WHERE thread_id = ?",
-            (int(thread_id),),
-        )
+    __slots__ = ("combat_id", "channel_id", "thread_id", "participants")
+
+    def __init__(self, combat_id: int, channel_id: int, thread_id: int, participants: Optional[Set[int]] = None):
+        self.combat_id = combat_id
+        self.channel_id = channel_id
+        self.thread_id = thread_id
+        self.participants: Set[int] = participants if participants is not None else set()
+
+
+class ActiveCombatRegistry:
+    """
+    Combats actifs indexés par fil (thread_id -> ActiveCombat).
+
+    Chargé une fois depuis la base (`active_combats(db)`, appelé au
+    démarrage), puis tenu à jour par combat_set_thread, participants_add,
+    combat_close... : combat_is_active, participants_list et log_add n'ont
+    plus à relire `combats` à chaque commande. Un rollback de
+    `db.transaction()` le marque à recharger.
+    """
+
+    def __init__(self):
+        self._by_thread: Dict[int, ActiveCombat] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
 
-        logger.info(f"Résultat de la requête: {row}")
-        result = bool(row and row["status"] == "active")
-        logger.info(f"Combat actif: {result}")
-        return result
+    async def ensure_loaded(self, db) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            by_thread: Dict[int, ActiveCombat] = {}
+            by_id: Dict[int, ActiveCombat] = {}
+            for row in await db.storage.list_active_combats():
+                combat = ActiveCombat(int(row.id), int(row.channel_id), int(row.thread_id))
+                # Plusieurs combats actifs sur un fil : le plus récent l'emporte (get_active_combat)
+                current = by_thread.get(combat.thread_id)
+                if current is None or current.combat_id < combat.combat_id:
+                    by_thread[combat.thread_id] = combat
+                by_id[combat.combat_id] = combat
+            for combat_id, user_id in await db.storage.list_active_participants():
+                combat = by_id.get(combat_id)
+                if combat is not None:
+                    combat.participants.add(user_id)
+            self._by_thread = by_thread
+            self._loaded = True
+            logger.info(f"Registre des combats actifs chargé: {len(by_thread)} combat(s)")
+
+    def invalidate(self) -> None:
+        """Force un rechargement depuis la base au prochain accès."""
+        self._loaded = False
+
+    def get(self, thread_id: int) -> Optional[ActiveCombat]:
+        return self._by_thread.get(int(thread_id))
+
+    def thread_ids(self, channel_id: int) -> List[int]:
+        return [c.thread_id for c in self._by_thread.values() if c.channel_id == int(channel_id)]
+
+    def combats(self) -> List[ActiveCombat]:
+        return list(self._by_thread.values())
+
+    def register(self, combat: ActiveCombat) -> None:
+        self._by_thread[combat.thread_id] = combat
+
+    def discard(self, combat_id: int) -> None:
+        for thread_id, combat in list(self._by_thread.items()):
+            if combat.combat_id == int(combat_id):
+                del self._by_thread[thread_id]
+
+    def __len__(self) -> int:
+        return len(self._by_thread)
+
+
+# Un registre par base (Database ou MemoryDatabase), comme le cache des personnages
+_registries: "weakref.WeakKeyDictionary[Any, ActiveCombatRegistry]" = weakref.WeakKeyDictionary()
+
+
+async def active_combats(db) -> ActiveCombatRegistry:
+    """Registre des combats actifs de `db`, chargé depuis la base au premier appel."""
+    registry = _registries.get(db)
+    if registry is None:
+        registry = _registries[db] = ActiveCombatRegistry()
+        db.add_rollback_hook(registry.invalidate)
+    await registry.ensure_loaded(db)
+    return registry
+
+
+async def combat_get_active(db, thread_id: int) -> ActiveCombat:
+    """Combat actif du fil (depuis le registre) ; CombatError s'il n'y en a pas."""
+    combat = (await active_combats(db)).get(thread_id)
+    if combat is None:
+        raise CombatError("Aucun combat actif trouvé pour ce fil.")
+    return combat
+
+
+async def combat_is_active(db, thread_id: int) -> bool:
+    try:
+        return (await active_combats(db)).get(thread_id) is not None
     except Exception as e:
         logger.error(f"Erreur lors de la vérification du combat actif: {str(e)}", exc_info=True)
         return False
@@ -29,11 +124,7 @@ async def combat_is_active(db, thread_id: int) -> bool:
 
 async def combat_get_thread_ids(db, channel_id: int) -> list[int]:
     """Retourne la liste des thread_id de tous les combats actifs dans un salon."""
-    rows = await db.execute_fetchall(
-        "SELECT thread_id FROM combats WHERE channel_id = ? AND status = 'active' AND thread_id IS NOT NULL",
-        (int(channel_id),),
-    )
-    return [int(row["thread_id"]) for row in rows if row["thread_id"]]
+    return (await active_combats(db)).thread_ids(channel_id)
 
 
 async def combat_get_thread_id(db, channel_id: int) -> Optional[int]:
@@ -47,167 +138,113 @@ async def combat_create(db, channel_id: int, created_by: int) -> int:
     created_by = int(created_by)  # Conversion explicite en entier
 
     # Insérer un nouveau combat sans vérification (plusieurs combats autorisés par salon)
-    cursor = await db.conn.execute(
-        "INSERT INTO combats(channel_id, status, created_by) VALUES(?, 'active', ?)",
-        (channel_id, created_by),
-    )
-    combat_id = cursor.lastrowid
-    await db.conn.commit()
-
-    return combat_id
+    return await db.storage.create_combat(channel_id, created_by)
 
 async def combat_set_thread(db, channel_id: int, thread_id: int, combat_id: Optional[int] = None) -> None:
     # Mise à jour pour inclure le thread_id et vérifier si un combat est déjà actif dans ce fil
     thread_id = int(thread_id)
+    registry = await active_combats(db)
 
     # Vérifier si un combat est déjà actif dans ce fil
-    row = await db.execute_fetchone(
-    "SELECT id FROM combats WHERE thread_id = ? AND status = 'active'",
-    (thread_id,),
-    )
-
-    if row and row["id"]:
+    if registry.get(thread_id) is not None:
         # Un combat est déjà actif dans ce fil
         raise CombatError("Un combat est déjà actif dans ce fil.")
 
     # Mettre à jour le combat avec le thread_id
     if combat_id is not None:
         # Si un combat_id est fourni, mettre à jour ce combat spécifique
-        await db.conn.execute(
-            "UPDATE combats SET thread_id = ? WHERE id = ? AND status = 'active'",
-            (thread_id, int(combat_id)),
-        )
+        await db.storage.set_combat_thread(int(combat_id), thread_id)
+        registry.register(ActiveCombat(int(combat_id), int(channel_id), thread_id))
     else:
         # Sinon, utiliser l'ancienne méthode (pour compatibilité)
         # Récupérer d'abord le premier combat actif sans thread_id
-        row = await db.execute_fetchone(
-            "SELECT id FROM combats WHERE channel_id = ? AND status = 'active' AND thread_id IS NULL",
-            (int(channel_id),),
-        )
+        row = await db.storage.find_unthreaded_combat(int(channel_id))
 
-        if row and row["id"]:
+        if row and row.id:
             # Mettre à jour ce combat spécifique
-            await db.conn.execute(
-                "UPDATE combats SET thread_id = ? WHERE id = ?",
-                (thread_id, row["id"]),
-            )
-
-    await db.conn.commit()
+            await db.storage.set_combat_thread(row.id, thread_id)
+            registry.register(ActiveCombat(int(row.id), int(row.channel_id), thread_id))
 
 
 async def combat_close(db, thread_id: int) -> None:
-    logger = logging.getLogger('bofuri.combat')
     logger.info(f"Tentative de fermeture du combat dans le fil {thread_id}")
 
     try:
         # Vérifier d'abord si un combat actif existe
-        row = await db.execute_fetchone(
-            "SELECT id, channel_id FROM combats WHERE thread_id = ? AND status = 'active'",
-            (int(thread_id),),
-        )
-
-        logger.info(f"Résultat de la requête pour trouver le combat actif: {row}")
+        registry = await active_combats(db)
+        combat = registry.get(thread_id)
 
-        if not row:
+        if combat is None:
             # Aucun combat actif à fermer
             logger.warning(f"Aucun combat actif trouvé dans le fil {thread_id}")
             return
 
-        combat_id = row['id']
-        channel_id = row['channel_id']
+        combat_id = combat.combat_id
+        channel_id = combat.channel_id
         logger.info(f"Fermeture du combat ID {combat_id} dans le fil {thread_id} (salon {channel_id})")
 
-        # Mettre à jour le statut du combat existant
-        await db.conn.execute(
-            "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (combat_id,),
-        )
-        await db.conn.commit()
-        logger.info(f"Combat ID {combat_id} fermé avec succès")
+        # Fermer le combat puis le déplacer vers l'archive froide, journal compris
+        await combat_log_writer(db).flush()
+        async with db.transaction():
+            await db.storage.close_combat(combat_id)
+            await db.storage.archive_combat(combat_id)
+        _forget_combats(db, [combat])
+        logger.info(f"Combat ID {combat_id} fermé et archivé avec succès")
     except Exception as e:
         logger.error(f"Erreur lors de la fermeture du combat: {str(e)}", exc_info=True)
         raise
 
 
-async def participants_add(db, thread_id: int, user_id: int, added_by: int) -> None:
-    row = await db.execute_fetchone(
-        "SELECT id, channel_id FROM combats WHERE thread_id = ? AND status = 'active' ORDER BY id DESC LIMIT 1",
-        (int(thread_id),),
-    )
-    if not row:
-        raise CombatError("Aucun combat actif trouvé pour ce fil.")
+def _forget_combats(db, combats: Iterable[ActiveCombat]) -> None:
+    """Retire les combats fermés du registre, des sessions et des flux en mémoire."""
+    from .combat_session_manager import session_store
 
-    combat_id = int(row["id"])
-    channel_id = int(row["channel_id"])
+    registry = _registries.get(db)
+    store = session_store(db)
+    logs = combat_event_logs(db)
+    for combat in list(combats):
+        if registry is not None:
+            registry.discard(combat.combat_id)
+        store.evict(combat.thread_id)
+        logs.forget(combat.combat_id)
 
-    await db.conn.execute(
-        """
-        INSERT INTO combat_participants(channel_id, user_id, added_by, combat_id)
-        VALUES(?, ?, ?, ?)
-        ON CONFLICT(combat_id, user_id) DO NOTHING
-        """,
-        (channel_id, int(user_id), int(added_by), combat_id),
-    )
-    await db.conn.commit()
 
-async def participants_list(db, thread_id: int) -> list[int]:
-    row = await db.execute_fetchone(
-        "SELECT id FROM combats WHERE thread_id = ? AND status = 'active' ORDER BY id DESC LIMIT 1",
-        (int(thread_id),),
-    )
-    if not row:
-        raise CombatError("Aucun combat actif trouvé pour ce fil.")
+async def combat_cancel(db, combat_id: int) -> None:
+    """Ferme un combat dont la création a échoué (sans l'archiver)."""
+    await combat_log_writer(db).flush()
+    await db.storage.close_combat(int(combat_id))
+    registry = await active_combats(db)
+    _forget_combats(db, [c for c in registry.combats() if c.combat_id == int(combat_id)])
 
-    combat_id = int(row["id"])
-    rows = await db.execute_fetchall(
-        "SELECT user_id FROM combat_participants WHERE combat_id = ?",
-        (combat_id,),
-    )
-    return [int(r["user_id"]) for r in rows]
 
+async def combat_close_channel(db, channel_id: int) -> None:
+    """Ferme tous les combats actifs du salon (/fix_combats)."""
+    await combat_log_writer(db).flush()
+    await db.storage.close_channel_combats(int(channel_id))
+    registry = await active_combats(db)
+    _forget_combats(db, [c for c in registry.combats() if c.channel_id == int(channel_id)])
 
 
-async def log_add(db, thread_id: int, kind: str, message: str) -> None:
-    # Récupérer d'abord le combat_id associé au thread_id
-    row = await db.execute_fetchone(
-        "SELECT id, channel_id FROM combats WHERE thread_id = ? AND status = 'active'",
-        (int(thread_id),),
-    )
+async def participants_add(db, thread_id: int, user_id: int, added_by: int) -> None:
+    combat = await combat_get_active(db, thread_id)
 
-    if not row:
-        raise CombatError("Aucun combat actif trouvé pour ce fil.")
+    await db.storage.add_participant(combat.combat_id, combat.channel_id, int(user_id), int(added_by))
+    if int(user_id) not in combat.participants:
+        combat.participants.add(int(user_id))
+        await (await combat_event_log(db, combat.combat_id)).extend(
+            db, [(EVENT_SPAWN, {"actor": player_actor(user_id)})]
+        )
 
-    combat_id = row['id']
-    channel_id = row['channel_id']
+async def participants_list(db, thread_id: int) -> list[int]:
+    combat = await combat_get_active(db, thread_id)
 
-    # Vérifier si la table a la colonne combat_id
-    has_combat_id_column = False
-    try:
-        table_info = await db.execute_fetchall("PRAGMA table_info(combat_logs)")
-        for column in table_info:
-            if column["name"] == "combat_id":
-                has_combat_id_column = True
-                break
-
-        if has_combat_id_column:
-            await db.conn.execute(
-                "INSERT INTO combat_logs(channel_id, kind, message, combat_id) VALUES(?, ?, ?, ?)",
-                (int(channel_id), str(kind), str(message), combat_id),
-            )
-        else:
-            # Utiliser l'ancienne structure sans combat_id
-            await db.conn.execute(
-                "INSERT INTO combat_logs(channel_id, kind, message) VALUES(?, ?, ?)",
-                (int(channel_id), str(kind), str(message)),
-            )
-
-        await db.conn.commit()
-    except Exception as e:
-        logger = logging.getLogger('bofuri.combat')
-        logger.error(f"Erreur lors de l'ajout du log: {str(e)}", exc_info=True)
-        # Essayer avec l'ancienne structure
-        await db.conn.execute(
-            "INSERT INTO combat_logs(channel_id, kind, message) VALUES(?, ?, ?)",
-            (int(channel_id), str(kind), str(message)),
-        )
-        await db.conn.commit()
+    return sorted(combat.participants)
+
+
+
+async def log_add(db, thread_id: int, kind: str, message: str) -> None:
+    # Le combat_id associé au thread_id vient du registre ; l'écriture est
+    # différée (voir app.combat_log_writer)
+    combat = await combat_get_active(db, thread_id)
+
+    combat_log_writer(db).add(combat.combat_id, combat.channel_id, str(kind), str(message))
@@ -1,23 +1,79 @@
 from __future__ import annotations
 
+import json
 import random
 import logging
-from typing import List, Optional, Dict, Tuple
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Dict, Tuple
 
 import discord
 
+from .combat_events import (
+    EVENT_PROVOKE,
+    EVENT_TURN,
+    Event,
+    attack_events,
+    combat_event_log,
+    mob_actor,
+    player_actor,
+)
 from .models import RuntimeEntity
 from .dice import d20
-from .rules import resolve_attack, AttackType
-from .combat_mobs import save_mob_hp, fetch_mob_entity, cleanup_dead_mobs
-from .cogs.combat import save_player_hp, fetch_player_entity
+from .rules import resolve_attack, best_attack_type, AttackOutcome, AttackType
+from .combat_mobs import save_mob_hp, fetch_mob_entity, mob_entity, cleanup_dead_mobs
+from .cogs.combat import save_player_hp, fetch_player_entity, player_entity
 
 logger = logging.getLogger('bofuri.combat_session')
 
+# Sessions gardées en mémoire par base (LRU) et durée d'inactivité avant rechargement
+COMBAT_SESSION_CACHE_SIZE = 64
+COMBAT_SESSION_TTL_S = 30 * 60.0
+
+# Rythme du tour des mobs dans /next_turn :
+#   groupe   : toute la phase des mobs résolue d'un coup, un seul message récapitulatif
+#   detaille : un message et un embed par mob, espacés d'une seconde
+PACING_GROUPED = "groupe"
+PACING_DETAILED = "detaille"
+PACING_MODES = (PACING_GROUPED, PACING_DETAILED)
+DEFAULT_PACING = PACING_GROUPED
+
+# Limites Discord : champs par embed, embeds par message
+_EMBED_MAX_FIELDS = 25
+_MESSAGE_MAX_EMBEDS = 10
+
+
+@dataclass
+class MobAttack:
+    """Attaque d'un mob résolue (jets, type et résultat de `resolve_attack`)."""
+    mob: RuntimeEntity
+    target: RuntimeEntity
+    attack_type: AttackType
+    roll_a: int
+    roll_b: int
+    result: AttackOutcome
+
+
+@dataclass
+class MobPhase:
+    """Résultat d'une phase des mobs résolue d'un coup (`CombatSession.run_mob_phase`)."""
+    attacks: List[MobAttack] = field(default_factory=list)
+    idle: List[RuntimeEntity] = field(default_factory=list)  # mobs sans cible
+    players_ko: bool = False
+    stalled: bool = False  # plus aucun participant en vie pour continuer
+
+
 class CombatError(Exception):
     """Exception spécifique aux erreurs de combat"""
     pass
 
+def mob_attack_type(mob_entity: RuntimeEntity) -> AttackType:
+    """Type d'attaque d'un mob à son tour (simple pour l'instant) : sa meilleure stat offensive."""
+    return best_attack_type(mob_entity.STR, mob_entity.INT, mob_entity.DEX)
+
+
 class CombatSession:
     """
     Classe qui gère l'état d'un combat et la logique du tour des mobs
@@ -25,8 +81,14 @@ class CombatSession:
     def __init__(self, db, thread_id: int):
         self.db = db
         self.thread_id = thread_id
+        self.combat_id: Optional[int] = None
         self.participants: List[RuntimeEntity] = []
         self.current_turn_index = 0
+        self.round = 1
+        self.pacing: Optional[str] = None  # None : DEFAULT_PACING / configuration du bot
+        # Tour des mobs détaillé en cours (l'acteur du combat est relâché entre deux mobs)
+        self.mob_phase_running = False
+        self._events: List[Event] = []  # événements à ajouter au flux (save_state)
         self.user_id_to_entity: Dict[int, RuntimeEntity] = {}
         self.mob_name_to_entity: Dict[str, RuntimeEntity] = {}
         
@@ -53,43 +115,171 @@ class CombatSession:
         return self.participants[self.current_turn_index]
     
     async def load_participants(self) -> None:
-        """Charge tous les participants (joueurs et mobs) du combat"""
-        from .combat_session import participants_list
+        """Charge tous les participants (joueurs et mobs) du combat, puis l'état des tours."""
+        await self.refresh()
+        await self.load_state()
+
+    async def refresh(self) -> None:
+        """
+        Synchronise les participants avec la base.
+
+        Participants lus dans le registre des combats actifs, personnages
+        hydratés en une requête (ou depuis le cache) et mobs construits
+        depuis les lignes de `list_mobs` : le coût ne dépend pas de la
+        taille du groupe ni du nombre de mobs. Les entités déjà connues
+        reprennent les PV/PM enregistrés (ex. après /atk_mob), les nouveaux
+        venus sont insérés et un mob disparu de la base (mort puis nettoyé)
+        passe à 0 PV.
+        """
+        from .character import get_combat_characters
+        from .combat_session import combat_get_active
         from .combat_mobs import list_mobs
-        
-        # Charger les joueurs
-        user_ids = await participants_list(self.db, self.thread_id)
+
+        current = self.current_actor
+        added = False
+
+        # Joueurs
+        combat = await combat_get_active(self.db, self.thread_id)
+        self.combat_id = combat.combat_id
+        user_ids = sorted(combat.participants)
+        characters = await get_combat_characters(self.db, combat.combat_id, user_ids)
         for user_id in user_ids:
+            character = characters.get(user_id)
+            entity = self.user_id_to_entity.get(user_id)
+            if entity is not None:
+                if character is not None:
+                    entity.hp, entity.mp = character.hp, character.mp
+                continue
             try:
-                entity = await fetch_player_entity(self.db, int(user_id))
+                if character is not None:
+                    entity = player_entity(character)
+                else:
+                    # Participant sans personnage : fiche par défaut
+                    entity = await fetch_player_entity(self.db, user_id)
                 entity.is_mob = False
                 self.participants.append(entity)
-                self.user_id_to_entity[int(user_id)] = entity
+                self.user_id_to_entity[user_id] = entity
+                added = True
                 
                 # Stocker l'ID utilisateur avec l'ID d'entité
                 entity_id = self._get_entity_id(entity)
-                self.id_to_user_id[entity_id] = int(user_id)
+                self.id_to_user_id[entity_id] = user_id
             except Exception as e:
                 logger.error(f"Erreur lors du chargement du joueur {user_id}: {e}")
         
-        # Charger les mobs
+        # Mobs (les lignes complètes suffisent, pas de relecture par mob)
         mob_rows = await list_mobs(self.db, self.thread_id)
+        seen = set()
         for mob_row in mob_rows:
+            mob_name = mob_row.mob_name
+            seen.add(mob_name)
+            entity = self.mob_name_to_entity.get(mob_name)
+            if entity is not None:
+                entity.hp, entity.mp = mob_row.hp, mob_row.mp
+                continue
             try:
-                mob_name = mob_row["mob_name"]
-                entity = await fetch_mob_entity(self.db, self.thread_id, mob_name)
+                entity = mob_entity(mob_row)
                 entity.is_mob = True
                 self.participants.append(entity)
                 self.mob_name_to_entity[mob_name] = entity
+                added = True
                 
                 # Stocker le nom du mob avec l'ID d'entité
                 entity_id = self._get_entity_id(entity)
                 self.id_to_mob_name[entity_id] = mob_name
             except Exception as e:
-                logger.error(f"Erreur lors du chargement du mob {mob_row['mob_name']}: {e}")
+                logger.error(f"Erreur lors du chargement du mob {mob_row.mob_name}: {e}")
+        for mob_name, entity in self.mob_name_to_entity.items():
+            if mob_name not in seen:
+                entity.hp = 0
         
-        # Trier les participants par AGI (décroissant)
-        self.participants.sort(key=lambda x: x.AGI, reverse=True)
+        if added:
+            # Trier les participants par AGI (décroissant), sans perdre l'acteur courant
+            self.participants.sort(key=lambda x: x.AGI, reverse=True)
+            if current is not None:
+                self.current_turn_index = self._index_of(current)
+
+    def _index_of(self, entity: RuntimeEntity) -> int:
+        # Par identité : RuntimeEntity est une dataclass comparée par valeur
+        return next(i for i, p in enumerate(self.participants) if p is entity)
+
+    def _actor_key(self, entity: RuntimeEntity) -> Optional[str]:
+        """Identifiant stable d'une entité : "u:<user_id>" ou "m:<mob_name>"."""
+        if entity.is_mob:
+            mob_name = self.get_mob_name_for_entity(entity)
+            return mob_actor(mob_name) if mob_name else None
+        user_id = self.get_user_id_for_entity(entity)
+        return player_actor(user_id) if user_id else None
+
+    def _entity_for_key(self, key: Optional[str]) -> Optional[RuntimeEntity]:
+        if not key:
+            return None
+        kind, _, ident = key.partition(":")
+        if kind == "u" and ident.isdigit():
+            return self.user_id_to_entity.get(int(ident))
+        if kind == "m":
+            return self.mob_name_to_entity.get(ident)
+        return None
+
+    async def load_state(self) -> None:
+        """
+        Reprend l'ordre du tour, la manche et l'aggro : état dérivé du flux
+        d'événements (snapshot + événements suivants). `combat_state` fournit
+        le rythme choisi, et l'état des combats antérieurs au flux.
+        """
+        row = await self.db.storage.get_combat_state(self.combat_id)
+        if row:
+            self.pacing = row["pacing"]
+        state = (await combat_event_log(self.db, self.combat_id)).state
+        if state.actor is not None:
+            self._restore_turn(state.actor, state.turn_index, state.round)
+            for mob, by in state.aggro.items():
+                self._restore_aggro(mob, by)
+        elif row:
+            self._restore_turn(row["actor"], int(row["turn_index"]), int(row["round"]))
+            for mob_name, user_id in json.loads(row["aggro"] or "{}").items():
+                self._restore_aggro(mob_actor(mob_name), player_actor(user_id))
+
+    def _restore_turn(self, actor_key: Optional[str], turn_index: int, round: int) -> None:
+        self.round = round
+        actor = self._entity_for_key(actor_key)
+        if actor is not None:
+            self.current_turn_index = self._index_of(actor)
+        elif self.participants:
+            self.current_turn_index = min(turn_index, len(self.participants) - 1)
+
+    def _restore_aggro(self, mob: str, by: str) -> None:
+        mob_entity = self._entity_for_key(mob)
+        if mob_entity is not None:
+            mob_entity.provoked_by = self._entity_for_key(by)
+
+    def provoke(self, mob_entity: RuntimeEntity, player: RuntimeEntity) -> None:
+        """Le mob ciblera `player` en priorité (événement provoke)."""
+        mob_entity.provoked_by = player
+        self._events.append((EVENT_PROVOKE, {"mob": self._actor_key(mob_entity), "by": self._actor_key(player)}))
+
+    async def save_state(self) -> None:
+        """Ajoute au flux du combat les événements en attente (tours, aggro, attaques)."""
+        events, self._events = self._events, []
+        await (await combat_event_log(self.db, self.combat_id)).extend(self.db, events)
+
+    async def save_pacing(self) -> None:
+        """
+        Enregistre le rythme choisi pour ce combat (combat_state). L'aggro
+        déjà enregistrée est conservée : c'est encore la seule source pour
+        les combats antérieurs au flux d'événements.
+        """
+        actor = self.current_actor
+        async with self.db.transaction():
+            row = await self.db.storage.get_combat_state(self.combat_id)
+            await self.db.storage.save_combat_state(
+                self.combat_id,
+                self.current_turn_index,
+                self.round,
+                self._actor_key(actor) if actor is not None else None,
+                row["aggro"] if row and row["aggro"] else "{}",
+                self.pacing,
+            )
     
     def advance_turn(self) -> bool:
         """
@@ -105,12 +295,19 @@ class CombatSession:
         loops = 0
         
         while loops < max_loops:
-            # Passage à l'index suivant
+            # Passage à l'index suivant (retour au premier : nouvelle manche)
             self.current_turn_index = (self.current_turn_index + 1) % len(self.participants)
+            if self.current_turn_index == 0:
+                self.round += 1
             candidate = self.participants[self.current_turn_index]
             
             # Si le candidat est en vie, c'est bon, on arrête de chercher
             if candidate.hp > 0:
+                self._events.append((EVENT_TURN, {
+                    "actor": self._actor_key(candidate),
+                    "round": self.round,
+                    "index": self.current_turn_index,
+                }))
                 return True
                 
             loops += 1
@@ -133,32 +330,21 @@ class CombatSession:
         # 1. Vérification de la provocation
         if mob_entity.provoked_by and mob_entity.provoked_by in alive_players:
             return mob_entity.provoked_by
-        else:
+        elif mob_entity.provoked_by is not None:
             # Réinitialiser la provocation si la cible n'est plus valide
             mob_entity.provoked_by = None
+            self._events.append((EVENT_PROVOKE, {"mob": self._actor_key(mob_entity), "by": None}))
             
         # 2. Sélection aléatoire
         return random.choice(alive_players)
     
-    async def execute_mob_turn(self, mob_entity: RuntimeEntity, channel: discord.TextChannel) -> None:
-        """Exécute le tour d'un mob"""
-        # Sécurité: vérifier que le mob est en vie
-        if mob_entity.hp <= 0:
-            logger.warning(f"Tentative d'exécuter le tour d'un mob mort: {mob_entity.name}")
-            return
-            
+    def resolve_mob_turn(self, mob_entity: RuntimeEntity) -> Optional[MobAttack]:
+        """Résout l'attaque d'un mob (sans I/O) ; None s'il n'a personne à attaquer."""
         target = self.get_mob_target(mob_entity)
-        
         if not target:
-            await channel.send(f"🤔 **{mob_entity.name}** ne trouve personne à attaquer...")
-            return
+            return None
         
-        # Déterminer le type d'attaque (simple pour l'instant)
-        attack_type: AttackType = "phys"
-        if mob_entity.INT > mob_entity.STR:
-            attack_type = "magic"
-        elif mob_entity.DEX > mob_entity.STR:
-            attack_type = "ranged"
+        attack_type = mob_attack_type(mob_entity)
         
         # Lancer les dés pour l'attaque
         roll_a = d20()
@@ -166,36 +352,76 @@ class CombatSession:
         
         # Résoudre l'attaque
         result = resolve_attack(mob_entity, target, roll_a, roll_b, attack_type=attack_type)
+        self._events.extend(attack_events(
+            self._actor_key(mob_entity), self._actor_key(target), attack_type, roll_a, roll_b, result, target.hp
+        ))
+        return MobAttack(mob_entity, target, attack_type, roll_a, roll_b, result)
+
+    async def play_mob_turn(self, mob_entity: RuntimeEntity) -> Optional[MobAttack]:
+        """Joue le tour d'un mob et sauvegarde les PV de sa cible, sans rien envoyer (rythme détaillé)"""
+        attack = self.resolve_mob_turn(mob_entity)
         
         # Sauvegarder les HP de la cible si c'est un joueur
-        if not target.is_mob:
-            # Utiliser l'ID d'entité pour récupérer l'ID utilisateur
-            entity_id = self._get_entity_id(target)
-            user_id = self.id_to_user_id.get(entity_id)
+        if attack and not attack.target.is_mob:
+            user_id = self.get_user_id_for_entity(attack.target)
             if user_id:
-                await save_player_hp(self.db, user_id, target.hp)
-        
-        # Créer un message pour l'attaque
-        color = discord.Color.red() if result["hit"] else discord.Color.dark_gray()
-        embed = discord.Embed(title=f"⚔️ {mob_entity.name} attaque {target.name}", color=color)
-        
-        embed.add_field(name="Type", value=str(attack_type), inline=True)
-        embed.add_field(name="Jet attaquant (d20)", value=str(roll_a), inline=True)
-        embed.add_field(name="Jet défenseur (d20)", value=str(roll_b), inline=True)
+                await save_player_hp(self.db, user_id, attack.target.hp)
+        return attack
+
+    async def execute_mob_turn(self, mob_entity: RuntimeEntity, channel: discord.TextChannel) -> None:
+        """Exécute le tour d'un mob et l'annonce par un embed (rythme détaillé)"""
+        # Sécurité: vérifier que le mob est en vie
+        if mob_entity.hp <= 0:
+            logger.warning(f"Tentative d'exécuter le tour d'un mob mort: {mob_entity.name}")
+            return
+            
+        attack = await self.play_mob_turn(mob_entity)
         
-        if result["hit"]:
-            embed.add_field(name="Dégâts", value=f'{result["raw"]["damage"]:.2f}', inline=True)
-            embed.add_field(name="PV restants", value=f'{target.hp:.0f}/{target.hp_max:.0f}', inline=True)
-        else:
-            embed.add_field(name="Résultat", value="Attaque esquivée/bloquée", inline=True)
+        if not attack:
+            await channel.send(f"🤔 **{mob_entity.name}** ne trouve personne à attaquer...")
+            return
         
-        embed.add_field(
-            name="Log",
-            value="\n".join(result["effects"]) if result["effects"] else "—",
-            inline=False,
-        )
+        await channel.send(embed=mob_attack_embed(attack))
+
+    async def run_mob_phase(self) -> MobPhase:
+        """
+        Joue d'un coup tous les tours de mobs consécutifs, à partir de
+        l'acteur courant, jusqu'au prochain joueur (rythme groupé).
+
+        Aucune I/O Discord : les PV des joueurs touchés sont écrits une
+        fois chacun, avec le nettoyage des mobs morts, dans une seule
+        transaction, avec les événements de la phase.
+        """
+        phase = MobPhase()
+        hit_players: Dict[int, RuntimeEntity] = {}
+        actor = self.current_actor
+        while actor is not None and actor.is_mob and actor.hp > 0:
+            attack = self.resolve_mob_turn(actor)
+            if attack is None:
+                phase.idle.append(actor)
+            else:
+                phase.attacks.append(attack)
+                if not attack.target.is_mob:
+                    user_id = self.get_user_id_for_entity(attack.target)
+                    if user_id:
+                        hit_players[user_id] = attack.target
+            
+            # Tous les joueurs KO : fin du combat
+            if not any(not p.is_mob and p.hp > 0 for p in self.participants):
+                phase.players_ko = True
+                break
+            
+            if not self.advance_turn():
+                phase.stalled = True
+                break
+            actor = self.current_actor
         
-        await channel.send(embed=embed)
+        async with self.db.transaction():
+            for user_id, entity in hit_players.items():
+                await save_player_hp(self.db, user_id, entity.hp)
+            await cleanup_dead_mobs(self.db, self.thread_id)
+            await self.save_state()
+        return phase
 
     def get_user_id_for_entity(self, entity: RuntimeEntity) -> Optional[int]:
         """Récupère l'ID utilisateur associé à une entité"""
@@ -207,8 +433,119 @@ class CombatSession:
         entity_id = self._get_entity_id(entity)
         return self.id_to_mob_name.get(entity_id)
 
+def mob_attack_embed(attack: MobAttack) -> discord.Embed:
+    """Embed détaillé d'une attaque de mob."""
+    result = attack.result
+    target = attack.target
+    color = discord.Color.red() if result.hit else discord.Color.dark_gray()
+    embed = discord.Embed(title=f"⚔️ {attack.mob.name} attaque {target.name}", color=color)
+    
+    embed.add_field(name="Type", value=str(attack.attack_type), inline=True)
+    embed.add_field(name="Jet attaquant (d20)", value=str(attack.roll_a), inline=True)
+    embed.add_field(name="Jet défenseur (d20)", value=str(attack.roll_b), inline=True)
+    
+    if result.hit:
+        embed.add_field(name="Dégâts", value=f'{result.damage:.2f}', inline=True)
+        embed.add_field(name="PV restants", value=f'{target.hp:.0f}/{target.hp_max:.0f}', inline=True)
+    else:
+        embed.add_field(name="Résultat", value="Attaque esquivée/bloquée", inline=True)
+    
+    embed.add_field(
+        name="Log",
+        value=result.text(),
+        inline=False,
+    )
+    return embed
+
+
+def mob_phase_embeds(phase: MobPhase) -> List[discord.Embed]:
+    """
+    Récapitulatif d'une phase des mobs : une ligne (champ) par attaque,
+    25 champs par embed et au plus 10 embeds, soit un seul message.
+    """
+    lines: List[Tuple[str, str]] = []
+    for attack in phase.attacks:
+        result = attack.result
+        target = attack.target
+        name = f"⚔️ {attack.mob.name} → {target.name}"
+        rolls = f"{attack.attack_type} · d20 {attack.roll_a} vs {attack.roll_b}"
+        if result.hit:
+            value = f'{rolls} · **{result.damage:.2f}** dégâts · PV {target.hp:.0f}/{target.hp_max:.0f}'
+        else:
+            value = f"{rolls} · esquivée/bloquée"
+        lines.append((name, value[:1024]))
+    for mob in phase.idle:
+        lines.append((f"🤔 {mob.name}", "ne trouve personne à attaquer"))
+
+    embeds: List[discord.Embed] = []
+    max_lines = _EMBED_MAX_FIELDS * _MESSAGE_MAX_EMBEDS
+    for start in range(0, min(len(lines), max_lines), _EMBED_MAX_FIELDS):
+        color = discord.Color.red() if any(a.result.hit for a in phase.attacks) else discord.Color.dark_gray()
+        title = "🎲 Tour des mobs" if not embeds else None
+        embed = discord.Embed(title=title, color=color)
+        for name, value in lines[start:start + _EMBED_MAX_FIELDS]:
+            embed.add_field(name=name, value=value, inline=False)
+        embeds.append(embed)
+    if len(lines) > max_lines:
+        embeds[-1].set_footer(text=f"… et {len(lines) - max_lines} action(s) de plus")
+    return embeds
+
+
+class CombatSessionStore:
+    """
+    Sessions de combat en mémoire, par fil (LRU + TTL).
+
+    Une session inutilisée depuis `ttl_s` est rechargée depuis la base, les
+    plus anciennes sont évincées au-delà de `max_size`, et `combat_close`
+    évince celle du fil fermé. Rien n'est perdu à l'éviction : le tour, la
+    manche et l'aggro sont rejoués depuis `combat_snapshots` / `combat_events`,
+    le rythme vient de `combat_state`, les PV de characters / combat_mobs.
+    """
+
+    def __init__(self, max_size: int = COMBAT_SESSION_CACHE_SIZE, ttl_s: float = COMBAT_SESSION_TTL_S):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._items: "OrderedDict[int, Tuple[CombatSession, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def get(self, db, thread_id: int) -> CombatSession:
+        thread_id = int(thread_id)
+        now = time.monotonic()
+        entry = self._items.get(thread_id)
+        if entry is not None and now - entry[1] <= self.ttl_s:
+            session = entry[0]
+            await session.refresh()
+        else:
+            session = CombatSession(db, thread_id)
+            await session.load_participants()
+        self._items[thread_id] = (session, now)
+        self._items.move_to_end(thread_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return session
+
+    def evict(self, thread_id: int) -> None:
+        self._items.pop(int(thread_id), None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+# Un magasin par base (Database ou MemoryDatabase), comme le cache des personnages
+_stores: "weakref.WeakKeyDictionary[Any, CombatSessionStore]" = weakref.WeakKeyDictionary()
+
+
+def session_store(db) -> CombatSessionStore:
+    """Sessions de combat de `db` (magasin créé au premier appel)."""
+    store = _stores.get(db)
+    if store is None:
+        store = _stores[db] = CombatSessionStore()
+        db.add_rollback_hook(store.clear)
+    return store
+
+
 async def get_or_create_session(db, thread_id: int) -> CombatSession:
-    """Récupère ou crée une session de combat pour un thread donné"""
-    session = CombatSession(db, thread_id)
-    await session.load_participants()
-    return session
\ No newline at end of file
+    """Récupère (resynchronisée) ou crée la session de combat d'un fil"""
+    return await session_store(db).get(db, thread_id)
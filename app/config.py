@@ -2,12 +2,23 @@ import os
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
+from .combat_session_manager import DEFAULT_PACING, PACING_MODES
+from .db import DEFAULT_PROFILE, PERFORMANCE_PROFILES
+
 
 @dataclass(frozen=True)
 class Config:
     DISCORD_TOKEN: str
     GUILD_ID: int
     DB_PATH: str
+    DB_READ_POOL_SIZE: int = 3
+    DB_INSTRUMENT: bool = False
+    DB_SLOW_QUERY_MS: float = 100.0
+    DB_PROFILE: str = DEFAULT_PROFILE
+    DB_MAINTENANCE_INTERVAL_MIN: float = 360.0
+    DB_LOG_RETENTION_DAYS: int = 90
+    DB_ARCHIVE_RETENTION_DAYS: int = 0
+    COMBAT_PACING: str = DEFAULT_PACING
 
 
 def load_config() -> Config:
@@ -18,5 +29,31 @@ def load_config() -> Config:
 
     guild_id = int(os.getenv("GUILD_ID", "0"))
     db_path = os.getenv("DB_PATH", "./bofuri.sqlite3")
+    db_read_pool_size = int(os.getenv("DB_READ_POOL_SIZE", "3"))
+    db_instrument = os.getenv("DB_INSTRUMENT", "0").strip().lower() in {"1", "true", "yes", "on"}
+    db_slow_query_ms = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+    db_profile = os.getenv("DB_PROFILE", DEFAULT_PROFILE).strip().lower()
+    if db_profile not in PERFORMANCE_PROFILES:
+        raise RuntimeError(f"DB_PROFILE invalide: {db_profile} (choix: {', '.join(PERFORMANCE_PROFILES)})")
+    # 0 désactive la maintenance / la purge correspondante
+    db_maintenance_interval_min = float(os.getenv("DB_MAINTENANCE_INTERVAL_MIN", "360"))
+    db_log_retention_days = int(os.getenv("DB_LOG_RETENTION_DAYS", "90"))
+    db_archive_retention_days = int(os.getenv("DB_ARCHIVE_RETENTION_DAYS", "0"))
+    # Rythme par défaut du tour des mobs (modifiable par combat avec /combat_pacing)
+    combat_pacing = os.getenv("COMBAT_PACING", DEFAULT_PACING).strip().lower()
+    if combat_pacing not in PACING_MODES:
+        raise RuntimeError(f"COMBAT_PACING invalide: {combat_pacing} (choix: {', '.join(PACING_MODES)})")
 
-    return Config(DISCORD_TOKEN=token, GUILD_ID=guild_id, DB_PATH=db_path)
+    return Config(
+        DISCORD_TOKEN=token,
+        GUILD_ID=guild_id,
+        DB_PATH=db_path,
+        DB_READ_POOL_SIZE=db_read_pool_size,
+        DB_INSTRUMENT=db_instrument,
+        DB_SLOW_QUERY_MS=db_slow_query_ms,
+        DB_PROFILE=db_profile,
+        DB_MAINTENANCE_INTERVAL_MIN=db_maintenance_interval_min,
+        DB_LOG_RETENTION_DAYS=db_log_retention_days,
+        DB_ARCHIVE_RETENTION_DAYS=db_archive_retention_days,
+        COMBAT_PACING=combat_pacing,
+    )
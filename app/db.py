@@ -1,12 +1,21 @@
 import aiosqlite
+import asyncio
+import contextvars
 import logging
-from typing import Optional, Any, Dict, List, Tuple
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple, TypeVar, Union
 
+from .db_metrics import QueryStats
+from .storage.sqlite import SqliteStorage
+
+T = TypeVar("T")
+RowFactory = Callable[[Any, tuple], Any]
 logger = logging.getLogger('bofuri.db')
 
+# Schéma de base (version 1 des migrations)
 SCHEMA_SQL = """
-PRAGMA journal_mode=WAL;
-
 CREATE TABLE IF NOT EXISTS players (
   user_id     INTEGER PRIMARY KEY,
   name        TEXT NOT NULL,
@@ -118,34 +127,332 @@ CREATE TABLE IF NOT EXISTS character_skills (
 );
 """
 
+
+async def _add_column_if_missing(conn: aiosqlite.Connection, table: str, column: str, decl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN, sauf si une ancienne version l'a déjà ajoutée à la main."""
+    async with conn.execute(f"PRAGMA table_info({table})") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    if column not in columns:
+        await conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+async def _migration_combat_logs_combat_id(conn: aiosqlite.Connection) -> None:
+    await _add_column_if_missing(conn, "combat_logs", "combat_id", "INTEGER")
+
+
+async def _migration_combat_archive_events(conn: aiosqlite.Connection) -> None:
+    # Flux d'événements du combat archivé (JSON + zlib, voir app.storage.archive)
+    await _add_column_if_missing(conn, "combat_archive", "events", "BLOB")
+
+
+async def _migration_combat_state_pacing(conn: aiosqlite.Connection) -> None:
+    # Rythme du tour des mobs choisi pour ce combat (NULL : valeur par défaut du bot)
+    await _add_column_if_missing(conn, "combat_state", "pacing", "TEXT")
+
+
+# Index des requêtes chaudes (vérifiés par `python -m app.db_audit`).
+# combats(thread_id, status), combat_mobs(channel_id, mob_name) et
+# combat_participants(combat_id, user_id) sont déjà couverts par leurs
+# contraintes UNIQUE / PRIMARY KEY.
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_combats_channel_status ON combats(channel_id, status);
+CREATE INDEX IF NOT EXISTS idx_inventories_character_item ON inventories(character_id, item_id);
+CREATE INDEX IF NOT EXISTS idx_combat_logs_combat ON combat_logs(combat_id);
+"""
+
+
+# Index utilisés par les purges de la maintenance (app.maintenance)
+RETENTION_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_combat_logs_created ON combat_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_combats_status_closed ON combats(status, closed_at);
+"""
+
+
+# Archive froide : un combat fermé y est déplacé en une seule ligne
+# (participants et mobs en JSON, journal compressé par app.storage.archive)
+ARCHIVE_SQL = """
+CREATE TABLE IF NOT EXISTS combat_archive (
+  combat_id     INTEGER PRIMARY KEY,
+  channel_id    INTEGER NOT NULL,
+  thread_id     INTEGER,
+  created_by    INTEGER NOT NULL,
+  created_at    TIMESTAMP,
+  closed_at     TIMESTAMP,
+  archived_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  participants  TEXT NOT NULL DEFAULT '[]',
+  mobs          TEXT NOT NULL DEFAULT '[]',
+  log_count     INTEGER NOT NULL DEFAULT 0,
+  logs          BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_combat_archive_thread ON combat_archive(thread_id);
+CREATE INDEX IF NOT EXISTS idx_combat_archive_channel ON combat_archive(channel_id, combat_id);
+CREATE INDEX IF NOT EXISTS idx_combat_archive_archived ON combat_archive(archived_at);
+"""
+
+
+# Fusion de l'ancienne table players (/pc_create) dans characters : les
+# fiches sans personnage deviennent des personnages niveau 1 (mêmes valeurs
+# par défaut que create_character), puis la table disparaît.
+PLAYERS_FOLD_SQL = """
+-- Les personnages existants priment : players n'était qu'une copie de secours
+INSERT INTO characters (user_id, name, level, xp, xp_next, hp, hp_max, mp, mp_max, STR, AGI, INT, DEX, VIT, gold, stat_points)
+SELECT p.user_id, p.name, 1, 0, 1100, p.hp, p.hp_max, p.mp, p.mp_max, p.str, p.agi, p.int_, p.dex, p.vit, 0, 0
+FROM players p
+WHERE NOT EXISTS (SELECT 1 FROM characters c WHERE c.user_id = p.user_id);
+DROP TABLE IF EXISTS players;
+"""
+
+
+# État des tours d'un combat actif (CombatSession) : survit aux redémarrages.
+# `actor` identifie l'acteur courant ("u:<user_id>" ou "m:<mob_name>"),
+# `aggro` associe chaque mob provoqué au user_id qui l'a provoqué (JSON).
+COMBAT_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS combat_state (
+  combat_id   INTEGER PRIMARY KEY,
+  turn_index  INTEGER NOT NULL DEFAULT 0,
+  round       INTEGER NOT NULL DEFAULT 1,
+  actor       TEXT,
+  aggro       TEXT NOT NULL DEFAULT '{}',
+  updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+# Flux d'événements typés des combats (app.combat_events) : ajout seul, jamais
+# de mise à jour. combat_snapshots garde le dernier état dérivé de chaque
+# combat ; l'état courant = ce snapshot + les événements d'id supérieur.
+COMBAT_EVENTS_SQL = """
+CREATE TABLE IF NOT EXISTS combat_events (
+  id          INTEGER PRIMARY KEY,
+  combat_id   INTEGER NOT NULL,
+  kind        TEXT NOT NULL,
+  payload     TEXT NOT NULL DEFAULT '{}',
+  created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_combat_events_combat ON combat_events(combat_id, id);
+CREATE TABLE IF NOT EXISTS combat_snapshots (
+  combat_id      INTEGER PRIMARY KEY,
+  last_event_id  INTEGER NOT NULL,
+  state          TEXT NOT NULL,
+  created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+MigrationStep = Union[str, Callable[[aiosqlite.Connection], Awaitable[None]]]
+
+# (version, description, étape) — appliquées dans l'ordre, une seule fois par base,
+# la version courante étant stockée dans PRAGMA user_version.
+# Ne jamais modifier une migration publiée : en ajouter une nouvelle.
+MIGRATIONS: List[Tuple[int, str, MigrationStep]] = [
+    (1, "schéma initial", SCHEMA_SQL),
+    (2, "combat_logs.combat_id", _migration_combat_logs_combat_id),
+    (3, "index des requêtes chaudes", INDEXES_SQL),
+    (4, "index de rétention", RETENTION_INDEXES_SQL),
+    (5, "archive des combats fermés", ARCHIVE_SQL),
+    (6, "fusion de players dans characters", PLAYERS_FOLD_SQL),
+    (7, "état des tours des combats", COMBAT_STATE_SQL),
+    (8, "combat_state.pacing", _migration_combat_state_pacing),
+    (9, "événements et snapshots des combats", COMBAT_EVENTS_SQL),
+    (10, "combat_archive.events", _migration_combat_archive_events),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+async def apply_migrations(conn: aiosqlite.Connection) -> int:
+    """Amène le schéma à SCHEMA_VERSION. Retourne la version atteinte."""
+    async with conn.execute("PRAGMA user_version") as cursor:
+        current = (await cursor.fetchone())[0]
+
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Schéma de la base (v{current}) plus récent que le code (v{SCHEMA_VERSION})"
+        )
+
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Migration du schéma v{version}: {description}")
+        if conn.in_transaction:
+            await conn.commit()
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            if isinstance(step, str):
+                # executescript() commiterait la transaction : on découpe le script
+                for statement in step.split(";"):
+                    if statement.strip():
+                        await conn.execute(statement)
+            else:
+                await step(conn)
+            await conn.execute(f"PRAGMA user_version = {int(version)}")
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+        current = version
+
+    return current
+
+
+async def ensure_incremental_vacuum(conn: aiosqlite.Connection) -> bool:
+    """
+    Passe la base en auto_vacuum=INCREMENTAL, au démarrage, avant que le bot
+    n'accepte des commandes : la maintenance n'a plus ensuite qu'à rendre les
+    pages libres par petits pas (`PRAGMA incremental_vacuum(N)`).
+
+    Immédiat sur une base neuve ; une base existante demande une seule fois
+    un VACUUM complet. Retourne True si ce VACUUM a eu lieu.
+    """
+    async with conn.execute("PRAGMA auto_vacuum") as cursor:
+        if (await cursor.fetchone())[0] == 2:
+            return False
+    await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    async with conn.execute("PRAGMA auto_vacuum") as cursor:
+        if (await cursor.fetchone())[0] == 2:
+            return False
+    logger.info("Conversion de la base en auto_vacuum=INCREMENTAL (VACUUM complet, une seule fois)")
+    if conn.in_transaction:
+        await conn.commit()
+    await conn.execute("VACUUM")
+    return True
+
+# Profils de performance SQLite, appliqués à chaque connexion (écrivain et lecteurs).
+#   durable    : fsync à chaque commit, aucun risque de perte même sur coupure de courant
+#   balanced   : fsync aux checkpoints WAL seulement ; un crash de l'OS peut perdre
+#                les derniers commits, jamais corrompre la base
+#   throughput : plus aucun fsync, gros cache et mmap ; pour un hôte fiable
+# cache_size négatif = taille en KiB ; busy_timeout en ms ; wal_autocheckpoint en pages.
+PERFORMANCE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -8_000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5_000,
+        "wal_autocheckpoint": 1_000,
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -32_000,
+        "mmap_size": 128 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5_000,
+        "wal_autocheckpoint": 1_000,
+    },
+    "throughput": {
+        "synchronous": "OFF",
+        "cache_size": -64_000,
+        "mmap_size": 512 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10_000,
+        "wal_autocheckpoint": 4_000,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+async def apply_profile(conn: aiosqlite.Connection, profile: str) -> Dict[str, Any]:
+    """Applique un profil de performance et retourne les valeurs effectives relues."""
+    settings = PERFORMANCE_PROFILES[profile]
+    effective: Dict[str, Any] = {}
+    for pragma, value in settings.items():
+        await conn.execute(f"PRAGMA {pragma} = {value}")
+        async with conn.execute(f"PRAGMA {pragma}") as cursor:
+            row = await cursor.fetchone()
+        effective[pragma] = row[0] if row else None
+    return effective
+
+
 class Database:
-    def __init__(self, path: str):
+    """
+    Accès SQLite partagé par tout le bot.
+
+    Une connexion dédiée aux écritures (`conn`) et un petit pool de connexions
+    en lecture seule (WAL) : les SELECT des commandes d'affichage ne font plus
+    la queue derrière les commit des commandes de combat.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        read_pool_size: int = 3,
+        instrument: bool = False,
+        slow_query_ms: float = 100.0,
+        profile: str = DEFAULT_PROFILE,
+    ):
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Profil SQLite inconnu: {profile} (choix: {', '.join(PERFORMANCE_PROFILES)})")
         self.path = path
+        self.profile = profile
+        self.read_pool_size = max(0, int(read_pool_size))
+        # Instrumentation optionnelle : None = aucune mesure
+        self.stats: Optional[QueryStats] = QueryStats(slow_query_ms) if instrument else None
+        # Accès de haut niveau utilisé par les helpers de domaine (voir app.storage)
+        self.storage = SqliteStorage(self)
         self._conn: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+
+        # Unité de travail : le verrou sérialise les écrivains, la profondeur
+        # (propre à chaque tâche asyncio) dit si on est dans `transaction()`.
+        self._write_lock = asyncio.Lock()
+        self._tx_depth: contextvars.ContextVar[int] = contextvars.ContextVar(f"bofuri_db_tx_{id(self)}", default=0)
+        # Dernière requête des commandes (monotonic), pour que la maintenance leur laisse la priorité
+        self.last_activity = 0.0
+        # Appelés après un rollback de `transaction()` (caches à invalider)
+        self._rollback_hooks: List[Callable[[], None]] = []
+
+    def _reader_uri(self) -> Optional[str]:
+        """URI lecture seule du fichier, ou None si la base n'est pas un fichier (":memory:")."""
+        if not self.path or self.path == ":memory:" or self.path.startswith("file:"):
+            return None
+        return Path(self.path).resolve().as_uri() + "?mode=ro"
 
     async def connect(self) -> None:
         self._conn = await aiosqlite.connect(self.path)
         self._conn.row_factory = aiosqlite.Row
 
-        # Exécuter le script de schéma
         try:
-            await self._conn.executescript(SCHEMA_SQL)
-            await self._conn.commit()
-            logger.info("Base de données initialisée avec succès")
-
-            # Vérifier que les tables ont été créées
-            tables = ["players", "combats", "combat_participants", "combat_logs", "combat_mobs"]
-            for table in tables:
-                async with self._conn.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'") as cursor:
-                    if not await cursor.fetchone():
-                        logger.error(f"La table {table} n'a pas été créée correctement")
-                    else:
-                        logger.info(f"Table {table} créée avec succès")
+            # Avant le WAL et le schéma : gratuit sur une base neuve
+            await ensure_incremental_vacuum(self._conn)
+            await self._conn.execute("PRAGMA journal_mode=WAL")
+            effective = await apply_profile(self._conn, self.profile)
+            logger.info(
+                f"Profil SQLite '{self.profile}': "
+                + ", ".join(f"{pragma}={value}" for pragma, value in effective.items())
+            )
+            version = await apply_migrations(self._conn)
+            logger.info(f"Base de données initialisée avec succès (schéma v{version})")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation de la base de données: {str(e)}", exc_info=True)
             raise
 
+        await self._open_readers()
+
+    async def _open_readers(self) -> None:
+        """Ouvre le pool de lecteurs (après le schéma, pour que le fichier soit déjà en WAL)."""
+        uri = self._reader_uri()
+        self._idle_readers = asyncio.Queue()
+        if uri is None or self.read_pool_size == 0:
+            logger.info("Pool de lecture désactivé, toutes les requêtes passent par la connexion d'écriture")
+            return
+
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(uri, uri=True)
+            reader.row_factory = aiosqlite.Row
+            await reader.execute("PRAGMA query_only = ON")
+            await apply_profile(reader, self.profile)
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+        logger.info(f"Pool de lecture ouvert ({len(self._readers)} connexions)")
+
     async def close(self) -> None:
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._idle_readers = None
         if self._conn:
             await self._conn.close()
             self._conn = None
@@ -156,34 +463,179 @@ class Database:
             raise RuntimeError("DB non connectée")
         return self._conn
 
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Emprunte une connexion de lecture.
+
+        Si aucune n'est disponible (pas de pool) ou si la tâche courante est dans
+        une transaction, on lit sur l'écrivain pour voir ses propres écritures.
+        """
+        conn = self.conn
+        self.last_activity = time.monotonic()
+        if not self._readers or self.in_transaction:
+            yield conn
+            return
+
+        reader = await self._idle_readers.get()
+        try:
+            yield reader
+        finally:
+            self._idle_readers.put_nowait(reader)
+
+    @property
+    def in_transaction(self) -> bool:
+        """True si la tâche courante est à l'intérieur de `transaction()`."""
+        return self._tx_depth.get() > 0
+
+    def add_rollback_hook(self, hook: Callable[[], None]) -> None:
+        """Enregistre une fonction appelée après chaque rollback de `transaction()`."""
+        self._rollback_hooks.append(hook)
+
+    def _run_rollback_hooks(self) -> None:
+        for hook in self._rollback_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Erreur dans un hook de rollback: {e}", exc_info=True)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["Database"]:
+        """
+        Unité de travail : tout ce qui est exécuté dans le bloc est commité une
+        seule fois à la sortie (ou annulé en cas d'exception).
+
+        Les helpers appellent toujours `db.commit()` : dans une transaction,
+        c'est un no-op. Les blocs imbriqués rejoignent la transaction englobante.
+        """
+        depth = self._tx_depth.get()
+        if depth:
+            token = self._tx_depth.set(depth + 1)
+            try:
+                yield self
+            finally:
+                self._tx_depth.reset(token)
+            return
+
+        conn = self.conn
+        async with self._write_lock:
+            token = self._tx_depth.set(1)
+            try:
+                if conn.in_transaction:
+                    # Écriture implicite laissée ouverte hors unité de travail
+                    await conn.commit()
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield self
+                except BaseException:
+                    await conn.rollback()
+                    self._run_rollback_hooks()
+                    raise
+                if self.stats is None:
+                    await conn.commit()
+                else:
+                    await self._observed("COMMIT", conn.commit())
+            finally:
+                self._tx_depth.reset(token)
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Connexion d'écriture brute, verrou pris, hors unité de travail et hors
+        `last_activity` : réservé à la maintenance (checkpoint, incremental_vacuum, purges).
+        """
+        conn = self.conn
+        async with self._write_lock:
+            if conn.in_transaction:
+                await conn.commit()
+            yield conn
+
+    async def _observed(self, sql: str, awaitable: Awaitable[T]) -> T:
+        """Chronomètre une opération et l'enregistre dans `stats`."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stats.record(sql, time.perf_counter() - start)
+
     async def execute(self, query: str, params: Tuple = ()) -> aiosqlite.Cursor:
         """Helper to execute a query directly via the Database object."""
+        if self.stats is not None:
+            return await self._observed(query, self._execute(query, params))
+        return await self._execute(query, params)
+
+    async def _execute(self, query: str, params: Tuple) -> aiosqlite.Cursor:
         if not self._conn:
             raise RuntimeError("DB non connectée")
-        return await self._conn.execute(query, params)
+        self.last_activity = time.monotonic()
+        if self.in_transaction:
+            return await self._conn.execute(query, params)
+        # Hors transaction : attendre qu'une éventuelle unité de travail se termine
+        async with self._write_lock:
+            return await self._conn.execute(query, params)
 
-    async def commit(self) -> None:
-        """Helper to commit changes."""
-        if self._conn:
-            await self._conn.commit()
+    async def executemany(self, query: str, params: Iterable[Tuple]) -> aiosqlite.Cursor:
+        """Exécute une même requête pour chaque jeu de paramètres (un seul aller-retour vers le thread SQLite)."""
+        if self.stats is not None:
+            return await self._observed(query, self._executemany(query, params))
+        return await self._executemany(query, params)
 
-    async def execute_fetchone(self, query: str, params: Tuple = ()) -> Optional[Dict[str, Any]]:
-        """Exécute une requête SQL et retourne la première ligne du résultat."""
+    async def _executemany(self, query: str, params: Iterable[Tuple]) -> aiosqlite.Cursor:
         if not self._conn:
             raise RuntimeError("DB non connectée")
-        async with self._conn.execute(query, params) as cursor:
-            return await cursor.fetchone()
+        self.last_activity = time.monotonic()
+        if self.in_transaction:
+            return await self._conn.executemany(query, params)
+        async with self._write_lock:
+            return await self._conn.executemany(query, params)
 
-    async def execute_fetchall(self, query: str, params: Tuple = ()) -> List[Dict[str, Any]]:
-        """Exécute une requête SQL et retourne toutes les lignes du résultat."""
-        if not self._conn:
-            raise RuntimeError("DB non connectée")
-        async with self._conn.execute(query, params) as cursor:
-            return await cursor.fetchall()
+    async def commit(self) -> None:
+        """Helper to commit changes (no-op à l'intérieur de `transaction()`)."""
+        if not self._conn or self.in_transaction:
+            return
+        if self.stats is not None:
+            await self._observed("COMMIT", self._commit())
+        else:
+            await self._commit()
+
+    async def _commit(self) -> None:
+        async with self._write_lock:
+            await self._conn.commit()
+
+    async def execute_fetchone(self, query: str, params: Tuple = (), row_factory: Optional[RowFactory] = None) -> Optional[Any]:
+        """
+        Exécute une requête SQL et retourne la première ligne du résultat.
+
+        `row_factory` remplace `aiosqlite.Row` pour ce curseur (ex.
+        `CharacterRecord.row_factory`).
+        """
+        if self.stats is not None:
+            return await self._observed(query, self._fetchone(query, params, row_factory))
+        return await self._fetchone(query, params, row_factory)
+
+    async def _fetchone(self, query: str, params: Tuple, row_factory: Optional[RowFactory]) -> Optional[Any]:
+        async with self._reader() as conn:
+            async with conn.execute(query, params) as cursor:
+                if row_factory is not None:
+                    cursor.row_factory = row_factory
+                return await cursor.fetchone()
+
+    async def execute_fetchall(self, query: str, params: Tuple = (), row_factory: Optional[RowFactory] = None) -> List[Any]:
+        """Exécute une requête SQL et retourne toutes les lignes du résultat (voir `execute_fetchone`)."""
+        if self.stats is not None:
+            return await self._observed(query, self._fetchall(query, params, row_factory))
+        return await self._fetchall(query, params, row_factory)
+
+    async def _fetchall(self, query: str, params: Tuple, row_factory: Optional[RowFactory]) -> List[Any]:
+        async with self._reader() as conn:
+            async with conn.execute(query, params) as cursor:
+                if row_factory is not None:
+                    cursor.row_factory = row_factory
+                return await cursor.fetchall()
 
     async def check_tables(self) -> bool:
         """Vérifie que toutes les tables nécessaires existent dans la base de données."""
-        tables = ["players", "combats", "combat_participants", "combat_logs", "combat_mobs"]
+        tables = ["characters", "combats", "combat_participants", "combat_logs", "combat_mobs"]
         missing_tables = []
 
         for table in tables:
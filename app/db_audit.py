@@ -0,0 +1,103 @@
+# Audit des plans de requêtes
+#
+# Parcourt toutes les requêtes SQL littérales du package `app`, les passe à
+# EXPLAIN QUERY PLAN sur une base vierge au schéma courant (migrations
+# appliquées) et échoue si l'une d'elles parcourt une table entière.
+#
+# Usage:
+#   python -m app.db_audit            # code retour 1 si un scan complet est trouvé
+#   python -m app.db_audit --verbose  # affiche aussi le plan de chaque requête
+
+from __future__ import annotations
+
+import ast
+import asyncio
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import aiosqlite
+
+from app.db import apply_migrations
+
+_SQL_START_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.IGNORECASE)
+_FULL_SCAN_RE = re.compile(r"^SCAN (?P<table>\w+)")
+
+# Tables de référence minuscules : un scan complet y est attendu et sans coût
+ALLOWED_SCANS = {"sqlite_master", "items"}
+
+
+@dataclass
+class Statement:
+    path: Path
+    lineno: int
+    sql: str
+
+
+def iter_statements(package_dir: Path) -> Iterator[Statement]:
+    """Toutes les chaînes littérales qui ressemblent à une requête SQL."""
+    for path in sorted(package_dir.rglob("*.py")):
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        # Les morceaux littéraux des f-strings ne sont pas des requêtes complètes
+        fragments = {
+            id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values
+        }
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Constant)
+                and isinstance(node.value, str)
+                and id(node) not in fragments
+                and _SQL_START_RE.match(node.value)
+            ):
+                yield Statement(path, node.lineno, node.value.strip())
+
+
+async def explain(conn: aiosqlite.Connection, sql: str) -> List[str]:
+    params = (None,) * sql.count("?")
+    async with conn.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+        return [row[3] for row in await cursor.fetchall()]
+
+
+async def audit(package_dir: Path, verbose: bool = False) -> int:
+    conn = await aiosqlite.connect(":memory:")
+    try:
+        await apply_migrations(conn)
+
+        failures: List[Tuple[Statement, str]] = []
+        count = 0
+        for stmt in iter_statements(package_dir):
+            where = f"{stmt.path.relative_to(package_dir.parent)}:{stmt.lineno}"
+            try:
+                plan = await explain(conn, stmt.sql)
+            except Exception as e:
+                failures.append((stmt, f"requête invalide: {e}"))
+                print(f"ERREUR {where}: {e}")
+                continue
+            count += 1
+
+            scans = [
+                detail for detail in plan
+                if (m := _FULL_SCAN_RE.match(detail)) and m.group("table") not in ALLOWED_SCANS
+            ]
+            for detail in scans:
+                failures.append((stmt, detail))
+            if scans or verbose:
+                print(f"{'SCAN' if scans else 'OK'}   {where}: {' '.join(stmt.sql.split())}")
+                for detail in plan:
+                    print(f"         {detail}")
+    finally:
+        await conn.close()
+
+    print(f"{count} requêtes analysées, {len(failures)} problème(s)")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    package_dir = Path(__file__).resolve().parent
+    sys.exit(asyncio.run(audit(package_dir, verbose="--verbose" in sys.argv)))
+
+
+if __name__ == "__main__":
+    main()
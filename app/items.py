@@ -20,12 +20,11 @@ class ItemDefinition:
     @classmethod
     async def from_db(cls, db, item_id: str) -> Optional[ItemDefinition]:
         # Charge une définition d'objet depuis la base de données
-        async with db.conn.execute(
+        row = await db.execute_fetchone(
             "SELECT * FROM items WHERE item_id = ?",
             (item_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            
+        )
+
         if not row:
             return None
             
@@ -44,7 +43,7 @@ class ItemDefinition:
         properties_json = json.dumps(self.properties)
         
         # Insérer ou mettre à jour l'objet dans la base de données
-        await db.conn.execute(
+        await db.execute(
             """
             INSERT INTO items (item_id, name, description, type, rarity, value, properties)
             VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -58,7 +57,7 @@ class ItemDefinition:
             """,
             (self.item_id, self.name, self.description, self.type, self.rarity, self.value, properties_json)
         )
-        await db.conn.commit()
+        await db.commit()
 
 
 # Registre des objets (similaire au registre des mobs)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+logger = logging.getLogger('bofuri.maintenance')
+
+# Taille des lots de suppression : chaque lot tient le verrou d'écriture
+# quelques millisecondes, les commandes passent entre deux lots.
+PURGE_BATCH_SIZE = 500
+
+# Pages rendues au système par pas d'incremental_vacuum, verrou relâché entre
+# deux pas. La conversion en auto_vacuum=INCREMENTAL est faite au démarrage
+# (db.ensure_incremental_vacuum), jamais ici.
+VACUUM_STEP_PAGES = 256
+
+
+class MaintenanceScheduler:
+    """
+    Tâche de fond qui garde `bofuri.sqlite3` en forme sur la durée :
+    checkpoint WAL (TRUNCATE), PRAGMA optimize, incremental_vacuum, purge
+    des journaux trop anciens et archivage des combats fermés.
+
+    Chaque étape attend que les commandes laissent la base tranquille
+    (`idle_s` secondes sans requête) avant de prendre le verrou d'écriture.
+    Réservée à `Database` (SQLite) : `MemoryDatabase` n'a ni fichier ni
+    connexion à entretenir.
+    """
+
+    def __init__(
+        self,
+        db,
+        interval_s: float,
+        log_retention_days: int,
+        archive_retention_days: int = 0,
+        idle_s: float = 5.0,
+        max_idle_wait_s: float = 300.0,
+    ):
+        self.db = db
+        self.interval_s = float(interval_s)
+        self.log_retention_days = int(log_retention_days)
+        self.archive_retention_days = int(archive_retention_days)
+        self.idle_s = float(idle_s)
+        self.max_idle_wait_s = float(max_idle_wait_s)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval_s <= 0:
+            logger.info("Maintenance de la base désactivée")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="bofuri-db-maintenance")
+            logger.info(f"Maintenance de la base planifiée toutes les {self.interval_s / 60:.0f} min")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur pendant la maintenance de la base: {e}", exc_info=True)
+
+    async def _wait_idle(self) -> None:
+        """Attend une accalmie ; au-delà de `max_idle_wait_s`, on passe quand même."""
+        deadline = time.monotonic() + self.max_idle_wait_s
+        while time.monotonic() < deadline:
+            quiet_for = time.monotonic() - self.db.last_activity
+            if quiet_for >= self.idle_s:
+                return
+            await asyncio.sleep(self.idle_s - quiet_for)
+
+    async def run_once(self) -> None:
+        started = time.monotonic()
+
+        logs = await self.purge_old_logs()
+        archived = await self.archive_closed_combats()
+        expired = await self.purge_old_archives()
+
+        freed = await self.incremental_vacuum()
+
+        await self._wait_idle()
+        async with self.db.exclusive() as conn:
+            await conn.execute("PRAGMA optimize")
+
+        await self._wait_idle()
+        async with self.db.exclusive() as conn:
+            async with conn.execute("PRAGMA wal_checkpoint(TRUNCATE)") as cursor:
+                busy, wal_pages, checkpointed = await cursor.fetchone()
+
+        logger.info(
+            f"Maintenance terminée en {time.monotonic() - started:.1f}s : "
+            f"{logs} logs purgés, {archived} combats archivés, {expired} archives expirées, "
+            f"{freed} pages libérées, checkpoint {checkpointed}/{wal_pages} pages"
+            + (" (lecteurs actifs, WAL non tronqué)" if busy else "")
+        )
+
+    async def incremental_vacuum(self) -> int:
+        """Rend les pages libres par pas de VACUUM_STEP_PAGES ; retourne le nombre de pages rendues."""
+        total = 0
+        while True:
+            await self._wait_idle()
+            async with self.db.exclusive() as conn:
+                async with conn.execute("PRAGMA auto_vacuum") as cursor:
+                    if (await cursor.fetchone())[0] != 2:
+                        # Base pas encore convertie (voir db.ensure_incremental_vacuum)
+                        return total
+                async with conn.execute("PRAGMA freelist_count") as cursor:
+                    free = (await cursor.fetchone())[0]
+                if not free:
+                    return total
+                step = min(free, VACUUM_STEP_PAGES)
+                # executescript : chaque sqlite3_step ne rend qu'une page, execute()
+                # s'arrêterait à la première
+                await conn.executescript(f"PRAGMA incremental_vacuum({step});")
+            total += step
+            if free <= VACUUM_STEP_PAGES:
+                return total
+
+    async def _purge(self, table: str, select_ids_sql: str, params: tuple, key: str = "id") -> int:
+        """Supprime par lots les lignes de `table` dont `select_ids_sql` (terminé par LIMIT ?) renvoie la clé."""
+        total = 0
+        while True:
+            await self._wait_idle()
+            async with self.db.exclusive() as conn:
+                async with conn.execute(select_ids_sql, params + (PURGE_BATCH_SIZE,)) as cursor:
+                    ids: List[int] = [row[0] for row in await cursor.fetchall()]
+                if not ids:
+                    return total
+                placeholders = ", ".join("?" * len(ids))
+                await conn.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", ids)
+                await conn.commit()
+            total += len(ids)
+            if len(ids) < PURGE_BATCH_SIZE:
+                return total
+
+    async def purge_old_logs(self) -> int:
+        """Journaux plus vieux que la rétention, hors combats encore actifs."""
+        if self.log_retention_days <= 0:
+            return 0
+        return await self._purge(
+            "combat_logs",
+            """
+            SELECT l.id FROM combat_logs l
+            WHERE l.created_at < datetime('now', ?)
+              AND NOT EXISTS (SELECT 1 FROM combats c WHERE c.id = l.combat_id AND c.status = 'active')
+            LIMIT ?
+            """,
+            (f"-{self.log_retention_days} days",),
+        )
+
+    async def archive_closed_combats(self) -> int:
+        """
+        Archive les combats fermés restés dans les tables chaudes (annulations,
+        /fix_combats, bases antérieures à l'archive) ; `combat_close` archive
+        déjà les autres au moment de la fermeture.
+        """
+        total = 0
+        while True:
+            await self._wait_idle()
+            ids = await self.db.storage.list_closed_combat_ids(PURGE_BATCH_SIZE)
+            if not ids:
+                return total
+            # Une transaction par combat : le verrou est relâché entre deux
+            for combat_id in ids:
+                if await self.db.storage.archive_combat(combat_id):
+                    total += 1
+            if len(ids) < PURGE_BATCH_SIZE:
+                return total
+
+    async def purge_old_archives(self) -> int:
+        """Archives plus vieilles que la rétention (0 = historique conservé indéfiniment)."""
+        if self.archive_retention_days <= 0:
+            return 0
+        return await self._purge(
+            "combat_archive",
+            "SELECT combat_id FROM combat_archive WHERE archived_at < datetime('now', ?) LIMIT ?",
+            (f"-{self.archive_retention_days} days",),
+            key="combat_id",
+        )
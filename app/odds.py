@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from .models import RuntimeEntity
+from .rules import CONTRECOUP_RATIOS, AttackType, _attack_stat
+
+# Distribution exacte des deux d20 de `resolve_attack` (20 x 20 tirages
+# équiprobables), regroupée par écart k = roll_a - roll_b :
+#   (k, P(écart = k), P(écart = k et roll_a > 15))
+# La seconde probabilité sert au multiplicateur magique (x1.2 si roll_a > 15).
+_D20_PAIRS = 20 * 20
+
+
+def _delta_table() -> Tuple[Tuple[int, float, float], ...]:
+    total = {}
+    high = {}
+    for roll_a in range(1, 21):
+        for roll_b in range(1, 21):
+            k = roll_a - roll_b
+            total[k] = total.get(k, 0) + 1
+            if roll_a > 15:
+                high[k] = high.get(k, 0) + 1
+    return tuple((k, total[k] / _D20_PAIRS, high.get(k, 0) / _D20_PAIRS) for k in sorted(total))
+
+
+DELTA_TABLE = _delta_table()
+
+
+@dataclass(frozen=True)
+class ExchangeOdds:
+    """Espérance d'une attaque de `resolve_attack`, sans jet ni modification des PV."""
+
+    hit_chance: float
+    damage_mean: float        # dégâts moyens infligés au défenseur (échecs comptés à 0)
+    damage_on_hit: float      # dégâts moyens quand l'attaque touche
+    damage_max: float
+    contrecoup_chance: float
+    contrecoup_mean: float    # dégâts moyens renvoyés à l'attaquant (réussites comptées à 0)
+
+
+@lru_cache(maxsize=1024)
+def _hit_probability(agi_diff: float) -> float:
+    # hit si roll_a + AGI_a/10 > roll_b + AGI_b/10, soit k + agi_diff > 0
+    return sum(p for k, p, _ in DELTA_TABLE if k + agi_diff > 0)
+
+
+def hit_probability(attacker: RuntimeEntity, defender: RuntimeEntity) -> float:
+    """Probabilité exacte que `attacker` touche `defender`."""
+    return _hit_probability((float(attacker.AGI) - float(defender.AGI)) / 10.0)
+
+
+@lru_cache(maxsize=4096)
+def _expected_exchange(agi_diff: float, atk: float, vit_term: float, attack_type: str) -> ExchangeOdds:
+    ratio = CONTRECOUP_RATIOS[attack_type]
+    hit_chance = damage_mean = damage_max = 0.0
+    contrecoup_chance = contrecoup_mean = 0.0
+
+    for k, p, p_high in DELTA_TABLE:
+        margin = k + agi_diff  # hit_a - hit_b
+        if margin > 0:
+            base = margin + atk
+            if attack_type == "magic":
+                outcomes = ((p_high, base * 1.2), (p - p_high, base * 0.9))
+            elif attack_type == "ranged":
+                outcomes = ((p, base * 0.95),)
+            else:
+                outcomes = ((p, base),)
+            for weight, dmg in outcomes:
+                if weight:
+                    dmg = max(0.0, dmg - vit_term)
+                    damage_mean += weight * dmg
+                    damage_max = max(damage_max, dmg)
+            hit_chance += p
+        else:
+            defense_power = -margin + vit_term - atk
+            if defense_power > 0:
+                contrecoup_chance += p
+                contrecoup_mean += p * defense_power * ratio
+
+    return ExchangeOdds(
+        hit_chance=hit_chance,
+        damage_mean=damage_mean,
+        damage_on_hit=damage_mean / hit_chance if hit_chance else 0.0,
+        damage_max=damage_max,
+        contrecoup_chance=contrecoup_chance,
+        contrecoup_mean=contrecoup_mean,
+    )
+
+
+def expected_exchange(
+    attacker: RuntimeEntity,
+    defender: RuntimeEntity,
+    attack_type: AttackType = "phys",
+    perce_armure: bool = False,
+) -> ExchangeOdds:
+    """
+    Résultat moyen exact de `resolve_attack(attacker, defender, ...)` :
+    mêmes formules, calculées sur les 400 tirages de d20 au lieu d'un seul.
+
+    Mis en cache par (écart d'AGI, stat d'attaque, réduction VIT, type) :
+    les appels suivants pour les mêmes stats sont en O(1).
+    """
+    vit_term = float(defender.VIT) / (100.0 if perce_armure else 10.0)
+    return _expected_exchange(
+        (float(attacker.AGI) - float(defender.AGI)) / 10.0,
+        _attack_stat(attacker, attack_type),
+        vit_term,
+        attack_type,
+    )
@@ -1,8 +1,17 @@
-from typing import Dict, Any, Literal, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, List, Literal, Mapping, Optional, Tuple, Union
 from .models import RuntimeEntity
 
+if TYPE_CHECKING:
+    import numpy as np
+
 AttackType = Literal["phys", "magic", "ranged"]
 
+# Codes des types d'attaque pour les tableaux de `resolve_attacks_batch`
+ATTACK_TYPE_CODES: Dict[str, int] = {"phys": 0, "magic": 1, "ranged": 2}
+
+# Part de la valeur de défense renvoyée en contrecoup, par type d'attaque
+CONTRECOUP_RATIOS: Dict[str, float] = {"phys": 1.0, "magic": 0.7, "ranged": 0.5}
+
 
 def _attack_stat(attacker: RuntimeEntity, attack_type: AttackType) -> float:
     """Stat qui sert à calculer les dégâts (pas la précision)."""
@@ -15,6 +24,125 @@ def _attack_stat(attacker: RuntimeEntity, attack_type: AttackType) -> float:
     raise ValueError(f"Unknown attack_type: {attack_type}")
 
 
+def best_attack_type(STR: float, INT: float, DEX: float) -> AttackType:
+    """
+    Type d'attaque qui exploite la meilleure stat offensive (INT, puis DEX,
+    STR à égalité) : choix des mobs, partagé par le bot et `app.balance`.
+    """
+    if INT > STR:
+        return "magic"
+    if DEX > STR:
+        return "ranged"
+    return "phys"
+
+
+_ATTACK_DESC = {
+    "phys": "frappe",
+    "magic": "lance un sort sur",
+    "ranged": "tire sur",
+}
+
+
+class AttackOutcome:
+    """
+    Résultat de `resolve_attack` : uniquement des nombres (jets, toucher,
+    dégâts, contrecoup) et les PV/MP des deux entités juste après l'échange.
+
+    Le texte du journal (`effects`, `text()`) n'est construit qu'à la
+    première lecture, c'est-à-dire quand un message est réellement envoyé,
+    puis gardé en cache.
+    """
+
+    __slots__ = (
+        "attacker", "defender", "attack_type", "perce_armure",
+        "roll_a", "roll_b", "hit_a", "hit_b", "atk_stat", "vit_term",
+        "hit", "damage", "defense_value", "contrecoup",
+        "attacker_hp", "attacker_hp_max", "attacker_mp", "attacker_mp_max",
+        "defender_hp", "defender_hp_max", "skill_desc", "_effects",
+    )
+
+    def __init__(self, attacker: str, defender: str, attack_type: AttackType, perce_armure: bool,
+                 roll_a: float, roll_b: float, hit_a: float, hit_b: float, atk_stat: float, vit_term: float,
+                 hit: bool, damage: float, defense_value: float, contrecoup: float,
+                 attacker_hp: float, attacker_hp_max: float, attacker_mp: float, attacker_mp_max: float,
+                 defender_hp: float, defender_hp_max: float):
+        self.attacker = attacker
+        self.defender = defender
+        self.attack_type = attack_type
+        self.perce_armure = perce_armure
+        self.roll_a = roll_a
+        self.roll_b = roll_b
+        self.hit_a = hit_a
+        self.hit_b = hit_b
+        self.atk_stat = atk_stat
+        self.vit_term = vit_term
+        self.hit = hit
+        self.damage = damage                # dégâts infligés (0 si raté)
+        self.defense_value = defense_value  # valeur de défense (0 si touché)
+        self.contrecoup = contrecoup        # dégâts renvoyés à l'attaquant (0 si touché)
+        self.attacker_hp = attacker_hp
+        self.attacker_hp_max = attacker_hp_max
+        self.attacker_mp = attacker_mp
+        self.attacker_mp_max = attacker_mp_max
+        self.defender_hp = defender_hp
+        self.defender_hp_max = defender_hp_max
+        self.skill_desc: Optional[str] = None
+        self._effects: Optional[List[str]] = None
+
+    @property
+    def vit_scale_div(self) -> float:
+        return 100.0 if self.perce_armure else 10.0
+
+    def apply_skill(self, skill_desc: str, extra_damage: float, defender_hp: float) -> None:
+        """Bonus de dégâts d'une compétence (appliqué par l'appelant aux PV du défenseur)."""
+        self.damage += extra_damage
+        self.defender_hp = defender_hp
+        self.skill_desc = skill_desc
+        self._effects = None
+
+    @property
+    def effects(self) -> List[str]:
+        """Lignes du journal, construites à la première lecture."""
+        if self._effects is None:
+            self._effects = self._render()
+        return self._effects
+
+    def text(self, empty: str = "—") -> str:
+        return "\n".join(self.effects) or empty
+
+    def _render(self) -> List[str]:
+        a, d, t = self.attacker, self.defender, self.attack_type
+        if self.hit:
+            if self.skill_desc:
+                lines = [f"✨ **{a}** {self.skill_desc} **{d}** et inflige **{self.damage:.2f}** dégâts !"]
+            else:
+                lines = [f"{a} {_ATTACK_DESC.get(t, 'attaque')} {d} et inflige {self.damage:.2f} dégâts."]
+            lines.append(f"PV {d}: {self.defender_hp:.2f}/{self.defender_hp_max:.2f}")
+            # Optionnel : On peut ajouter le mana restant de l'attaquant dans les logs
+            if t != "phys":
+                lines.append(f"MP {a}: {self.attacker_mp:.0f}/{self.attacker_mp_max:.0f}")
+            return lines
+
+        if self.defense_value > 0:
+            if t == "phys":
+                line = f"{d} contre l'attaque. {a} prend {self.contrecoup:.2f} dégâts de contrecoup."
+            elif t == "magic":
+                line = f"{d} résiste au sort. {a} subit {self.contrecoup:.2f} dégâts de réflexion magique."
+            else:
+                line = f"{d} esquive et riposte. {a} prend {self.contrecoup:.2f} dégâts."
+            return [line, f"PV {a}: {self.attacker_hp:.2f}/{self.attacker_hp_max:.2f}"]
+
+        if t == "phys":
+            return [f"{d} bloque l'attaque de {a}. Aucun dégât en retour."]
+        if t == "magic":
+            return [f"{d} dissipe le sort de {a}. Aucun dégât en retour."]
+        return [f"{d} évite le tir de {a}. Aucun dégât en retour."]
+
+    def __repr__(self) -> str:
+        return (f"AttackOutcome({self.attacker!r} -> {self.defender!r}, {self.attack_type}, hit={self.hit}, "
+                f"damage={self.damage:.2f}, contrecoup={self.contrecoup:.2f})")
+
+
 def resolve_attack(
     attacker: RuntimeEntity,
     defender: RuntimeEntity,
@@ -22,7 +150,7 @@ def resolve_attack(
     roll_b: float,
     attack_type: AttackType = "phys",
     perce_armure: bool = False,
-) -> Dict[str, Any]:
+) -> AttackOutcome:
     """
     Toucher:
       A = d20 + AGI(attacker)/10
@@ -32,6 +160,9 @@ def resolve_attack(
     Réduction VIT:
       vit_term = VIT/10
       si perce_armure: vit_term = VIT/100
+
+    Applique les dégâts (ou le contrecoup) aux PV et retourne un
+    `AttackOutcome` ; le texte n'est construit que s'il est lu.
     """
 
     hit_a = float(roll_a) + float(attacker.AGI) / 10.0
@@ -40,32 +171,12 @@ def resolve_attack(
     vit_div = 100.0 if perce_armure else 10.0
     vit_term = float(defender.VIT) / vit_div
 
-    out: Dict[str, Any] = {
-        "hit": False,
-        "roll_a": float(roll_a),
-        "roll_b": float(roll_b),
-        "hit_a": hit_a,
-        "hit_b": hit_b,
-        "attack_type": attack_type,
-        "perce_armure": bool(perce_armure),
-        "vit_scale_div": vit_div,
-        "raw": {},
-        "effects": [],
-    }
-
     atk = _attack_stat(attacker, attack_type)
-    out["atk_stat"] = atk
-    out["vit_term"] = vit_term
-
-    attack_desc = {
-        "phys": "frappe",
-        "magic": "lance un sort sur",
-        "ranged": "tire sur",
-    }.get(attack_type, "attaque")
 
-    if hit_a > hit_b:
-        out["hit"] = True
+    hit = hit_a > hit_b
+    dmg = defense_power = contrecoup = 0.0
 
+    if hit:
         dmg = (hit_a - hit_b) + atk
 
         if attack_type == "magic":
@@ -77,48 +188,93 @@ def resolve_attack(
         dmg = max(0.0, float(dmg))
 
         defender.hp = max(0.0, float(defender.hp) - dmg)
+    else:
+        defense_power = float((hit_b - hit_a) + vit_term - atk)
+        if defense_power > 0:
+            contrecoup = defense_power * CONTRECOUP_RATIOS[attack_type]
+            attacker.hp = max(0.0, float(attacker.hp) - contrecoup)
+
+    return AttackOutcome(
+        attacker.name, defender.name, attack_type, bool(perce_armure),
+        float(roll_a), float(roll_b), hit_a, hit_b, atk, vit_term,
+        hit, dmg, defense_power, contrecoup,
+        attacker.hp, attacker.hp_max, attacker.mp, attacker.mp_max,
+        defender.hp, defender.hp_max,
+    )
 
-        out["raw"]["damage"] = dmg
-        out["effects"].append(f"{attacker.name} {attack_desc} {defender.name} et inflige {dmg:.2f} dégâts.")
-        out["effects"].append(f"PV {defender.name}: {defender.hp:.2f}/{defender.hp_max:.2f}")
-        
-        # Optionnel : On peut ajouter le mana restant de l'attaquant dans les logs
-        if attack_type != "phys":
-            out["effects"].append(f"MP {attacker.name}: {attacker.mp:.0f}/{attacker.mp_max:.0f}")
-        
-        return out
 
-    defense_power = (hit_b - hit_a) + vit_term - atk
-    out["raw"]["defense_value"] = float(defense_power)
-
-    if defense_power > 0:
-        if attack_type == "phys":
-            contrecoup = defense_power * 1.0
-            out["effects"].append(
-                f"{defender.name} contre l'attaque. {attacker.name} prend {contrecoup:.2f} dégâts de contrecoup."
-            )
-        elif attack_type == "magic":
-            contrecoup = defense_power * 0.7
-            out["effects"].append(
-                f"{defender.name} résiste au sort. {attacker.name} subit {contrecoup:.2f} dégâts de réflexion magique."
-            )
-        else:
-            contrecoup = defense_power * 0.5
-            out["effects"].append(
-                f"{defender.name} esquive et riposte. {attacker.name} prend {contrecoup:.2f} dégâts."
-            )
-
-        attacker.hp = max(0.0, float(attacker.hp) - contrecoup)
-        out["effects"].append(f"PV {attacker.name}: {attacker.hp:.2f}/{attacker.hp_max:.2f}")
+def _numpy():
+    # Import paresseux : numpy ne sert qu'aux calculs en masse, pas au bot
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("numpy est requis pour resolve_attacks_batch (pip install -r requirements.txt)") from e
+    return numpy
+
+
+def resolve_attacks_batch(
+    attacker: Mapping[str, Any],
+    defender: Mapping[str, Any],
+    roll_a: Any,
+    roll_b: Any,
+    attack_type: Union[AttackType, Any] = "phys",
+    perce_armure: Any = False,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Version vectorisée de `resolve_attack` pour l'analyse en masse
+    (équilibrage, simulations) : mêmes formules, sans muter d'entité ni
+    construire de texte.
+
+    `attacker` donne des tableaux (ou scalaires) "STR", "INT", "DEX", "AGI" ;
+    `defender` donne "AGI" et "VIT". `attack_type` est un type unique ou un
+    tableau de codes `ATTACK_TYPE_CODES` ; tous les arguments sont diffusés
+    (broadcast) les uns contre les autres.
+
+    Retourne des tableaux : "hit" (bool), "damage" (dégâts infligés au
+    défenseur) et "contrecoup" (dégâts renvoyés à l'attaquant), en float64.
+    """
+    np = _numpy()
+
+    roll_a = np.asarray(roll_a, dtype=np.float64)
+    roll_b = np.asarray(roll_b, dtype=np.float64)
+    if isinstance(attack_type, str):
+        if attack_type not in ATTACK_TYPE_CODES:
+            raise ValueError(f"Unknown attack_type: {attack_type}")
+        kind = np.asarray(ATTACK_TYPE_CODES[attack_type], dtype=np.int8)
     else:
-        if attack_type == "phys":
-            out["effects"].append(f"{defender.name} bloque l'attaque de {attacker.name}. Aucun dégât en retour.")
-        elif attack_type == "magic":
-            out["effects"].append(f"{defender.name} dissipe le sort de {attacker.name}. Aucun dégât en retour.")
-        else:
-            out["effects"].append(f"{defender.name} évite le tir de {attacker.name}. Aucun dégât en retour.")
-
-    return out
+        kind = np.asarray(attack_type, dtype=np.int8)
+    magic = kind == ATTACK_TYPE_CODES["magic"]
+    ranged = kind == ATTACK_TYPE_CODES["ranged"]
+
+    hit_a = roll_a + np.asarray(attacker["AGI"], dtype=np.float64) / 10.0
+    hit_b = roll_b + np.asarray(defender["AGI"], dtype=np.float64) / 10.0
+
+    vit_div = np.where(np.asarray(perce_armure, dtype=bool), 100.0, 10.0)
+    vit_term = np.asarray(defender["VIT"], dtype=np.float64) / vit_div
+
+    atk = np.where(
+        magic, np.asarray(attacker["INT"], dtype=np.float64),
+        np.where(ranged, np.asarray(attacker["DEX"], dtype=np.float64), np.asarray(attacker["STR"], dtype=np.float64)),
+    )
+
+    hit = hit_a > hit_b
+
+    dmg = (hit_a - hit_b) + atk
+    dmg = np.where(magic, dmg * np.where(roll_a > 15, 1.2, 0.9), dmg)
+    dmg = np.where(ranged, dmg * 0.95, dmg)
+    dmg = np.maximum(0.0, dmg - vit_term)
+
+    defense_power = (hit_b - hit_a) + vit_term - atk
+    ratio = np.where(magic, CONTRECOUP_RATIOS["magic"],
+                     np.where(ranged, CONTRECOUP_RATIOS["ranged"], CONTRECOUP_RATIOS["phys"]))
+    contrecoup = np.where(defense_power > 0, defense_power * ratio, 0.0)
+
+    shape = np.broadcast_shapes(hit.shape, dmg.shape, contrecoup.shape)
+    return {
+        "hit": np.broadcast_to(hit, shape),
+        "damage": np.broadcast_to(np.where(hit, dmg, 0.0), shape),
+        "contrecoup": np.broadcast_to(np.where(hit, 0.0, contrecoup), shape),
+    }
 
 
 def calculate_xp_gain(
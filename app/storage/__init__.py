@@ -0,0 +1,4 @@
+from .base import Row, Storage
+from .records import CharacterRecord, CharacterSheet, CombatRecord, InventoryRecord, MobRecord, Record
+from .sqlite import SqliteStorage
+from .memory import MemoryDatabase, MemoryStorage
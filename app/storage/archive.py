@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from .base import Row
+
+# Une ligne de journal archivée : [created_at, kind, message]
+LOG_FIELDS = ("created_at", "kind", "message")
+
+# Un événement archivé : [id, kind, payload décodé, created_at]
+EVENT_FIELDS = ("id", "kind", "payload", "created_at")
+
+# Ce qu'on garde d'un mob encore présent à la fermeture
+MOB_SUMMARY_FIELDS = ("mob_name", "mob_key", "level", "hp", "hp_max")
+
+
+def pack_logs(rows: Iterable[Row]) -> bytes:
+    """Compresse les lignes de `combat_logs` d'un combat en un seul blob (JSON + zlib)."""
+    payload = [[row[field] for field in LOG_FIELDS] for row in rows]
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(data.encode("utf-8"), 9)
+
+
+def pack_events(rows: Iterable[Row]) -> bytes:
+    """Compresse le flux `combat_events` d'un combat (JSON + zlib, payloads dépliés)."""
+    payload = [
+        [row["id"], row["kind"], json.loads(row["payload"]), row["created_at"]]
+        for row in rows
+    ]
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(data.encode("utf-8"), 9)
+
+
+def unpack_events(blob: Optional[bytes]) -> List[Dict[str, Any]]:
+    """Inverse de `pack_events` : liste de dicts id / kind / payload / created_at."""
+    if not blob:
+        return []
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return [dict(zip(EVENT_FIELDS, entry)) for entry in payload]
+
+
+def mob_summary(mob) -> Dict[str, Any]:
+    """Résumé JSON d'un `MobRecord` pour `combat_archive.mobs`."""
+    return {field: getattr(mob, field) for field in MOB_SUMMARY_FIELDS}
+
+
+def unpack_logs(blob: Optional[bytes]) -> List[Dict[str, Any]]:
+    """Inverse de `pack_logs` : liste de dicts created_at / kind / message."""
+    if not blob:
+        return []
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return [dict(zip(LOG_FIELDS, entry)) for entry in payload]
+
+
+def archived_combat(row: Row) -> Dict[str, Any]:
+    """Ligne de `combat_archive` décodée (participants, mobs et journal dépliés)."""
+    result = {k: row[k] for k in (
+        "combat_id", "channel_id", "thread_id", "created_by",
+        "created_at", "closed_at", "archived_at", "log_count",
+    )}
+    result["participants"] = json.loads(row["participants"] or "[]")
+    result["mobs"] = json.loads(row["mobs"] or "[]")
+    result["logs"] = unpack_logs(row["logs"])
+    result["events"] = unpack_events(row["events"])
+    return result
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .records import CharacterRecord, CharacterSheet, CombatRecord, InventoryRecord, MobRecord
+
+# Les tables chaudes (characters, combat_mobs, inventories, combats) sont
+# renvoyées en records typés (`records.py`) : row.hp, row.mob_name...
+# Les autres lignes restent des mappings indexés par nom de colonne
+# (aiosqlite.Row côté SQLite, dict côté mémoire) : row["user_id"].
+Row = Mapping[str, Any]
+
+
+class Storage(ABC):
+    """
+    Interface de persistance utilisée par les helpers de domaine
+    (character, combat_session, combat_mobs, cogs.combat).
+
+    Les helpers ne manipulent jamais de SQL : ils passent par `db.storage`,
+    ce qui permet de brancher `MemoryStorage` (tests, benchmarks) à la place
+    de `SqliteStorage` sans toucher à la logique de jeu.
+    Chaque écriture est commitée par l'implémentation, sauf à l'intérieur de
+    `db.transaction()`.
+    """
+
+    # --- Personnages ---
+
+    @abstractmethod
+    async def get_character(self, user_id: int) -> Optional[CharacterRecord]:
+        """Ligne `characters` du joueur, ou None."""
+
+    @abstractmethod
+    async def load_character(self, user_id: int) -> Optional[CharacterSheet]:
+        """Personnage, compétences et objets équipés en un seul aller-retour, ou None."""
+
+    @abstractmethod
+    async def load_combat_characters(self, combat_id: int) -> List[CharacterSheet]:
+        """Comme `load_character`, pour tous les participants du combat en une requête."""
+
+    @abstractmethod
+    async def save_character(self, values: Dict[str, Any]) -> None:
+        """Crée ou met à jour toute la ligne `characters` (clés = noms de colonnes)."""
+
+    @abstractmethod
+    async def update_character(self, user_id: int, changes: Dict[str, Any]) -> bool:
+        """
+        Met à jour uniquement les colonnes de `changes` ; False si le
+        personnage n'existe pas. Lève ValueError sur une colonne inconnue.
+        """
+
+    @abstractmethod
+    async def update_character_hp(self, user_id: int, hp: float) -> None:
+        """Met à jour les PV."""
+
+    @abstractmethod
+    async def update_character_mp(self, user_id: int, mp: float) -> None:
+        """Met à jour les PM."""
+
+    # --- Inventaires ---
+
+    @abstractmethod
+    async def list_inventory(self, user_id: int) -> List[InventoryRecord]:
+        """Toutes les lignes d'inventaire du joueur, dans l'ordre d'acquisition."""
+
+    @abstractmethod
+    async def add_inventory_item(self, user_id: int, item_id: str, quantity: int, properties_json: str) -> None:
+        """Ajoute `quantity` exemplaires (empile sur la ligne existante s'il y en a une)."""
+
+    @abstractmethod
+    async def remove_inventory_item(self, user_id: int, item_id: str, quantity: int) -> bool:
+        """Retire `quantity` exemplaires ; False si l'objet n'est pas possédé."""
+
+    @abstractmethod
+    async def set_item_equipped(self, user_id: int, item_id: str, equipped: bool) -> bool:
+        """(Dés)équipe un objet possédé ; False si rien à changer."""
+
+    # --- Combats ---
+
+    @abstractmethod
+    async def create_combat(self, channel_id: int, created_by: int) -> int:
+        """Crée un combat actif sans fil et retourne son id."""
+
+    @abstractmethod
+    async def get_active_combat(self, thread_id: int) -> Optional[CombatRecord]:
+        """Combat actif du fil, ou None."""
+
+    @abstractmethod
+    async def find_unthreaded_combat(self, channel_id: int) -> Optional[CombatRecord]:
+        """Premier combat actif du salon qui n'a pas encore de fil."""
+
+    @abstractmethod
+    async def list_active_thread_ids(self, channel_id: int) -> List[int]:
+        """thread_id de tous les combats actifs du salon."""
+
+    @abstractmethod
+    async def list_active_combats(self) -> List[CombatRecord]:
+        """Tous les combats actifs rattachés à un fil (chargement du registre)."""
+
+    @abstractmethod
+    async def set_combat_thread(self, combat_id: int, thread_id: int) -> None:
+        """Rattache un combat actif à son fil."""
+
+    @abstractmethod
+    async def close_combat(self, combat_id: int) -> None:
+        """Passe le combat en statut `closed`."""
+
+    @abstractmethod
+    async def list_combats(self, channel_id: int) -> List[CombatRecord]:
+        """Tous les combats (actifs ou non) du salon."""
+
+    @abstractmethod
+    async def close_channel_combats(self, channel_id: int) -> None:
+        """Ferme tous les combats actifs du salon."""
+
+    # --- Participants ---
+
+    @abstractmethod
+    async def add_participant(self, combat_id: int, channel_id: int, user_id: int, added_by: int) -> None:
+        """Inscrit un joueur au combat (sans effet s'il y est déjà)."""
+
+    @abstractmethod
+    async def list_participants(self, combat_id: int) -> List[int]:
+        """user_id des participants du combat."""
+
+    @abstractmethod
+    async def list_active_participants(self) -> List[Tuple[int, int]]:
+        """Couples (combat_id, user_id) de tous les combats actifs."""
+
+    # --- Mobs ---
+
+    @abstractmethod
+    async def list_mob_names_like(self, channel_id: int, prefix: str) -> List[str]:
+        """Noms des mobs du salon qui commencent par `prefix`."""
+
+    @abstractmethod
+    async def insert_mob(self, values: Dict[str, Any]) -> None:
+        """Ajoute un mob (clés = colonnes de `combat_mobs`)."""
+
+    @abstractmethod
+    async def get_mob(self, channel_id: int, mob_name: str) -> Optional[MobRecord]:
+        """Mob du salon, ou None."""
+
+    @abstractmethod
+    async def list_mobs(self, channel_id: int) -> List[MobRecord]:
+        """Mobs du salon triés par nom."""
+
+    @abstractmethod
+    async def update_mob_hp(self, channel_id: int, mob_name: str, hp: float) -> None:
+        """Met à jour les PV d'un mob."""
+
+    @abstractmethod
+    async def delete_dead_mobs(self, channel_id: int) -> int:
+        """Supprime les mobs à 0 PV ; retourne le nombre supprimé."""
+
+    # --- Journal ---
+
+    @abstractmethod
+    async def add_combat_logs(self, rows: List[Tuple[int, int, str, str]]) -> None:
+        """Ajoute des lignes (combat_id, channel_id, kind, message) au journal des combats, dans l'ordre."""
+
+    # --- État des tours ---
+
+    @abstractmethod
+    async def get_combat_state(self, combat_id: int) -> Optional[Row]:
+        """Ligne `combat_state` du combat (turn_index, round, actor, aggro, pacing), ou None."""
+
+    @abstractmethod
+    async def save_combat_state(self, combat_id: int, turn_index: int, round: int,
+                                actor: Optional[str], aggro: str, pacing: Optional[str] = None) -> None:
+        """Crée ou remplace l'état des tours du combat (`aggro` en JSON)."""
+
+    # --- Événements ---
+
+    @abstractmethod
+    async def append_combat_events(self, combat_id: int, events: List[Tuple[str, str]]) -> List[int]:
+        """Ajoute des événements (kind, payload JSON) au flux du combat ; retourne leurs id."""
+
+    @abstractmethod
+    async def list_combat_events(self, combat_id: int, after_id: int = 0) -> List[Row]:
+        """Événements du combat d'id > after_id, dans l'ordre (id, kind, payload, created_at)."""
+
+    @abstractmethod
+    async def get_combat_snapshot(self, combat_id: int) -> Optional[Row]:
+        """Dernier snapshot du combat (last_event_id, state JSON), ou None."""
+
+    @abstractmethod
+    async def save_combat_snapshot(self, combat_id: int, last_event_id: int, state: str) -> None:
+        """Remplace le snapshot du combat."""
+
+    # --- Archive ---
+
+    @abstractmethod
+    async def archive_combat(self, combat_id: int) -> bool:
+        """
+        Déplace un combat fermé vers `combat_archive` : participants, mobs du fil
+        et journal (compressé) quittent les tables chaudes. False si le combat
+        n'existe pas ou est encore actif.
+        """
+
+    @abstractmethod
+    async def list_closed_combat_ids(self, limit: int) -> List[int]:
+        """Combats fermés restés dans les tables chaudes (à archiver)."""
+
+    @abstractmethod
+    async def get_archived_combat(self, combat_id: int) -> Optional[Dict[str, Any]]:
+        """Combat archivé décodé (voir `archive.archived_combat`), ou None."""
+
+    @abstractmethod
+    async def get_last_archived_combat(self, thread_id: int) -> Optional[Dict[str, Any]]:
+        """Dernier combat archivé du fil, décodé, ou None."""
+
+    @abstractmethod
+    async def list_archived_combats(self, channel_id: int, limit: int) -> List[Row]:
+        """Combats archivés du salon, du plus récent au plus ancien (sans le journal)."""
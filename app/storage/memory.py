@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from .archive import archived_combat, mob_summary, pack_events, pack_logs
+from .base import Row, Storage
+from .records import CharacterRecord, CharacterSheet, CombatRecord, InventoryRecord, MobRecord
+
+
+def _now() -> str:
+    """Même format que CURRENT_TIMESTAMP côté SQLite."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class MemoryStorage(Storage):
+    """
+    Implémentation en mémoire (dicts + index), sans I/O.
+
+    Pour les tests et les benchmarks : permet de mesurer le coût CPU d'un
+    échange de combat sans SQLite. Les tables chaudes sont stockées sous
+    forme de records ; ceux renvoyés sont des copies, comme des lignes lues
+    en base.
+    """
+
+    def __init__(self):
+        self.characters: Dict[int, CharacterRecord] = {}
+        self.skills: Dict[int, Set[str]] = {}
+
+        self.inventories: Dict[int, InventoryRecord] = {}
+        self._inventory_by_owner: Dict[int, Dict[str, int]] = {}  # user_id -> item_id -> id
+
+        self.combats: Dict[int, CombatRecord] = {}
+        self._active_by_thread: Dict[int, int] = {}
+        self._combats_by_channel: Dict[int, List[int]] = {}
+
+        self.participants: Dict[int, Dict[int, Dict[str, Any]]] = {}  # combat_id -> user_id -> ligne
+        self.mobs: Dict[int, Dict[str, MobRecord]] = {}  # channel_id -> mob_name -> mob
+        self.logs: List[Dict[str, Any]] = []
+        self.states: Dict[int, Dict[str, Any]] = {}  # combat_id -> ligne de combat_state
+        self.events: Dict[int, List[Dict[str, Any]]] = {}  # combat_id -> flux d'événements
+        self.snapshots: Dict[int, Dict[str, Any]] = {}  # combat_id -> ligne de combat_snapshots
+        self.archive: Dict[int, Dict[str, Any]] = {}  # combat_id -> ligne de combat_archive
+
+        self._ids: Dict[str, int] = {}
+
+    def _next_id(self, table: str) -> int:
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    # --- Personnages ---
+
+    async def get_character(self, user_id: int) -> Optional[CharacterRecord]:
+        row = self.characters.get(int(user_id))
+        return row.copy() if row else None
+
+    async def load_character(self, user_id: int) -> Optional[CharacterSheet]:
+        row = self.characters.get(int(user_id))
+        if not row:
+            return None
+        equipped = [item for item in await self.list_inventory(user_id) if item.equipped]
+        return CharacterSheet(row.copy(), frozenset(self.skills.get(int(user_id), ())), equipped)
+
+    async def load_combat_characters(self, combat_id: int) -> List[CharacterSheet]:
+        sheets = []
+        for user_id in self.participants.get(int(combat_id), {}):
+            sheet = await self.load_character(user_id)
+            if sheet is not None:
+                sheets.append(sheet)
+        return sheets
+
+    async def save_character(self, values: Dict[str, Any]) -> None:
+        self.characters[int(values["user_id"])] = CharacterRecord(**values)
+
+    async def update_character(self, user_id: int, changes: Dict[str, Any]) -> bool:
+        unknown = set(changes) - (set(CharacterRecord.COLUMNS) - {"user_id"})
+        if unknown:
+            raise ValueError(f"Colonnes inconnues pour characters: {sorted(unknown)}")
+        row = self.characters.get(int(user_id))
+        if not row:
+            return False
+        for column, value in changes.items():
+            setattr(row, column, value)
+        return True
+
+    async def update_character_hp(self, user_id: int, hp: float) -> None:
+        row = self.characters.get(int(user_id))
+        if row:
+            row.hp = float(hp)
+
+    async def update_character_mp(self, user_id: int, mp: float) -> None:
+        row = self.characters.get(int(user_id))
+        if row:
+            row.mp = float(mp)
+
+    # --- Inventaires ---
+
+    async def list_inventory(self, user_id: int) -> List[InventoryRecord]:
+        ids = sorted(self._inventory_by_owner.get(int(user_id), {}).values())
+        return [self.inventories[i].copy() for i in ids]
+
+    async def add_inventory_item(self, user_id: int, item_id: str, quantity: int, properties_json: str) -> None:
+        owned = self._inventory_by_owner.setdefault(int(user_id), {})
+        inv_id = owned.get(str(item_id))
+        if inv_id is not None:
+            self.inventories[inv_id].quantity += int(quantity)
+            return
+
+        inv_id = self._next_id("inventories")
+        self.inventories[inv_id] = InventoryRecord(inv_id, int(user_id), str(item_id), int(quantity), 0, properties_json)
+        owned[str(item_id)] = inv_id
+
+    async def remove_inventory_item(self, user_id: int, item_id: str, quantity: int) -> bool:
+        owned = self._inventory_by_owner.get(int(user_id), {})
+        inv_id = owned.get(str(item_id))
+        if inv_id is None:
+            return False
+
+        row = self.inventories[inv_id]
+        if row.quantity <= int(quantity):
+            del self.inventories[inv_id]
+            del owned[str(item_id)]
+        else:
+            row.quantity -= int(quantity)
+        return True
+
+    async def set_item_equipped(self, user_id: int, item_id: str, equipped: bool) -> bool:
+        inv_id = self._inventory_by_owner.get(int(user_id), {}).get(str(item_id))
+        if inv_id is None:
+            return False
+        row = self.inventories[inv_id]
+        if equipped and row.quantity <= 0:
+            return False
+        if not equipped and not row.equipped:
+            return False
+        row.equipped = 1 if equipped else 0
+        return True
+
+    # --- Combats ---
+
+    async def create_combat(self, channel_id: int, created_by: int) -> int:
+        combat_id = self._next_id("combats")
+        self.combats[combat_id] = CombatRecord(combat_id, int(channel_id), None, "active", int(created_by), _now())
+        self._combats_by_channel.setdefault(int(channel_id), []).append(combat_id)
+        return combat_id
+
+    async def get_active_combat(self, thread_id: int) -> Optional[CombatRecord]:
+        combat_id = self._active_by_thread.get(int(thread_id))
+        if combat_id is None:
+            return None
+        return self.combats[combat_id].copy()
+
+    def _active_in_channel(self, channel_id: int) -> List[CombatRecord]:
+        rows = (self.combats[i] for i in self._combats_by_channel.get(int(channel_id), ()))
+        return [row for row in rows if row.status == "active"]
+
+    async def find_unthreaded_combat(self, channel_id: int) -> Optional[CombatRecord]:
+        for row in self._active_in_channel(channel_id):
+            if row.thread_id is None:
+                return row.copy()
+        return None
+
+    async def list_active_thread_ids(self, channel_id: int) -> List[int]:
+        return [int(row.thread_id) for row in self._active_in_channel(channel_id) if row.thread_id]
+
+    async def list_active_combats(self) -> List[CombatRecord]:
+        return [self.combats[i].copy() for i in self._active_by_thread.values()]
+
+    async def set_combat_thread(self, combat_id: int, thread_id: int) -> None:
+        row = self.combats.get(int(combat_id))
+        if row and row.status == "active":
+            row.thread_id = int(thread_id)
+            self._active_by_thread[int(thread_id)] = row.id
+
+    async def close_combat(self, combat_id: int) -> None:
+        row = self.combats.get(int(combat_id))
+        if not row:
+            return
+        row.status = "closed"
+        row.closed_at = _now()
+        if row.thread_id is not None and self._active_by_thread.get(row.thread_id) == row.id:
+            del self._active_by_thread[row.thread_id]
+
+    async def list_combats(self, channel_id: int) -> List[CombatRecord]:
+        return [self.combats[i].copy() for i in self._combats_by_channel.get(int(channel_id), ())]
+
+    async def close_channel_combats(self, channel_id: int) -> None:
+        for row in self._active_in_channel(channel_id):
+            await self.close_combat(row.id)
+
+    # --- Participants ---
+
+    async def add_participant(self, combat_id: int, channel_id: int, user_id: int, added_by: int) -> None:
+        members = self.participants.setdefault(int(combat_id), {})
+        if int(user_id) in members:
+            return
+        members[int(user_id)] = {
+            "channel_id": int(channel_id),
+            "user_id": int(user_id),
+            "added_by": int(added_by),
+            "added_at": _now(),
+            "combat_id": int(combat_id),
+        }
+
+    async def list_participants(self, combat_id: int) -> List[int]:
+        return list(self.participants.get(int(combat_id), {}))
+
+    async def list_active_participants(self) -> List[Tuple[int, int]]:
+        return [
+            (combat_id, user_id)
+            for combat_id, members in self.participants.items()
+            if self.combats.get(combat_id) is not None and self.combats[combat_id].status == "active"
+            for user_id in members
+        ]
+
+    # --- Mobs ---
+
+    async def list_mob_names_like(self, channel_id: int, prefix: str) -> List[str]:
+        prefix = prefix.lower()
+        return [name for name in self.mobs.get(int(channel_id), {}) if name.lower().startswith(prefix)]
+
+    async def insert_mob(self, values: Dict[str, Any]) -> None:
+        channel = self.mobs.setdefault(int(values["channel_id"]), {})
+        if values["mob_name"] in channel:
+            raise ValueError("UNIQUE constraint failed: combat_mobs.channel_id, combat_mobs.mob_name")
+        channel[values["mob_name"]] = MobRecord(id=self._next_id("combat_mobs"), created_at=_now(), **values)
+
+    async def get_mob(self, channel_id: int, mob_name: str) -> Optional[MobRecord]:
+        row = self.mobs.get(int(channel_id), {}).get(str(mob_name))
+        return row.copy() if row else None
+
+    async def list_mobs(self, channel_id: int) -> List[MobRecord]:
+        channel = self.mobs.get(int(channel_id), {})
+        return [channel[name].copy() for name in sorted(channel)]
+
+    async def update_mob_hp(self, channel_id: int, mob_name: str, hp: float) -> None:
+        row = self.mobs.get(int(channel_id), {}).get(str(mob_name))
+        if row:
+            row.hp = float(hp)
+
+    async def delete_dead_mobs(self, channel_id: int) -> int:
+        channel = self.mobs.get(int(channel_id), {})
+        dead = [name for name, row in channel.items() if row.hp <= 0]
+        for name in dead:
+            del channel[name]
+        return len(dead)
+
+    # --- Journal ---
+
+    async def add_combat_logs(self, rows: List[Tuple[int, int, str, str]]) -> None:
+        for combat_id, channel_id, kind, message in rows:
+            self.logs.append({
+                "id": self._next_id("combat_logs"),
+                "channel_id": int(channel_id),
+                "kind": str(kind),
+                "message": str(message),
+                "created_at": _now(),
+                "combat_id": int(combat_id),
+            })
+
+    # --- État des tours ---
+
+    async def get_combat_state(self, combat_id: int) -> Optional[Row]:
+        row = self.states.get(int(combat_id))
+        return dict(row) if row else None
+
+    async def save_combat_state(self, combat_id: int, turn_index: int, round: int,
+                                actor: Optional[str], aggro: str, pacing: Optional[str] = None) -> None:
+        self.states[int(combat_id)] = {
+            "combat_id": int(combat_id),
+            "turn_index": int(turn_index),
+            "round": int(round),
+            "actor": actor,
+            "aggro": str(aggro),
+            "pacing": pacing,
+            "updated_at": _now(),
+        }
+
+    # --- Événements ---
+
+    async def append_combat_events(self, combat_id: int, events: List[Tuple[str, str]]) -> List[int]:
+        ids = []
+        for kind, payload in events:
+            event_id = self._next_id("combat_events")
+            self.events.setdefault(int(combat_id), []).append({
+                "id": event_id,
+                "combat_id": int(combat_id),
+                "kind": str(kind),
+                "payload": str(payload),
+                "created_at": _now(),
+            })
+            ids.append(event_id)
+        return ids
+
+    async def list_combat_events(self, combat_id: int, after_id: int = 0) -> List[Row]:
+        return [dict(e) for e in self.events.get(int(combat_id), ()) if e["id"] > int(after_id)]
+
+    async def get_combat_snapshot(self, combat_id: int) -> Optional[Row]:
+        row = self.snapshots.get(int(combat_id))
+        return dict(row) if row else None
+
+    async def save_combat_snapshot(self, combat_id: int, last_event_id: int, state: str) -> None:
+        self.snapshots[int(combat_id)] = {
+            "combat_id": int(combat_id),
+            "last_event_id": int(last_event_id),
+            "state": str(state),
+            "created_at": _now(),
+        }
+
+    # --- Archive ---
+
+    async def archive_combat(self, combat_id: int) -> bool:
+        combat = self.combats.get(int(combat_id))
+        if not combat or combat.status != "closed":
+            return False
+
+        participants = await self.list_participants(combat.id)
+        logs = [log for log in self.logs if log["combat_id"] == combat.id]
+        self.logs = [log for log in self.logs if log["combat_id"] != combat.id]
+
+        thread_id = combat.thread_id
+        mobs: List[MobRecord] = []
+        if thread_id is not None and thread_id not in self._active_by_thread:
+            mobs = await self.list_mobs(thread_id)
+            self.mobs.pop(thread_id, None)
+
+        self.archive[combat.id] = {
+            "combat_id": combat.id,
+            "channel_id": combat.channel_id,
+            "thread_id": thread_id,
+            "created_by": combat.created_by,
+            "created_at": combat.created_at,
+            "closed_at": combat.closed_at,
+            "archived_at": _now(),
+            "participants": json.dumps(participants),
+            "mobs": json.dumps([mob_summary(m) for m in mobs], ensure_ascii=False),
+            "log_count": len(logs),
+            "logs": pack_logs(logs),
+            "events": pack_events(self.events.pop(combat.id, [])),
+        }
+        self.participants.pop(combat.id, None)
+        self.states.pop(combat.id, None)
+        self.snapshots.pop(combat.id, None)
+        del self.combats[combat.id]
+        self._combats_by_channel[combat.channel_id].remove(combat.id)
+        return True
+
+    async def list_closed_combat_ids(self, limit: int) -> List[int]:
+        closed = sorted(
+            (row for row in self.combats.values() if row.status == "closed"),
+            key=lambda row: row.closed_at or "",
+        )
+        return [row.id for row in closed[:int(limit)]]
+
+    async def get_archived_combat(self, combat_id: int) -> Optional[Dict[str, Any]]:
+        row = self.archive.get(int(combat_id))
+        return archived_combat(row) if row else None
+
+    async def get_last_archived_combat(self, thread_id: int) -> Optional[Dict[str, Any]]:
+        ids = [cid for cid, row in self.archive.items() if row["thread_id"] == int(thread_id)]
+        return archived_combat(self.archive[max(ids)]) if ids else None
+
+    async def list_archived_combats(self, channel_id: int, limit: int) -> List[Row]:
+        rows = [row for row in self.archive.values() if row["channel_id"] == int(channel_id)]
+        rows.sort(key=lambda row: row["combat_id"], reverse=True)
+        return [
+            {k: row[k] for k in (
+                "combat_id", "thread_id", "created_by", "created_at", "closed_at", "participants", "log_count",
+            )}
+            for row in rows[:int(limit)]
+        ]
+
+
+class MemoryDatabase:
+    """
+    Remplaçant de `Database` adossé à `MemoryStorage`, pour faire tourner
+    les helpers et la logique des cogs sans fichier SQLite.
+
+    Les transactions ne font que regrouper les appels : rien n'est annulé
+    en cas d'exception, mais les hooks de rollback sont appelés comme avec
+    `Database`. Pas de maintenance (app.maintenance) : elle travaille sur
+    le fichier SQLite lui-même.
+    """
+
+    def __init__(self, storage: Optional[MemoryStorage] = None):
+        self.storage = storage or MemoryStorage()
+        self.stats = None
+        self._tx_depth = 0
+        self._rollback_hooks: List[Callable[[], None]] = []
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._tx_depth > 0
+
+    def add_rollback_hook(self, hook: Callable[[], None]) -> None:
+        self._rollback_hooks.append(hook)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["MemoryDatabase"]:
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._tx_depth == 1:
+                for hook in self._rollback_hooks:
+                    hook()
+            raise
+        finally:
+            self._tx_depth -= 1
+
+    async def commit(self) -> None:
+        pass
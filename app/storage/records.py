@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+
+class Record:
+    """
+    Ligne typée d'une table chaude, à `__slots__` : pas de `__dict__` par
+    objet ni de mapping intermédiaire.
+
+    `row_factory` s'installe sur un curseur (`db.execute_fetchall(...,
+    row_factory=CharacterRecord.row_factory)`) et construit l'objet
+    directement depuis le tuple SQLite : la requête doit sélectionner
+    exactement `COLUMNS`, dans cet ordre.
+    """
+
+    __slots__ = ()
+    COLUMNS: Tuple[str, ...] = ()
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple) -> "Record":
+        return cls(*row)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {c: getattr(self, c) for c in self.COLUMNS}
+
+    def copy(self) -> "Record":
+        return type(self)(*(getattr(self, c) for c in self.COLUMNS))
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(other, c) for c in self.COLUMNS)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.COLUMNS)
+        return f"{type(self).__name__}({fields})"
+
+
+class CharacterRecord(Record):
+    """Ligne de `characters`."""
+
+    COLUMNS = (
+        "user_id", "name", "level", "xp", "xp_next", "hp", "hp_max", "mp", "mp_max",
+        "STR", "AGI", "INT", "DEX", "VIT", "gold", "stat_points",
+    )
+    __slots__ = COLUMNS
+
+    def __init__(self, user_id: int, name: str, level: int, xp: int, xp_next: int,
+                 hp: float, hp_max: float, mp: float, mp_max: float,
+                 STR: float, AGI: float, INT: float, DEX: float, VIT: float,
+                 gold: int = 0, stat_points: int = 0):
+        self.user_id = user_id
+        self.name = name
+        self.level = level
+        self.xp = xp
+        self.xp_next = xp_next
+        self.hp = hp
+        self.hp_max = hp_max
+        self.mp = mp
+        self.mp_max = mp_max
+        self.STR = STR
+        self.AGI = AGI
+        self.INT = INT
+        self.DEX = DEX
+        self.VIT = VIT
+        self.gold = gold
+        self.stat_points = stat_points
+
+
+class MobRecord(Record):
+    """Ligne de `combat_mobs` (stats en minuscules, comme les colonnes)."""
+
+    COLUMNS = (
+        "id", "channel_id", "mob_name", "mob_key", "level",
+        "hp", "hp_max", "mp", "mp_max", "str", "agi", "int_", "dex", "vit",
+        "created_by", "created_at",
+    )
+    __slots__ = COLUMNS
+
+    def __init__(self, id: int, channel_id: int, mob_name: str, mob_key: str, level: int,
+                 hp: float, hp_max: float, mp: float, mp_max: float,
+                 str: float, agi: float, int_: float, dex: float, vit: float,
+                 created_by: int, created_at: Optional[str] = None):
+        self.id = id
+        self.channel_id = channel_id
+        self.mob_name = mob_name
+        self.mob_key = mob_key
+        self.level = level
+        self.hp = hp
+        self.hp_max = hp_max
+        self.mp = mp
+        self.mp_max = mp_max
+        self.str = str
+        self.agi = agi
+        self.int_ = int_
+        self.dex = dex
+        self.vit = vit
+        self.created_by = created_by
+        self.created_at = created_at
+
+
+class InventoryRecord(Record):
+    """Ligne de `inventories` (`properties` reste le JSON brut)."""
+
+    COLUMNS = ("id", "character_id", "item_id", "quantity", "equipped", "properties")
+    __slots__ = COLUMNS
+
+    def __init__(self, id: int, character_id: int, item_id: str, quantity: int,
+                 equipped: int, properties: Optional[str]):
+        self.id = id
+        self.character_id = character_id
+        self.item_id = item_id
+        self.quantity = quantity
+        self.equipped = equipped
+        self.properties = properties
+
+
+class CombatRecord(Record):
+    """Ligne de `combats`."""
+
+    COLUMNS = ("id", "channel_id", "thread_id", "status", "created_by", "created_at", "closed_at")
+    __slots__ = COLUMNS
+
+    def __init__(self, id: int, channel_id: int, thread_id: Optional[int], status: str,
+                 created_by: int, created_at: Optional[str] = None, closed_at: Optional[str] = None):
+        self.id = id
+        self.channel_id = channel_id
+        self.thread_id = thread_id
+        self.status = status
+        self.created_by = created_by
+        self.created_at = created_at
+        self.closed_at = closed_at
+
+
+class CharacterSheet:
+    """
+    Personnage hydraté en une requête (`Storage.load_character`) : la ligne
+    `characters`, l'ensemble des compétences et les objets équipés.
+    """
+
+    __slots__ = ("character", "skills", "equipped")
+
+    def __init__(self, character: CharacterRecord, skills: FrozenSet[str], equipped: List[InventoryRecord]):
+        self.character = character
+        self.skills = skills
+        self.equipped = equipped
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple) -> "CharacterSheet":
+        """Colonnes de `CharacterRecord`, puis `skills` et `equipped` en tableaux JSON."""
+        n = len(CharacterRecord.COLUMNS)
+        skills = frozenset(json.loads(row[n])) if row[n] else frozenset()
+        equipped = [InventoryRecord(*entry) for entry in json.loads(row[n + 1])] if row[n + 1] else []
+        equipped.sort(key=lambda item: item.id)
+        return cls(CharacterRecord(*row[:n]), skills, equipped)
@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from .archive import archived_combat, mob_summary, pack_events, pack_logs
+from .base import Row, Storage
+from .records import CharacterRecord, CharacterSheet, CombatRecord, InventoryRecord, MobRecord
+
+_CHARACTER_COLUMNS = CharacterRecord.COLUMNS
+_UPDATABLE_CHARACTER_COLUMNS = frozenset(_CHARACTER_COLUMNS) - {"user_id"}
+
+_MOB_COLUMNS = (
+    "channel_id", "mob_name", "mob_key", "level",
+    "hp", "hp_max", "mp", "mp_max", "str", "agi", "int_", "dex", "vit",
+    "created_by",
+)
+
+
+class SqliteStorage(Storage):
+    """Implémentation SQLite : le SQL des helpers, derrière l'interface `Storage`."""
+
+    def __init__(self, db):
+        self.db = db
+
+    # --- Personnages ---
+
+    async def get_character(self, user_id: int) -> Optional[CharacterRecord]:
+        return await self.db.execute_fetchone(
+            """
+            SELECT user_id, name, level, xp, xp_next, hp, hp_max, mp, mp_max,
+                   STR, AGI, INT, DEX, VIT, gold, stat_points
+            FROM characters WHERE user_id = ?
+            """,
+            (int(user_id),),
+            row_factory=CharacterRecord.row_factory,
+        )
+
+    async def load_character(self, user_id: int) -> Optional[CharacterSheet]:
+        # Sous-requêtes corrélées agrégées en JSON : une seule requête, chacune
+        # servie par un index (PK de character_skills, idx_inventories_character_item)
+        return await self.db.execute_fetchone(
+            """
+            SELECT c.user_id, c.name, c.level, c.xp, c.xp_next, c.hp, c.hp_max, c.mp, c.mp_max,
+                   c.STR, c.AGI, c.INT, c.DEX, c.VIT, c.gold, c.stat_points,
+                   (SELECT json_group_array(s.skill_id)
+                      FROM character_skills s WHERE s.user_id = c.user_id) AS skills,
+                   (SELECT json_group_array(json_array(i.id, i.character_id, i.item_id, i.quantity, i.equipped, i.properties))
+                      FROM inventories i WHERE i.character_id = c.user_id AND i.equipped = 1) AS equipped
+            FROM characters c WHERE c.user_id = ?
+            """,
+            (int(user_id),),
+            row_factory=CharacterSheet.row_factory,
+        )
+
+    async def load_combat_characters(self, combat_id: int) -> List[CharacterSheet]:
+        # Même projection que load_character, sur la PK de combat_participants
+        return await self.db.execute_fetchall(
+            """
+            SELECT c.user_id, c.name, c.level, c.xp, c.xp_next, c.hp, c.hp_max, c.mp, c.mp_max,
+                   c.STR, c.AGI, c.INT, c.DEX, c.VIT, c.gold, c.stat_points,
+                   (SELECT json_group_array(s.skill_id)
+                      FROM character_skills s WHERE s.user_id = c.user_id) AS skills,
+                   (SELECT json_group_array(json_array(i.id, i.character_id, i.item_id, i.quantity, i.equipped, i.properties))
+                      FROM inventories i WHERE i.character_id = c.user_id AND i.equipped = 1) AS equipped
+            FROM combat_participants p
+            JOIN characters c ON c.user_id = p.user_id
+            WHERE p.combat_id = ?
+            """,
+            (int(combat_id),),
+            row_factory=CharacterSheet.row_factory,
+        )
+
+    async def save_character(self, values: Dict[str, Any]) -> None:
+        # Upsert plutôt que REPLACE : pas de DELETE + INSERT de la ligne existante
+        await self.db.execute(
+            """
+            INSERT INTO characters
+            (user_id, name, level, xp, xp_next, hp, hp_max, mp, mp_max, STR, AGI, INT, DEX, VIT, gold, stat_points)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+              name=excluded.name, level=excluded.level, xp=excluded.xp, xp_next=excluded.xp_next,
+              hp=excluded.hp, hp_max=excluded.hp_max, mp=excluded.mp, mp_max=excluded.mp_max,
+              STR=excluded.STR, AGI=excluded.AGI, INT=excluded.INT, DEX=excluded.DEX, VIT=excluded.VIT,
+              gold=excluded.gold, stat_points=excluded.stat_points
+            """,
+            tuple(values[c] for c in _CHARACTER_COLUMNS)
+        )
+        await self.db.commit()
+
+    async def update_character(self, user_id: int, changes: Dict[str, Any]) -> bool:
+        columns = [c for c in changes if c in _UPDATABLE_CHARACTER_COLUMNS]
+        if len(columns) != len(changes):
+            raise ValueError(f"Colonnes inconnues pour characters: {sorted(set(changes) - set(columns))}")
+        if not columns:
+            return True
+
+        assignments = ", ".join(f"{c} = ?" for c in columns)
+        cursor = await self.db.execute(
+            f"UPDATE characters SET {assignments} WHERE user_id = ?",
+            tuple(changes[c] for c in columns) + (int(user_id),),
+        )
+        await self.db.commit()
+        return cursor.rowcount > 0
+
+    async def update_character_hp(self, user_id: int, hp: float) -> None:
+        await self.db.execute(
+            "UPDATE characters SET hp = ? WHERE user_id = ?",
+            (float(hp), int(user_id))
+        )
+        await self.db.commit()
+
+    async def update_character_mp(self, user_id: int, mp: float) -> None:
+        await self.db.execute(
+            "UPDATE characters SET mp = ? WHERE user_id = ?",
+            (float(mp), int(user_id))
+        )
+        await self.db.commit()
+
+    # --- Inventaires ---
+
+    async def list_inventory(self, user_id: int) -> List[InventoryRecord]:
+        return await self.db.execute_fetchall(
+            "SELECT id, character_id, item_id, quantity, equipped, properties "
+            "FROM inventories WHERE character_id = ? ORDER BY id",
+            (int(user_id),),
+            row_factory=InventoryRecord.row_factory,
+        )
+
+    async def add_inventory_item(self, user_id: int, item_id: str, quantity: int, properties_json: str) -> None:
+        existing_item = await self.db.execute_fetchone(
+            "SELECT id, quantity FROM inventories WHERE character_id = ? AND item_id = ?",
+            (int(user_id), str(item_id))
+        )
+
+        if existing_item:
+            await self.db.execute(
+                "UPDATE inventories SET quantity = quantity + ? WHERE id = ?",
+                (int(quantity), int(existing_item["id"]))
+            )
+        else:
+            await self.db.execute(
+                """
+                INSERT INTO inventories (character_id, item_id, quantity, equipped, properties)
+                VALUES (?, ?, ?, 0, ?)
+                """,
+                (int(user_id), str(item_id), int(quantity), properties_json)
+            )
+        await self.db.commit()
+
+    async def remove_inventory_item(self, user_id: int, item_id: str, quantity: int) -> bool:
+        row = await self.db.execute_fetchone(
+            "SELECT id, quantity FROM inventories WHERE character_id = ? AND item_id = ?",
+            (int(user_id), str(item_id))
+        )
+        if not row:
+            return False
+
+        current_qty = int(row["quantity"])
+        inv_id = int(row["id"])
+
+        if current_qty <= int(quantity):
+            await self.db.execute("DELETE FROM inventories WHERE id = ?", (inv_id,))
+        else:
+            await self.db.execute(
+                "UPDATE inventories SET quantity = quantity - ? WHERE id = ?",
+                (int(quantity), inv_id)
+            )
+
+        await self.db.commit()
+        return True
+
+    async def set_item_equipped(self, user_id: int, item_id: str, equipped: bool) -> bool:
+        if equipped:
+            row = await self.db.execute_fetchone(
+                "SELECT id FROM inventories WHERE character_id = ? AND item_id = ? AND quantity > 0",
+                (int(user_id), str(item_id))
+            )
+        else:
+            row = await self.db.execute_fetchone(
+                "SELECT id FROM inventories WHERE character_id = ? AND item_id = ? AND equipped = 1",
+                (int(user_id), str(item_id))
+            )
+        if not row:
+            return False
+
+        await self.db.execute(
+            "UPDATE inventories SET equipped = ? WHERE id = ?",
+            (1 if equipped else 0, int(row["id"]))
+        )
+        await self.db.commit()
+        return True
+
+    # --- Combats ---
+
+    async def create_combat(self, channel_id: int, created_by: int) -> int:
+        cursor = await self.db.execute(
+            "INSERT INTO combats(channel_id, status, created_by) VALUES(?, 'active', ?)",
+            (int(channel_id), int(created_by)),
+        )
+        combat_id = cursor.lastrowid
+        await self.db.commit()
+        return combat_id
+
+    async def get_active_combat(self, thread_id: int) -> Optional[CombatRecord]:
+        return await self.db.execute_fetchone(
+            "SELECT id, channel_id, thread_id, status, created_by, created_at, closed_at "
+            "FROM combats WHERE thread_id = ? AND status = 'active' ORDER BY id DESC LIMIT 1",
+            (int(thread_id),),
+            row_factory=CombatRecord.row_factory,
+        )
+
+    async def find_unthreaded_combat(self, channel_id: int) -> Optional[CombatRecord]:
+        return await self.db.execute_fetchone(
+            "SELECT id, channel_id, thread_id, status, created_by, created_at, closed_at "
+            "FROM combats WHERE channel_id = ? AND status = 'active' AND thread_id IS NULL",
+            (int(channel_id),),
+            row_factory=CombatRecord.row_factory,
+        )
+
+    async def list_active_thread_ids(self, channel_id: int) -> List[int]:
+        rows = await self.db.execute_fetchall(
+            "SELECT thread_id FROM combats WHERE channel_id = ? AND status = 'active' AND thread_id IS NOT NULL",
+            (int(channel_id),),
+        )
+        return [int(row["thread_id"]) for row in rows if row["thread_id"]]
+
+    async def list_active_combats(self) -> List[CombatRecord]:
+        return await self.db.execute_fetchall(
+            "SELECT id, channel_id, thread_id, status, created_by, created_at, closed_at "
+            "FROM combats WHERE status = 'active' AND thread_id IS NOT NULL",
+            row_factory=CombatRecord.row_factory,
+        )
+
+    async def set_combat_thread(self, combat_id: int, thread_id: int) -> None:
+        await self.db.execute(
+            "UPDATE combats SET thread_id = ? WHERE id = ? AND status = 'active'",
+            (int(thread_id), int(combat_id)),
+        )
+        await self.db.commit()
+
+    async def close_combat(self, combat_id: int) -> None:
+        await self.db.execute(
+            "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (int(combat_id),),
+        )
+        await self.db.commit()
+
+    async def list_combats(self, channel_id: int) -> List[CombatRecord]:
+        return await self.db.execute_fetchall(
+            "SELECT id, channel_id, thread_id, status, created_by, created_at, closed_at "
+            "FROM combats WHERE channel_id = ?",
+            (int(channel_id),),
+            row_factory=CombatRecord.row_factory,
+        )
+
+    async def close_channel_combats(self, channel_id: int) -> None:
+        await self.db.execute(
+            "UPDATE combats SET status = 'closed', closed_at = CURRENT_TIMESTAMP "
+            "WHERE channel_id = ? AND status = 'active'",
+            (int(channel_id),)
+        )
+        await self.db.commit()
+
+    # --- Participants ---
+
+    async def add_participant(self, combat_id: int, channel_id: int, user_id: int, added_by: int) -> None:
+        await self.db.execute(
+            """
+            INSERT INTO combat_participants(channel_id, user_id, added_by, combat_id)
+            VALUES(?, ?, ?, ?)
+            ON CONFLICT(combat_id, user_id) DO NOTHING
+            """,
+            (int(channel_id), int(user_id), int(added_by), int(combat_id)),
+        )
+        await self.db.commit()
+
+    async def list_participants(self, combat_id: int) -> List[int]:
+        rows = await self.db.execute_fetchall(
+            "SELECT user_id FROM combat_participants WHERE combat_id = ?",
+            (int(combat_id),),
+        )
+        return [int(r["user_id"]) for r in rows]
+
+    async def list_active_participants(self) -> List[Tuple[int, int]]:
+        rows = await self.db.execute_fetchall(
+            "SELECT p.combat_id, p.user_id FROM combats c "
+            "JOIN combat_participants p ON p.combat_id = c.id "
+            "WHERE c.status = 'active'"
+        )
+        return [(int(r["combat_id"]), int(r["user_id"])) for r in rows]
+
+    # --- Mobs ---
+
+    async def list_mob_names_like(self, channel_id: int, prefix: str) -> List[str]:
+        rows = await self.db.execute_fetchall(
+            "SELECT mob_name FROM combat_mobs WHERE channel_id = ? AND mob_name LIKE ?",
+            (int(channel_id), f"{prefix}%"),
+        )
+        return [r["mob_name"] for r in rows]
+
+    async def insert_mob(self, values: Dict[str, Any]) -> None:
+        await self.db.execute(
+            """
+            INSERT INTO combat_mobs(
+              channel_id, mob_name, mob_key, level,
+              hp, hp_max, mp, mp_max, str, agi, int_, dex, vit,
+              created_by
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            tuple(values[c] for c in _MOB_COLUMNS),
+        )
+        await self.db.commit()
+
+    async def get_mob(self, channel_id: int, mob_name: str) -> Optional[MobRecord]:
+        return await self.db.execute_fetchone(
+            """
+            SELECT id, channel_id, mob_name, mob_key, level, hp, hp_max, mp, mp_max,
+                   str, agi, int_, dex, vit, created_by, created_at
+            FROM combat_mobs WHERE channel_id = ? AND mob_name = ?
+            """,
+            (int(channel_id), str(mob_name)),
+            row_factory=MobRecord.row_factory,
+        )
+
+    async def list_mobs(self, channel_id: int) -> List[MobRecord]:
+        return await self.db.execute_fetchall(
+            """
+            SELECT id, channel_id, mob_name, mob_key, level, hp, hp_max, mp, mp_max,
+                   str, agi, int_, dex, vit, created_by, created_at
+            FROM combat_mobs WHERE channel_id = ? ORDER BY mob_name
+            """,
+            (int(channel_id),),
+            row_factory=MobRecord.row_factory,
+        )
+
+    async def update_mob_hp(self, channel_id: int, mob_name: str, hp: float) -> None:
+        await self.db.execute(
+            "UPDATE combat_mobs SET hp = ? WHERE channel_id = ? AND mob_name = ?",
+            (float(hp), int(channel_id), str(mob_name)),
+        )
+        await self.db.commit()
+
+    async def delete_dead_mobs(self, channel_id: int) -> int:
+        cur = await self.db.execute(
+            "DELETE FROM combat_mobs WHERE channel_id = ? AND hp <= 0",
+            (int(channel_id),),
+        )
+        await self.db.commit()
+        return cur.rowcount or 0
+
+    # --- Journal ---
+
+    async def add_combat_logs(self, rows: List[Tuple[int, int, str, str]]) -> None:
+        await self.db.executemany(
+            "INSERT INTO combat_logs(channel_id, kind, message, combat_id) VALUES(?, ?, ?, ?)",
+            [(int(channel_id), str(kind), str(message), int(combat_id)) for combat_id, channel_id, kind, message in rows],
+        )
+        await self.db.commit()
+
+    # --- État des tours ---
+
+    async def get_combat_state(self, combat_id: int) -> Optional[Row]:
+        return await self.db.execute_fetchone(
+            "SELECT combat_id, turn_index, round, actor, aggro, pacing, updated_at FROM combat_state WHERE combat_id = ?",
+            (int(combat_id),),
+        )
+
+    async def save_combat_state(self, combat_id: int, turn_index: int, round: int,
+                                actor: Optional[str], aggro: str, pacing: Optional[str] = None) -> None:
+        await self.db.execute(
+            """
+            INSERT INTO combat_state(combat_id, turn_index, round, actor, aggro, pacing)
+            VALUES(?, ?, ?, ?, ?, ?)
+            ON CONFLICT(combat_id) DO UPDATE SET
+              turn_index=excluded.turn_index, round=excluded.round, actor=excluded.actor,
+              aggro=excluded.aggro, pacing=excluded.pacing, updated_at=CURRENT_TIMESTAMP
+            """,
+            (int(combat_id), int(turn_index), int(round), actor, str(aggro), pacing),
+        )
+        await self.db.commit()
+
+    # --- Événements ---
+
+    async def append_combat_events(self, combat_id: int, events: List[Tuple[str, str]]) -> List[int]:
+        ids = []
+        for kind, payload in events:
+            cursor = await self.db.execute(
+                "INSERT INTO combat_events(combat_id, kind, payload) VALUES(?, ?, ?)",
+                (int(combat_id), str(kind), str(payload)),
+            )
+            ids.append(cursor.lastrowid)
+        await self.db.commit()
+        return ids
+
+    async def list_combat_events(self, combat_id: int, after_id: int = 0) -> List[Row]:
+        return await self.db.execute_fetchall(
+            "SELECT id, kind, payload, created_at FROM combat_events WHERE combat_id = ? AND id > ? ORDER BY id",
+            (int(combat_id), int(after_id)),
+        )
+
+    async def get_combat_snapshot(self, combat_id: int) -> Optional[Row]:
+        return await self.db.execute_fetchone(
+            "SELECT combat_id, last_event_id, state, created_at FROM combat_snapshots WHERE combat_id = ?",
+            (int(combat_id),),
+        )
+
+    async def save_combat_snapshot(self, combat_id: int, last_event_id: int, state: str) -> None:
+        await self.db.execute(
+            """
+            INSERT INTO combat_snapshots(combat_id, last_event_id, state) VALUES(?, ?, ?)
+            ON CONFLICT(combat_id) DO UPDATE SET
+              last_event_id=excluded.last_event_id, state=excluded.state, created_at=CURRENT_TIMESTAMP
+            """,
+            (int(combat_id), int(last_event_id), str(state)),
+        )
+        await self.db.commit()
+
+    # --- Archive ---
+
+    async def archive_combat(self, combat_id: int) -> bool:
+        async with self.db.transaction():
+            combat = await self.db.execute_fetchone(
+                "SELECT id, channel_id, thread_id, status, created_by, created_at, closed_at "
+                "FROM combats WHERE id = ? AND status = 'closed'",
+                (int(combat_id),),
+                row_factory=CombatRecord.row_factory,
+            )
+            if not combat:
+                return False
+
+            participants = await self.list_participants(combat.id)
+            logs = await self.db.execute_fetchall(
+                "SELECT created_at, kind, message FROM combat_logs WHERE combat_id = ? ORDER BY id",
+                (combat.id,),
+            )
+            events = await self.list_combat_events(combat.id)
+
+            # Les mobs d'un fil n'appartiennent qu'à lui (channel_id = thread_id),
+            # sauf si un nouveau combat y a déjà démarré
+            thread_id = combat.thread_id
+            mobs: List[MobRecord] = []
+            if thread_id is not None and not await self.get_active_combat(thread_id):
+                mobs = await self.list_mobs(thread_id)
+                await self.db.execute("DELETE FROM combat_mobs WHERE channel_id = ?", (int(thread_id),))
+
+            await self.db.execute(
+                """
+                INSERT OR REPLACE INTO combat_archive(
+                  combat_id, channel_id, thread_id, created_by, created_at, closed_at,
+                  participants, mobs, log_count, logs, events
+                )
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    combat.id, combat.channel_id, thread_id, combat.created_by,
+                    combat.created_at, combat.closed_at,
+                    json.dumps(participants),
+                    json.dumps([mob_summary(m) for m in mobs], ensure_ascii=False),
+                    len(logs),
+                    pack_logs(logs),
+                    pack_events(events),
+                ),
+            )
+            await self.db.execute("DELETE FROM combat_participants WHERE combat_id = ?", (combat.id,))
+            await self.db.execute("DELETE FROM combat_logs WHERE combat_id = ?", (combat.id,))
+            await self.db.execute("DELETE FROM combat_state WHERE combat_id = ?", (combat.id,))
+            await self.db.execute("DELETE FROM combat_events WHERE combat_id = ?", (combat.id,))
+            await self.db.execute("DELETE FROM combat_snapshots WHERE combat_id = ?", (combat.id,))
+            await self.db.execute("DELETE FROM combats WHERE id = ?", (combat.id,))
+        return True
+
+    async def list_closed_combat_ids(self, limit: int) -> List[int]:
+        rows = await self.db.execute_fetchall(
+            "SELECT id FROM combats WHERE status = 'closed' ORDER BY closed_at LIMIT ?",
+            (int(limit),),
+        )
+        return [int(r["id"]) for r in rows]
+
+    async def get_archived_combat(self, combat_id: int) -> Optional[Dict[str, Any]]:
+        row = await self.db.execute_fetchone(
+            "SELECT * FROM combat_archive WHERE combat_id = ?",
+            (int(combat_id),),
+        )
+        return archived_combat(row) if row else None
+
+    async def get_last_archived_combat(self, thread_id: int) -> Optional[Dict[str, Any]]:
+        row = await self.db.execute_fetchone(
+            "SELECT * FROM combat_archive WHERE thread_id = ? ORDER BY combat_id DESC LIMIT 1",
+            (int(thread_id),),
+        )
+        return archived_combat(row) if row else None
+
+    async def list_archived_combats(self, channel_id: int, limit: int) -> List[Row]:
+        return await self.db.execute_fetchall(
+            """
+            SELECT combat_id, thread_id, created_by, created_at, closed_at, participants, log_count
+            FROM combat_archive WHERE channel_id = ?
+            ORDER BY combat_id DESC LIMIT ?
+            """,
+            (int(channel_id), int(limit)),
+        )
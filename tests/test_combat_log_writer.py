@@ -0,0 +1,39 @@
+import asyncio
+import sqlite3
+
+from app.combat_log_writer import CombatLogWriter
+from app.db import Database
+
+
+def _committed_logs(path: str) -> int:
+    # Connexion indépendante : ne voit que ce qui est commité
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM combat_logs").fetchone()[0]
+
+
+def _add_inside_transaction(tmp_path, flush_size: int) -> tuple:
+    path = str(tmp_path / "logs.sqlite3")
+
+    async def scenario():
+        db = Database(path, read_pool_size=0)
+        await db.connect()
+        try:
+            writer = CombatLogWriter(db, flush_size=flush_size, interval_s=0.05)
+            async with db.transaction():
+                for i in range(3):
+                    writer.add(1, 10, "system", f"ligne {i}")
+            await asyncio.sleep(0.3)
+            return writer.pending, writer.written, db.conn.in_transaction
+        finally:
+            await db.close()
+
+    pending, written, in_transaction = asyncio.run(scenario())
+    return pending, written, in_transaction, _committed_logs(path)
+
+
+def test_timer_flush_commits_rows_added_inside_transaction(tmp_path):
+    assert _add_inside_transaction(tmp_path, flush_size=50) == (0, 3, False, 3)
+
+
+def test_size_flush_commits_rows_added_inside_transaction(tmp_path):
+    assert _add_inside_transaction(tmp_path, flush_size=2) == (0, 3, False, 3)
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.character import create_character, get_character
+from app.cogs import combat_turn
+from app.cogs.combat import save_player_hp
+from app.cogs.combat_turn import CombatTurnCog
+from app.combat_actor import combat_actor
+from app.combat_mobs import insert_mob, list_mobs, save_mob_hp
+from app.combat_session import combat_close, combat_create, combat_set_thread, participants_add
+from app import combat_session_manager
+from app.combat_session_manager import get_or_create_session
+from app.db import Database
+from app.models import RuntimeEntity
+
+CHANNEL_ID = 10
+THREAD_ID = 100
+USER_ID = 1
+MOB_NAME = "Gobelin#1"
+
+
+class FakeThread:
+    """Fil Discord minimal : garde les messages, joue `on_announce` à l'annonce d'un mob."""
+
+    def __init__(self, on_announce):
+        self.id = THREAD_ID
+        self.on_announce = on_announce
+        self.messages = []
+
+    async def send(self, content=None, embed=None):
+        self.messages.append(content if embed is None else embed)
+        if content and content.startswith("🎲"):
+            await self.on_announce()
+
+    async def edit(self, **kwargs):
+        pass
+
+
+async def _setup(db):
+    combat_id = await combat_create(db, CHANNEL_ID, USER_ID)
+    await combat_set_thread(db, CHANNEL_ID, THREAD_ID, combat_id)
+    await create_character(db, USER_ID, "Alice")
+    await participants_add(db, THREAD_ID, USER_ID, USER_ID)
+    # Plus rapide que le joueur : le mob ouvre le tour
+    mob = RuntimeEntity(name=MOB_NAME, hp=50.0, hp_max=50.0, mp=0.0, mp_max=0.0,
+                        STR=30.0, AGI=80.0, INT=0.0, DEX=0.0, VIT=0.0, is_mob=True)
+    await insert_mob(db, THREAD_ID, MOB_NAME, "test.gobelin", 1, mob, USER_ID)
+    return await get_or_create_session(db, THREAD_ID)
+
+
+def _run_phase(tmp_path, player_attack):
+    """Tour des mobs détaillé ; `player_attack(db)` joue pendant la pause qui suit l'annonce."""
+
+    async def scenario():
+        db = Database(str(tmp_path / "turn.sqlite3"), read_pool_size=0)
+        await db.connect()
+        try:
+            session = await _setup(db)
+            cog = CombatTurnCog(SimpleNamespace(db=db))
+
+            async def on_announce():
+                # Commande concurrente : attend l'acteur du combat comme /atk_mob
+                async with combat_actor(db, THREAD_ID):
+                    await player_attack(db)
+
+            thread = FakeThread(on_announce)
+            actor = await cog._run_detailed_mob_phase(session, thread, session.current_actor)
+            mobs = {row.mob_name: row.hp for row in await list_mobs(db, THREAD_ID)}
+            player_hp = (await get_character(db, USER_ID)).hp
+            result = actor.name if actor else None, thread.messages, mobs, player_hp
+            await combat_close(db, THREAD_ID)
+            return result
+        finally:
+            await db.close()
+
+    return asyncio.run(scenario())
+
+
+def _no_sleep(monkeypatch):
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(combat_turn.asyncio, "sleep", lambda _s: real_sleep(0))
+
+
+def test_mob_killed_during_pause_does_not_attack(tmp_path, monkeypatch):
+    _no_sleep(monkeypatch)
+
+    async def kill_mob(db):
+        await save_mob_hp(db, THREAD_ID, MOB_NAME, 0.0)
+
+    actor, messages, mobs, player_hp = _run_phase(tmp_path, kill_mob)
+
+    assert actor == "Alice"
+    assert not any(isinstance(m, combat_turn.discord.Embed) for m in messages)
+    assert MOB_NAME not in mobs
+    assert player_hp == 100.0
+
+
+def test_mob_turn_uses_hp_written_during_pause(tmp_path, monkeypatch):
+    _no_sleep(monkeypatch)
+    # Le mob rate sans contrecoup : les PV enregistrés ne viennent que de la sauvegarde
+    rolls = iter([1, 20])
+    monkeypatch.setattr(combat_session_manager, "d20", lambda: next(rolls))
+
+    async def wound_both(db):
+        await save_mob_hp(db, THREAD_ID, MOB_NAME, 3.0)
+        await save_player_hp(db, USER_ID, 5.0)
+
+    actor, _messages, mobs, player_hp = _run_phase(tmp_path, wound_both)
+
+    assert actor == "Alice"
+    # Rien n'est réécrit depuis les PV d'avant la pause (50 et 100)
+    assert mobs[MOB_NAME] == 3.0
+    assert player_hp == 5.0
@@ -0,0 +1,46 @@
+from dataclasses import replace
+
+import pytest
+
+from app.models import RuntimeEntity
+from app.odds import expected_exchange, hit_probability
+from app.rules import ATTACK_TYPE_CODES, resolve_attack
+
+ATTACKER = RuntimeEntity(name="A", hp=500.0, hp_max=500.0, mp=10.0, mp_max=10.0,
+                         STR=22.0, AGI=37.0, INT=31.0, DEX=18.0, VIT=12.0)
+DEFENDERS = [
+    RuntimeEntity(name="D", hp=500.0, hp_max=500.0, mp=10.0, mp_max=10.0,
+                  STR=15.0, AGI=44.0, INT=9.0, DEX=20.0, VIT=55.0),
+    # Écart d'AGI entier et VIT élevée : égalités de toucher et dégâts ramenés à 0
+    RuntimeEntity(name="D", hp=500.0, hp_max=500.0, mp=10.0, mp_max=10.0,
+                  STR=40.0, AGI=17.0, INT=5.0, DEX=8.0, VIT=260.0),
+]
+
+
+def _enumerate(defender: RuntimeEntity, attack_type: str, perce_armure: bool) -> dict:
+    # Les 400 tirages de d20 équiprobables, joués par resolve_attack
+    outcomes = [
+        resolve_attack(replace(ATTACKER), replace(defender), roll_a, roll_b, attack_type, perce_armure)
+        for roll_a in range(1, 21)
+        for roll_b in range(1, 21)
+    ]
+    n = len(outcomes)
+    return {
+        "hit_chance": sum(o.hit for o in outcomes) / n,
+        "damage_mean": sum(o.damage for o in outcomes) / n,
+        "damage_max": max(o.damage for o in outcomes),
+        "contrecoup_chance": sum(o.contrecoup > 0 for o in outcomes) / n,
+        "contrecoup_mean": sum(o.contrecoup for o in outcomes) / n,
+    }
+
+
+@pytest.mark.parametrize("defender", DEFENDERS)
+@pytest.mark.parametrize("perce_armure", [False, True])
+@pytest.mark.parametrize("attack_type", list(ATTACK_TYPE_CODES))
+def test_expected_exchange_matches_enumeration(attack_type, perce_armure, defender):
+    expected = _enumerate(defender, attack_type, perce_armure)
+    odds = expected_exchange(ATTACKER, defender, attack_type, perce_armure)
+
+    assert hit_probability(ATTACKER, defender) == pytest.approx(expected["hit_chance"], abs=1e-9)
+    for field, value in expected.items():
+        assert getattr(odds, field) == pytest.approx(value, abs=1e-9), field
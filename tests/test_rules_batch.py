@@ -0,0 +1,67 @@
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.models import RuntimeEntity
+from app.rules import ATTACK_TYPE_CODES, resolve_attack, resolve_attacks_batch
+
+STATS = ("STR", "AGI", "INT", "DEX", "VIT")
+
+
+def _random_entity(rng: random.Random, name: str) -> RuntimeEntity:
+    hp = float(rng.randint(20, 200))
+    return RuntimeEntity(
+        name=name, hp=hp, hp_max=hp, mp=10.0, mp_max=10.0,
+        **{stat: float(rng.randint(0, 60)) for stat in STATS},
+    )
+
+
+def _stats(entities) -> dict:
+    return {stat: np.array([getattr(e, stat) for e in entities], dtype=np.float64) for stat in STATS}
+
+
+@pytest.mark.parametrize("perce_armure", [False, True])
+@pytest.mark.parametrize("attack_type", list(ATTACK_TYPE_CODES))
+def test_batch_matches_resolve_attack(attack_type, perce_armure):
+    rng = random.Random(f"{attack_type}-{perce_armure}")
+    n = 2000
+    attackers = [_random_entity(rng, "A") for _ in range(n)]
+    defenders = [_random_entity(rng, "D") for _ in range(n)]
+    roll_a = np.array([rng.randint(1, 20) for _ in range(n)], dtype=np.float64)
+    roll_b = np.array([rng.randint(1, 20) for _ in range(n)], dtype=np.float64)
+
+    batch = resolve_attacks_batch(_stats(attackers), _stats(defenders), roll_a, roll_b,
+                                  attack_type, perce_armure)
+
+    # resolve_attack modifie les PV : on travaille sur des copies
+    expected = [
+        resolve_attack(replace(a), replace(d), float(ra), float(rb), attack_type, perce_armure)
+        for a, d, ra, rb in zip(attackers, defenders, roll_a, roll_b)
+    ]
+    np.testing.assert_array_equal(batch["hit"], [o.hit for o in expected])
+    np.testing.assert_allclose(batch["damage"], [o.damage for o in expected], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(batch["contrecoup"], [o.contrecoup for o in expected], rtol=0, atol=1e-9)
+
+
+def test_batch_mixed_attack_types():
+    rng = random.Random(7)
+    n = 600
+    attackers = [_random_entity(rng, "A") for _ in range(n)]
+    defenders = [_random_entity(rng, "D") for _ in range(n)]
+    types = [rng.choice(list(ATTACK_TYPE_CODES)) for _ in range(n)]
+    perce = [rng.random() < 0.5 for _ in range(n)]
+    roll_a = np.array([rng.randint(1, 20) for _ in range(n)], dtype=np.float64)
+    roll_b = np.array([rng.randint(1, 20) for _ in range(n)], dtype=np.float64)
+
+    batch = resolve_attacks_batch(_stats(attackers), _stats(defenders), roll_a, roll_b,
+                                  np.array([ATTACK_TYPE_CODES[t] for t in types]), np.array(perce))
+
+    expected = [
+        resolve_attack(replace(a), replace(d), float(ra), float(rb), t, p)
+        for a, d, ra, rb, t, p in zip(attackers, defenders, roll_a, roll_b, types, perce)
+    ]
+    np.testing.assert_array_equal(batch["hit"], [o.hit for o in expected])
+    np.testing.assert_allclose(batch["damage"], [o.damage for o in expected], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(batch["contrecoup"], [o.contrecoup for o in expected], rtol=0, atol=1e-9)
@@ -0,0 +1,142 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.character import (
+    add_item_to_inventory,
+    character_cache,
+    create_character,
+    equip_item,
+    get_character,
+    get_inventory,
+    set_character_hp,
+    set_character_mp,
+)
+from app.combat_log_writer import combat_log_writer
+from app.combat_mobs import cleanup_dead_mobs, insert_mob, list_mobs, next_unique_mob_name, save_mob_hp
+from app.combat_session import (
+    combat_close,
+    combat_create,
+    combat_get_thread_ids,
+    combat_is_active,
+    combat_set_thread,
+    log_add,
+    participants_add,
+    participants_list,
+)
+from app.db import Database
+from app.models import RuntimeEntity
+from app.storage import MemoryDatabase
+
+CHANNEL_ID = 10
+THREAD_ID = 100
+# Horodatages : CURRENT_TIMESTAMP côté SQLite, horloge Python en mémoire
+TIMESTAMPS = ("created_at", "closed_at", "archived_at")
+
+
+def _mob(name: str, hp: float) -> RuntimeEntity:
+    return RuntimeEntity(name=name, hp=hp, hp_max=hp, mp=0.0, mp_max=0.0,
+                         STR=12.0, AGI=8.0, INT=0.0, DEX=3.0, VIT=5.0, is_mob=True)
+
+
+def _without_timestamps(value):
+    if isinstance(value, sqlite3.Row):
+        value = dict(value)
+    if isinstance(value, dict):
+        return {k: _without_timestamps(v) for k, v in value.items() if k not in TIMESTAMPS}
+    if isinstance(value, list):
+        return [_without_timestamps(v) for v in value]
+    return value
+
+
+async def _scenario(db) -> dict:
+    """Parcours des helpers du bot ; retourne ce que chaque étape a relu."""
+    seen = {}
+
+    # Personnages : création, PV/PM, fiche modifiée, inventaire
+    alice = await create_character(db, 1, "Alice")
+    await create_character(db, 2, "Bob")
+    await set_character_hp(db, 1, 42.0)
+    await set_character_mp(db, 1, 7.5)
+    alice.STR += 5
+    alice.gold = 30
+    await alice.save_to_db(db)
+    await add_item_to_inventory(db, 1, "epee", 2, {"tranchant": 3})
+    await equip_item(db, 1, "epee")
+    character_cache(db).clear()  # relecture depuis le stockage
+    seen["alice"] = (await db.storage.get_character(1)).as_dict()
+    seen["alice_equipped"] = [item.item_id for item in (await get_character(db, 1)).equipped]
+    seen["inventory"] = [(item.item_id, item.quantity, item.equipped) for item in await get_inventory(db, 1)]
+
+    # Combat : création, fil, participants, mobs, journal
+    combat_id = await combat_create(db, CHANNEL_ID, 1)
+    await combat_set_thread(db, CHANNEL_ID, THREAD_ID, combat_id)
+    await participants_add(db, THREAD_ID, 1, 1)
+    await participants_add(db, THREAD_ID, 2, 1)
+    for hp in (30.0, 20.0):
+        name = await next_unique_mob_name(db, THREAD_ID, "Loup")
+        await insert_mob(db, THREAD_ID, name, "forest.loup", 2, _mob(name, hp), 1)
+    await save_mob_hp(db, THREAD_ID, "Loup#1", 0.0)
+    seen["dead_mobs"] = await cleanup_dead_mobs(db, THREAD_ID)
+    seen["mobs"] = [(row.mob_name, row.hp, row.str) for row in await list_mobs(db, THREAD_ID)]
+    seen["participants"] = await participants_list(db, THREAD_ID)
+    seen["threads"] = await combat_get_thread_ids(db, CHANNEL_ID)
+    await log_add(db, THREAD_ID, "system", "Début du combat")
+    await log_add(db, THREAD_ID, "attack", "Alice frappe Loup#2")
+    seen["written_logs"] = await combat_log_writer(db).flush()
+
+    # Fermeture : le combat quitte les tables chaudes pour l'archive
+    await combat_close(db, THREAD_ID)
+    seen["active_after_close"] = await combat_is_active(db, THREAD_ID)
+    seen["hot_mobs"] = len(await list_mobs(db, THREAD_ID))
+    seen["archive"] = await db.storage.get_last_archived_combat(THREAD_ID)
+    seen["archive_list"] = await db.storage.list_archived_combats(CHANNEL_ID, 10)
+    seen["closed_left"] = await db.storage.list_closed_combat_ids(10)
+    return _without_timestamps(seen)
+
+
+async def _run_sqlite() -> dict:
+    db = Database(":memory:")
+    await db.connect()
+    try:
+        return await _scenario(db)
+    finally:
+        await db.close()
+
+
+@pytest.fixture(scope="module")
+def results():
+    return {
+        "sqlite": asyncio.run(_run_sqlite()),
+        "memory": asyncio.run(_scenario(MemoryDatabase())),
+    }
+
+
+def test_backends_agree(results):
+    sqlite, memory = results["sqlite"], results["memory"]
+    assert sqlite.keys() == memory.keys()
+    for step in sqlite:
+        assert memory[step] == sqlite[step], step
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "memory"])
+def test_scenario_results(results, backend):
+    seen = results[backend]
+    assert seen["alice"]["hp"] == 42.0
+    assert seen["alice"]["mp"] == 7.5
+    assert seen["alice"]["STR"] == 15.0
+    assert seen["alice"]["gold"] == 30
+    assert seen["alice_equipped"] == ["epee"]
+    assert seen["inventory"] == [("epee", 2, True)]
+    assert seen["dead_mobs"] == 1
+    assert seen["mobs"] == [("Loup#2", 20.0, 12.0)]
+    assert seen["participants"] == [1, 2]
+    assert seen["threads"] == [THREAD_ID]
+    assert seen["written_logs"] == 2
+    assert seen["active_after_close"] is False
+    assert seen["hot_mobs"] == 0
+    assert [log["message"] for log in seen["archive"]["logs"]] == ["Début du combat", "Alice frappe Loup#2"]
+    assert seen["archive"]["participants"] == [1, 2]
+    assert [row["log_count"] for row in seen["archive_list"]] == [2]
+    assert seen["closed_left"] == []